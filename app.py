@@ -10,22 +10,23 @@ from database import (
     initialize_db,
     load_latest_constraints
 )
+from optimizer.optimizer_service import get_optimizer_service
 from optimizer.run_optimizer import trigger_optimizer_if_needed
 from pages_files.auth import auth_page
 from pages_files.common_dashboard import common_dashboard_page
 from pages_files.constraint_entry import constraint_entry_page
 from pages_files.optimizer_run_latest_values import display_latest_values
 from params import *
-from utils.audit_logging import initialize_audit_log_table
 from utils.session_state_init import session_state_init
 
 st.set_page_config(layout="wide", page_title="Hydrogen Allocation Tool",
                    initial_sidebar_state="collapsed", page_icon="📈")
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
+# schema migrations and the schema cache, once per process (a flag check on every later rerun)
 initialize_db(ROLES, get_constraints(), list(HYDROGEN_ALLOCATION_DATA.keys()))
-initialize_audit_log_table()
 
+get_optimizer_service().start()  # no-op if the process-wide service is already running
 session_state_init()
 
 
@@ -0,0 +1,228 @@
+import threading
+
+import numpy as np
+
+from data_pipelines.signal_formulas import get_compiled_signals
+from params import *
+
+# Stateful model of the hydrogen bank fleet: 7 filling posts fed by 10 bank compressors.
+#
+# The DCS reports per post how many banks are in filling and their capacity, and per compressor whether it
+# runs, but no bank flow. The model integrates compressor-hours into each post while it fills (shared evenly
+# between the filling banks) and turns them into fill progress and time to full with the effective
+# per-compressor throughput. Whenever a fill seen from its start completes, the capacity it took over the
+# compressor-hours it used is one observation of that throughput, which is then updated (EWMA). The first
+# estimate is the flat BANK_COMPRESSOR_FLOW_NM3_HR of the signal spec. The optimizer allocates the bank in
+# multiples of the learned throughput, and fix_bank_constraints bounds the bank with the estimated flow.
+#
+# BankFleetModel.update() is the per-frame path (O(posts + compressors)); estimate_bank_fleet() computes the
+# same quantities for a whole history at once, for backfill.
+
+POSTS = list(range(1, 8))
+IN_FILLING_TAGS = [f'H2_POST_{post}_BANK_IN_FILLING' for post in POSTS]
+CAPACITY_TAGS = [f'H2_POST_{post}_BANK_CAPACITY' for post in POSTS]
+COMPRESSOR_TAGS = [f'Bank_compressor_status_{name}' for name in ['ZH', 'ZI', 'ZJ', 'G', 'K', 'L', 'M', 'N', 'O', 'P']]
+
+
+def bank_fleet_inputs(tags):
+    """
+    Per-frame inputs of the model from tag name -> array over frames: (filling, capacity, compressors_on).
+    Missing tags are handled like the signal spec handles them.
+    """
+    x = get_compiled_signals().input_matrix(tags, IN_FILLING_TAGS + CAPACITY_TAGS + COMPRESSOR_TAGS)
+    filling, capacity, compressors = np.split(x, [len(IN_FILLING_TAGS), len(IN_FILLING_TAGS) + len(CAPACITY_TAGS)],
+                                              axis=1)
+    return np.maximum(filling, 0), np.maximum(capacity, 0), np.maximum(compressors.sum(axis=1), 0)
+
+
+def _filling_share(filling):
+    """Share of the compressor output going to each post: evenly per filling bank."""
+    total = filling.sum(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(total > 0, filling / total, 0.0)
+
+
+def _observed_throughput(capacity, filling, compressor_hours):
+    """Per-compressor throughput implied by a completed fill, or None if it is too short or implausible."""
+    if compressor_hours < BANK_MIN_FILL_COMPRESSOR_HRS:
+        return None
+    throughput = capacity * filling / compressor_hours
+    low, high = BANK_THROUGHPUT_BOUNDS
+    if not low * BANK_COMPRESSOR_FLOW_NM3_HR <= throughput <= high * BANK_COMPRESSOR_FLOW_NM3_HR:
+        return None
+    return throughput
+
+
+def _fleet_outputs(throughput, compressor_hours, filling, capacity, compressors_on):
+    """Fill progress, time to full and the bank bounds; works on one frame or on frames x posts arrays."""
+    throughput = np.asarray(throughput, dtype=float)[..., None]
+    to_fill = capacity * filling
+    filled = np.minimum(throughput * compressor_hours, to_fill)
+    rate = throughput * compressors_on[..., None] * _filling_share(filling)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        progress = np.where(to_fill > 0, filled / to_fill, 0.0)
+        time_to_full = np.where(rate > 0, (to_fill - filled) / rate, np.inf)
+    time_to_full = np.where(filling > 0, time_to_full, np.inf)
+    return {
+        "fill_progress": progress,
+        "time_to_full_hrs": time_to_full,
+        "filled_nm3": filled.sum(axis=-1),
+        "estimated_flow": throughput[..., 0] * compressors_on,
+        "max_intake_flow": throughput[..., 0] * len(COMPRESSOR_TAGS),
+    }
+
+
+def bank_constraints(outputs, bank_available):
+    """dcs_constraints entries of the model for one frame, used by fix_bank_constraints."""
+    time_to_full = outputs["time_to_full_hrs"]
+    next_full = float(time_to_full.min()) if np.isfinite(time_to_full).any() else 0.0
+    return {
+        "bank_throughput_per_compressor": float(outputs["throughput"]),
+        "bank_estimated_flow": float(outputs["estimated_flow"]),
+        "bank_max_intake_flow": float(outputs["max_intake_flow"]),
+        "bank_remaining_capacity": max(float(bank_available) - float(outputs["filled_nm3"]), 0.0),
+        "bank_time_to_next_full_hrs": next_full,  # 0 when no bank is filling
+    }
+
+
+class BankFleetModel:
+    """Incrementally updated bank fleet state, fed one frame at a time, oldest first."""
+
+    def __init__(self, throughput=BANK_COMPRESSOR_FLOW_NM3_HR, alpha=BANK_THROUGHPUT_ALPHA):
+        self.throughput = throughput
+        self.alpha = alpha
+        self.compressor_hours = np.zeros(len(POSTS))
+        self.observed = np.zeros(len(POSTS), dtype=bool)  # the current fill was seen from its start
+        self.filling = None
+        self.capacity = np.zeros(len(POSTS))
+        self.last_time = None
+        self.completed_fills = 0
+        self._lock = threading.Lock()
+
+    def _learn(self, observed_throughput):
+        self.throughput += self.alpha * (observed_throughput - self.throughput)
+        self.completed_fills += 1
+
+    def update(self, frame_time, filling, capacity, compressors_on):
+        """
+        Advances the model to one frame (time in seconds since epoch). Frames not newer than the last one
+        are ignored. Returns the model outputs for the frame.
+        """
+        with self._lock:
+            if self.last_time is not None and frame_time <= self.last_time:
+                return self.outputs(compressors_on)
+            filling = np.asarray(filling, dtype=float)
+            if self.filling is None:
+                self.observed = filling == 0
+            else:
+                for post in np.flatnonzero((self.filling > 0) & (filling == 0) & self.observed):
+                    observed = _observed_throughput(self.capacity[post], self.filling[post],
+                                                    self.compressor_hours[post])
+                    if observed is not None:
+                        self._learn(observed)
+                dt_hrs = min(max(frame_time - self.last_time, 0) / 3600, BANK_MAX_GAP_HRS)
+                self.compressor_hours += compressors_on * dt_hrs * _filling_share(filling)
+            self.compressor_hours[filling == 0] = 0.0
+            self.observed |= filling == 0
+            self.filling = filling
+            self.capacity = np.asarray(capacity, dtype=float)
+            self.last_time = frame_time
+            return self.outputs(compressors_on)
+
+    def rewind(self):
+        """
+        Forgets the fills in progress after the DCS source went back in time, so the next frame starts the
+        model again. The learned throughput is kept.
+        """
+        with self._lock:
+            self.compressor_hours = np.zeros(len(POSTS))
+            self.observed = np.zeros(len(POSTS), dtype=bool)
+            self.filling = None
+            self.capacity = np.zeros(len(POSTS))
+            self.last_time = None
+
+    def outputs(self, compressors_on):
+        filling = self.filling if self.filling is not None else np.zeros(len(POSTS))
+        outputs = _fleet_outputs(self.throughput, self.compressor_hours, filling, self.capacity,
+                                 np.asarray(compressors_on, dtype=float))
+        outputs["throughput"] = self.throughput
+        return outputs
+
+    def summary(self):
+        with self._lock:
+            outputs = self.outputs(0.0)
+            return {
+                "throughput_per_compressor": round(self.throughput, 1),
+                "completed_fills": self.completed_fills,
+                "fill_progress": {post: round(float(p), 3) for post, p in zip(POSTS, outputs["fill_progress"])},
+                "compressor_hours": {post: round(float(h), 2) for post, h in zip(POSTS, self.compressor_hours)},
+            }
+
+
+def estimate_bank_fleet(frame_times, filling, capacity, compressors_on, throughput=BANK_COMPRESSOR_FLOW_NM3_HR,
+                        alpha=BANK_THROUGHPUT_ALPHA):
+    """
+    The BankFleetModel outputs for a whole history at once. Compressor-hours are a per-post cumulative sum
+    restarted wherever the post is not filling; only the throughput updates (one per completed fill) are
+    applied in order.
+
+    Args:
+        frame_times: seconds since epoch, oldest first
+        filling, capacity: frames x posts arrays
+        compressors_on: running compressors per frame
+
+    Returns:
+        dict: the model outputs, each with frames as the first axis
+    """
+    frame_times = np.asarray(frame_times, dtype=float)
+    n_frames = len(frame_times)
+    dt_hrs = np.minimum(np.maximum(np.diff(frame_times, prepend=frame_times[:1]), 0) / 3600, BANK_MAX_GAP_HRS)
+    contribution = (compressors_on * dt_hrs)[:, None] * _filling_share(filling)
+    contribution[0] = 0.0
+
+    # restart the sums at every frame where the post is not filling
+    cumulative = np.vstack([np.zeros((1, len(POSTS))), np.cumsum(contribution, axis=0)])
+    restart = np.where(filling == 0, np.arange(1, n_frames + 1)[:, None], 0)
+    last_restart = np.maximum.accumulate(restart, axis=0)
+    compressor_hours = cumulative[1:] - np.take_along_axis(cumulative, last_restart, axis=0)
+    compressor_hours[filling == 0] = 0.0
+
+    # fills that complete at frame t and were seen from their start (a non-filling frame came before)
+    completed = np.zeros_like(filling, dtype=bool)
+    completed[1:] = (filling[:-1] > 0) & (filling[1:] == 0) & (last_restart[:-1] > 0)
+    throughputs = np.full(n_frames, float(throughput))
+    current = float(throughput)
+    applied_until = 0
+    for t, post in zip(*np.nonzero(completed)):
+        observed = _observed_throughput(capacity[t - 1, post], filling[t - 1, post], compressor_hours[t - 1, post])
+        if observed is None:
+            continue
+        throughputs[applied_until:t] = current
+        current += alpha * (observed - current)
+        applied_until = t
+    throughputs[applied_until:] = current
+
+    outputs = _fleet_outputs(throughputs, compressor_hours, filling, capacity, compressors_on)
+    outputs["throughput"] = throughputs
+    return outputs
+
+
+def bank_fleet_history(frame_times, tags):
+    """Per-frame bank constraint entries (see bank_constraints) for a history of frames, oldest first."""
+    outputs = estimate_bank_fleet(frame_times, *bank_fleet_inputs(tags))
+    bank_available = get_compiled_signals().evaluate(tags)["bank_available"]
+    return [bank_constraints({name: values[i] for name, values in outputs.items()}, bank_available[i])
+            for i in range(len(bank_available))]
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_bank_fleet_model():
+    """Returns the process-wide BankFleetModel, creating it on first use."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = BankFleetModel()
+        return _model
@@ -0,0 +1,133 @@
+import fnmatch
+import json
+import threading
+
+import numpy as np
+
+from data_pipelines.delta_table import dcs_signal_inputs, derive_dcs_signals
+from data_pipelines.signal_formulas import get_compiled_signals
+from params import TAG_QUALITY_PATH
+
+# Data quality gate for DCS frames, driven by parameters/tag_quality.json. The registry is compiled once per
+# tag set into bound and staleness arrays, so every tag of a snapshot is checked in one vectorized pass:
+#   bounds      the newest value is non-finite or outside [min, max]
+#   stuck       the value has not changed over the newest `stale_frames` frames, unless it is held at 0 (a unit
+#               shut down, e.g. one cell line, reads a constant 0 and is not a frozen transmitter)
+#   signals     a derived signal (e.g. a flaker consumption norm with no load) is non-finite
+#   missing     a tag the signal spec reads is absent from the frames (evaluated as 0, see signal_formulas.py)
+# Failing tags are reported, not repaired; compute_dcs_constraints already zeroes negative and non-finite
+# values. A failing critical tag stops routine solves until the data recovers (see OptimizerService).
+
+
+class CompiledQualityRules:
+    """The registry resolved for one list of tags into per-tag arrays."""
+
+    def __init__(self, tags, low, high, stale_frames, critical):
+        self.tags = tags
+        self.low = low
+        self.high = high
+        self.stale_frames = stale_frames  # 0 where staleness is not checked
+        self.critical = critical
+
+    def check(self, values):
+        """
+        Args:
+            values: frames x tags float64 matrix in `self.tags` order, newest frame first
+
+        Returns:
+            dict: bad_tags (tag -> reason), stuck_tags, critical_tags (failing critical tags)
+        """
+        newest = values[0]
+        non_finite = ~np.isfinite(newest)
+        below = newest < self.low
+        above = newest > self.high
+
+        # number of newest frames in a row equal to the newest one
+        unchanged = np.logical_and.accumulate(values == newest, axis=0).sum(axis=0)
+        stuck = (self.stale_frames > 0) & (unchanged >= self.stale_frames) & (newest != 0)
+
+        bad_tags = {}
+        for reason, mask in (("non-finite", non_finite), ("below min", below), ("above max", above)):
+            for i in np.flatnonzero(mask):
+                bad_tags.setdefault(self.tags[i], reason)
+        failing = non_finite | below | above | stuck
+        return {
+            "bad_tags": bad_tags,
+            "stuck_tags": [self.tags[i] for i in np.flatnonzero(stuck)],
+            "critical_tags": [self.tags[i] for i in np.flatnonzero(failing & self.critical)],
+        }
+
+
+def _rule_for(tag, registry):
+    for rule in registry.get("rules", []):
+        if fnmatch.fnmatchcase(tag, rule["pattern"]):
+            return {**registry["default"], **rule}
+    return registry["default"]
+
+
+def compile_quality_rules(registry, tags):
+    rules = [_rule_for(tag, registry) for tag in tags]
+
+    def bound(name, missing):
+        return np.array([missing if rule[name] is None else float(rule[name]) for rule in rules])
+
+    return CompiledQualityRules(
+        tags=list(tags),
+        low=bound("min", -np.inf),
+        high=bound("max", np.inf),
+        stale_frames=np.array([rule["stale_frames"] or 0 for rule in rules]),
+        critical=np.array([bool(rule["critical"]) for rule in rules]),
+    )
+
+
+_registry = None
+_compiled = {}  # tuple of tags -> CompiledQualityRules
+_registry_lock = threading.Lock()
+
+
+def get_quality_rules(tags, path=TAG_QUALITY_PATH):
+    """Compiled rules for `tags`, loading the registry once per process and compiling once per tag set."""
+    global _registry
+    key = tuple(tags)
+    with _registry_lock:
+        if _registry is None:
+            with open(path) as f:
+                _registry = json.load(f)
+        if key not in _compiled:
+            _compiled[key] = compile_quality_rules(_registry, key)
+        return _compiled[key]
+
+
+def check_dcs_quality(data):
+    """
+    Runs the quality gate on decoded DCS frames (Arrow table or pandas frame, newest first).
+
+    Returns:
+        dict: ok (no critical tag failing), bad_tags, stuck_tags, critical_tags, non_finite_signals and
+            missing_tags
+    """
+    tags = {name: values for name, values in dcs_signal_inputs(data).items()
+            if np.issubdtype(np.asarray(values).dtype, np.number)}
+    rules = get_quality_rules(list(tags))
+    report = rules.check(np.column_stack([np.asarray(values, dtype=float) for values in tags.values()]))
+
+    newest = {name: np.asarray(values[:1], dtype=float) for name, values in tags.items()}
+    signals = derive_dcs_signals(newest)
+    report["non_finite_signals"] = [name for name, values in signals.items() if not np.isfinite(values[0])]
+    report["missing_tags"] = get_compiled_signals().missing(tags)
+    report["ok"] = not report["critical_tags"]
+    return report
+
+
+def describe_quality(report):
+    """One line for the logs, or None if nothing was flagged."""
+    parts = []
+    if report["bad_tags"]:
+        parts.append("bad: " + ", ".join(f"{tag} ({reason})" for tag, reason in report["bad_tags"].items()))
+    if report["stuck_tags"]:
+        parts.append("stuck: " + ", ".join(report["stuck_tags"]))
+    if report["non_finite_signals"]:
+        parts.append("non-finite signals: " + ", ".join(report["non_finite_signals"]))
+    if report.get("missing_tags"):
+        parts.append("missing: " + ", ".join(report["missing_tags"]))
+    return "; ".join(parts) or None
@@ -0,0 +1,246 @@
+import threading
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from data_pipelines.bank_fleet import get_bank_fleet_model, bank_fleet_inputs, bank_constraints
+from data_pipelines.bank_parameter_generation import BANK_PRESSURE_TAGS, check_bank_filling_status
+from data_pipelines.data_quality import check_dcs_quality, describe_quality
+from data_pipelines.dcs_sources import get_dcs_source
+from data_pipelines.delta_table import (compute_dcs_constraints, get_frame_timestamp, derive_dcs_signals,
+                                        dcs_signal_inputs, frame_times_s, record_norm_samples)
+from data_pipelines.frame_buffer import DcsFrameBuffer
+from data_pipelines.frame_store import get_dcs_frame_store
+from data_pipelines.norm_estimator import get_norm_estimator
+from data_pipelines.signal_formulas import get_compiled_signals
+from params import *
+
+
+class DcsSnapshotCache:
+    """
+    Process-wide cache of the latest parsed DCS snapshot, keyed by the version of the DCS source (the Delta
+    table version in production).
+
+    The source is opened once and kept. A `get()` within `ttl_s` of the last check returns the cached
+    snapshot without any remote call; after that it only reloads the Delta log to see whether the version
+    moved, and re-reads frames only when a new commit exists. Concurrent callers share one in-flight fetch:
+    whoever waits on the lock finds the snapshot the first caller just loaded.
+    """
+
+    def __init__(self, source=None, ttl_s=DCS_CACHE_TTL_S):
+        self.ttl_s = ttl_s
+        self._source = source
+        self._fetch_lock = threading.Lock()
+        self._snapshot = None
+        self._frames = None  # decoded recent frames, newest first
+        self._version = None
+        self._subscribers = []
+        self.frame_buffer = None  # DcsFrameBuffer of the linear signals and bank pressures, built on first read
+        self._checked_at = 0.0
+        self.hits = 0
+        self.version_checks = 0
+        self.reads = 0
+        self.incremental_reads = 0
+        self.epoch = 0
+
+    def _is_fresh(self, max_age_s):
+        return self._snapshot is not None and time.monotonic() - self._checked_at < max_age_s
+
+    def get(self, max_age_s=None):
+        """
+        Returns the latest DCS snapshot: timestamp, version, dcs_constraints, current_flow, raw frames, the
+        data quality report, rolling window statistics and the bank-filling check.
+        Pass `max_age_s=0` to always check the Delta version (a manual refresh); the frames are still
+        only re-read when the version changed.
+        """
+        max_age_s = self.ttl_s if max_age_s is None else max_age_s
+        if self._is_fresh(max_age_s):
+            self.hits += 1
+            return self._snapshot
+
+        requested_at = time.monotonic()
+        with self._fetch_lock:
+            if self._snapshot is not None and self._checked_at >= requested_at:
+                # another caller finished a check while we were waiting for the lock
+                self.hits += 1
+                return self._snapshot
+            previous = self._snapshot
+            self._refresh()
+            snapshot = self._snapshot
+        if snapshot is not previous:
+            for callback in list(self._subscribers):
+                try:
+                    callback(snapshot)
+                except Exception as e:
+                    print(f"DCS snapshot subscriber failed: {e}")
+        return snapshot
+
+    def subscribe(self, callback):
+        """Calls `callback(snapshot)` whenever a new DCS snapshot is loaded, from the thread that loaded it."""
+        self._subscribers.append(callback)
+
+    def _version_regressed(self, version):
+        try:
+            return self._version is not None and version < self._version
+        except TypeError:  # version tokens without an order
+            return False
+
+    def _rewind(self, frames):
+        """Starts over from `frames` after the source went back in time."""
+        print(f"DCS source rewound to {get_frame_timestamp(frames)}, re-reading the latest frames")
+        self.epoch += 1
+        self.frame_buffer = None  # it drops frames older than its newest one
+        # the fleet model ignores frames older than its last one and the norm window holds the later frames;
+        # both start over (subscribers see the new epoch and reset what they track, e.g. the pressure predictor)
+        get_bank_fleet_model().rewind()
+        get_norm_estimator().rewind()
+        return frames, frames
+
+    def _read_new_frames(self, version):
+        """
+        Returns (frames, new_frames): the newest DCS_RECENT_FRAMES frames, newest first, and every frame not
+        seen before. Only the frames newer than the cached ones are read, unless nothing is cached yet or the
+        source went back in time (a looping replay wrapped, or the table was rewritten): its version decreased,
+        or it has no newer frame and its newest frame is older than the newest cached one. Then the latest
+        frames are read in full and replace the cache.
+        """
+        if self._frames is None or self._frames.num_rows == 0:
+            self.reads += 1
+            frames = self._source.read_latest(DCS_RECENT_FRAMES)
+            return frames, frames
+        if self._version_regressed(version):
+            self.reads += 1
+            return self._rewind(self._source.read_latest(DCS_RECENT_FRAMES))
+        last_timestamp = self._frames.column("TimeStamp")[0]
+        new_frames = self._source.read_range(start=last_timestamp.as_py())
+        new_frames = new_frames.filter(pc.greater(new_frames.column("TimeStamp"), last_timestamp))
+        self.incremental_reads += 1
+        if new_frames.num_rows == 0:
+            # an OPTIMIZE commit with no new data, or a source that went back in time
+            self.reads += 1
+            latest = self._source.read_latest(DCS_RECENT_FRAMES)
+            if latest.num_rows and pc.less(latest.column("TimeStamp")[0], last_timestamp).as_py():
+                return self._rewind(latest)
+            return self._frames, new_frames
+        frames = pa.concat_tables([new_frames.cast(self._frames.schema), self._frames])
+        order = pc.sort_indices(frames, sort_keys=[("TimeStamp", "descending")])
+        # only the cached window is truncated; the trackers and the frame store get every new frame
+        return pc.take(frames, order[:DCS_RECENT_FRAMES]), new_frames
+
+    def _track_frames(self, frames):
+        """
+        Feeds the frames not seen yet (oldest first) to the frame buffer, the bank fleet model and, except
+        the newest one that compute_dcs_constraints records, the caustic norm estimator. Returns the window
+        statistics and the fleet's bank constraint entries for the newest frame.
+        """
+        signal_names = get_compiled_signals().linear_names
+        if self.frame_buffer is None:
+            pressure_tags = [tag for tag in BANK_PRESSURE_TAGS if tag in frames.column_names]
+            self.frame_buffer = DcsFrameBuffer(signal_names + pressure_tags)
+        frames = pc.take(frames, pc.sort_indices(frames, sort_keys=[("TimeStamp", "ascending")]))
+        times = frame_times_s(frames)
+        tags = dcs_signal_inputs(frames)
+        signals = derive_dcs_signals(tags)
+        columns = [signals[name] for name in signal_names]
+        columns += [tags[tag] for tag in self.frame_buffer.columns[len(signal_names):]]
+        self.frame_buffer.extend(times, np.column_stack(columns))
+        record_norm_samples({name: values[:-1] for name, values in signals.items()})
+
+        fleet = get_bank_fleet_model()
+        for i, (filling, capacity, compressors_on) in enumerate(zip(*bank_fleet_inputs(tags))):
+            outputs = fleet.update(times[i], filling, capacity, compressors_on)
+        fleet_constraints = bank_constraints(outputs, signals["bank_available"][-1])
+        return self.frame_buffer.window_stats(signal_names), fleet_constraints
+
+    def _refresh(self):
+        if self._source is None:
+            self._source = get_dcs_source()
+        self._source.refresh()
+        self.version_checks += 1
+        version = self._source.version()
+        if self._snapshot is None or version != self._version:
+            print(f"Reading DCS Data ({self._source.name} version {version})...")
+            frames, new_frames = self._read_new_frames(version)
+            if new_frames.num_rows:
+                quality = check_dcs_quality(frames)
+                if describe_quality(quality):
+                    print(f"DCS data quality ({get_frame_timestamp(frames)}): {describe_quality(quality)}")
+                window_stats, fleet_constraints = self._track_frames(new_frames)
+                dcs_constraints, current_flow = compute_dcs_constraints(frames)
+                if DCS_FRAME_STORE_ENABLED:
+                    try:
+                        get_dcs_frame_store().append(new_frames)
+                    except Exception as e:
+                        print(f"Could not store DCS frames locally: {e}")
+                dcs_constraints.update({k: round(v, 2) for k, v in fleet_constraints.items()})
+                self._frames = frames
+                self._snapshot = {
+                    "timestamp": get_frame_timestamp(frames),
+                    "version": version,
+                    "epoch": self.epoch,  # bumped whenever the source goes back in time
+                    "dcs_constraints": dcs_constraints,
+                    "current_flow": current_flow,
+                    "raw_data": frames.to_pandas(),  # for display and the published run only
+                    "window_stats": window_stats,
+                    "quality": quality,
+                    "bank_pressure_changing": check_bank_filling_status(self.frame_buffer),
+                }
+            self._version = version
+        self._checked_at = time.monotonic()
+
+    def stats(self):
+        return {"version": self._version, "hits": self.hits, "version_checks": self.version_checks,
+                "reads": self.reads, "incremental_reads": self.incremental_reads, "epoch": self.epoch}
+
+
+class DcsLogWatcher:
+    """
+    Background thread that checks the DCS source's version every `interval_s` (for Delta a log read, no data
+    files) and, when a commit lands, has the cache fetch just the new rows. Subscribers of the cache get the
+    new snapshot straight away, so nobody waits on a fetch at request time. `active()` gates the polling,
+    e.g. so only the optimizer leader reads DCS.
+    """
+
+    def __init__(self, cache, interval_s=DCS_WATCH_INTERVAL_S, active=lambda: True):
+        self.cache = cache
+        self.interval_s = interval_s
+        self.active = active
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch_loop, name="dcs-log-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch_loop(self):
+        while not self._stop_event.wait(self.interval_s):
+            if not self.active():
+                continue
+            try:
+                self.cache.get(max_age_s=0)
+            except Exception as e:
+                print(f"DCS log watcher check failed: {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_dcs_snapshot_cache():
+    """Returns the process-wide DcsSnapshotCache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DcsSnapshotCache()
+        return _cache
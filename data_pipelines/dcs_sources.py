@@ -0,0 +1,225 @@
+import glob
+import os
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from deltalake import DeltaTable
+
+from data_pipelines.delta_table import (scan_latest_frames, scan_frame_range, scan_frame_batches,
+                                        latest_timestamp_from_stats, decode_dcs_table)
+from params import *
+
+# Where DCS frames come from, chosen by H2_DCS_SOURCE (see params.py):
+#   azure   the DCS_Tag1_st Delta table on ADLS (production)
+#   local   a Delta table or a directory of Parquet files on disk
+#   replay  recorded frames played back at DCS_REPLAY_SPEEDUP x real time, for offline benchmarks and soak tests
+# Every source returns decoded Arrow tables (see decode_dcs_table) and a version token that changes when new
+# frames are available.
+
+
+class DcsSource:
+    """Interface of a DCS frame source."""
+    name = "base"
+
+    def refresh(self):
+        """Picks up frames committed since the last call. Must be cheap when nothing changed."""
+
+    def version(self):
+        """Token that changes whenever new frames are visible."""
+        raise NotImplementedError
+
+    def read_latest(self, n_frames=10):
+        """The newest `n_frames` frames, newest first."""
+        raise NotImplementedError
+
+    def read_range(self, start=None, end=None):
+        """Every frame with start <= TimeStamp <= end, oldest first."""
+        raise NotImplementedError
+
+    def iter_batches(self, start, end, batch_size=DCS_HISTORY_BATCH_ROWS):
+        """Streams the frames with start <= TimeStamp < end in bounded batches, in no particular order."""
+        raise NotImplementedError
+
+    def pin_version(self, version):
+        """Reads from `version` from now on, if the source keeps versions. Returns False if it does not."""
+        return False
+
+
+class DeltaDcsSource(DcsSource):
+    """A Delta table, kept open between reads; `refresh()` only replays new commits from the log."""
+    name = "delta"
+
+    def __init__(self, table_uri, storage_options=None):
+        self.table_uri = table_uri
+        self.dt = DeltaTable(table_uri, storage_options=storage_options)
+
+    def refresh(self):
+        self.dt.update_incremental()
+
+    def version(self):
+        return self.dt.version()
+
+    def read_latest(self, n_frames=10):
+        return scan_latest_frames(self.dt.to_pyarrow_dataset(), n_frames, latest_timestamp_from_stats(self.dt))
+
+    def read_range(self, start=None, end=None):
+        return scan_frame_range(self.dt.to_pyarrow_dataset(), start, end)
+
+    def iter_batches(self, start, end, batch_size=DCS_HISTORY_BATCH_ROWS):
+        return scan_frame_batches(self.dt.to_pyarrow_dataset(), start, end, batch_size)
+
+    def pin_version(self, version):
+        self.dt.load_as_version(version)
+        return True
+
+
+class AzureDeltaDcsSource(DeltaDcsSource):
+    """The production DCS table on ADLS. Credentials are passed as storage options, not via os.environ."""
+    name = "azure"
+
+    def __init__(self, table_name='DCS_Tag1_st'):
+        # imported here so the local and replay sources run without ADLS credentials
+        from parameters.credentials import storage_account_name, storage_account_key, container_name
+        storage_options = {"account_name": storage_account_name,
+                           "account_key": storage_account_key,
+                           }
+        delta_table_path = (f"abfss://{container_name}@{storage_account_name}.dfs.core.windows.net"
+                            f"/Margin_Maximizer_db/external/{table_name}")
+        super().__init__(delta_table_path, storage_options)
+
+
+class ParquetDcsSource(DcsSource):
+    """A directory of Parquet files, e.g. an export of the DCS table. New files show up on `refresh()`."""
+    name = "parquet"
+
+    def __init__(self, path):
+        self.path = path
+        self._files = ()
+        self._dataset = None
+        self.refresh()
+
+    def refresh(self):
+        files = tuple(sorted(glob.glob(os.path.join(self.path, "**", "*.parquet"), recursive=True)))
+        if files != self._files or self._dataset is None:
+            self._files = files
+            self._dataset = ds.dataset(list(files), format="parquet")
+
+    def version(self):
+        return (len(self._files), max((os.path.getmtime(f) for f in self._files), default=0))
+
+    def read_latest(self, n_frames=10):
+        return scan_latest_frames(self._dataset, n_frames)
+
+    def read_range(self, start=None, end=None):
+        return scan_frame_range(self._dataset, start, end)
+
+    def iter_batches(self, start, end, batch_size=DCS_HISTORY_BATCH_ROWS):
+        return scan_frame_batches(self._dataset, start, end, batch_size)
+
+
+def load_recorded_frames(path):
+    """
+    Reads recorded frames from an Arrow corpus (memory-mapped, see xlsx_corpus.py), a Parquet/CSV/Excel
+    file or a Parquet directory as a decoded table, oldest first.
+    """
+    if path.endswith(".arrow"):
+        # imported here, xlsx_corpus depends on this module through history_ingest
+        from data_pipelines.xlsx_corpus import load_dcs_corpus
+        return load_dcs_corpus(path, signals=False)  # already decoded and sorted
+    if os.path.isdir(path) or path.endswith(".parquet"):
+        table = ds.dataset(path, format="parquet").to_table()
+    else:
+        data = pd.read_excel(path) if path.endswith((".xlsx", ".xls")) else pd.read_csv(path)
+        data['TimeStamp'] = pd.to_datetime(data['TimeStamp'])
+        table = pa.Table.from_pandas(data, preserve_index=False)
+    table = pc.take(table, pc.sort_indices(table, sort_keys=[("TimeStamp", "ascending")]))
+    return decode_dcs_table(table)
+
+
+class ReplayDcsSource(DcsSource):
+    """
+    Plays recorded frames back as if they were arriving live, `speedup` times faster than they were
+    recorded: at wall time t after the first read, every frame up to first TimeStamp + t * speedup is
+    visible. With `loop` the recording restarts once it has been played to the end.
+    """
+    name = "replay"
+
+    def __init__(self, path, speedup=DCS_REPLAY_SPEEDUP, loop=False):
+        self.path = path
+        self.speedup = speedup
+        self.loop = loop
+        self.frames = load_recorded_frames(path)
+        self._times = pc.cast(self.frames.column("TimeStamp"), pa.timestamp("us")).to_numpy().astype("int64")
+        self._started_at = None
+        self._visible = 0
+        self._lock = threading.Lock()
+        print(f"Replaying {self.frames.num_rows} DCS frames from {path} at {speedup}x")
+
+    def refresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._started_at is None:
+                self._started_at = now
+            span_us = self._times[-1] - self._times[0]
+            elapsed_us = int((now - self._started_at) * self.speedup * 1e6)
+            if self.loop and span_us > 0:
+                elapsed_us %= span_us + 1
+            visible = int(self._times.searchsorted(self._times[0] + elapsed_us, side="right"))
+            self._visible = max(visible, 1)
+
+    def version(self):
+        return self._visible
+
+    def read_latest(self, n_frames=10):
+        if self._started_at is None:
+            self.refresh()
+        end = self._visible
+        start = max(0, end - n_frames)
+        return pc.take(self.frames, pa.array(range(end - 1, start - 1, -1)))
+
+    def read_range(self, start=None, end=None):
+        visible = self.frames.slice(0, self._visible if self._started_at is not None else self.frames.num_rows)
+        timestamps = pc.cast(visible.column("TimeStamp"), pa.timestamp("us"))
+        mask = pa.array([True] * visible.num_rows)
+        if start is not None:
+            mask = pc.and_(mask, pc.greater_equal(timestamps, pa.scalar(pd.Timestamp(start), pa.timestamp("us"))))
+        if end is not None:
+            mask = pc.and_(mask, pc.less_equal(timestamps, pa.scalar(pd.Timestamp(end), pa.timestamp("us"))))
+        return visible.filter(mask)
+
+    def iter_batches(self, start, end, batch_size=DCS_HISTORY_BATCH_ROWS):
+        frames = self.read_range(start, end)
+        timestamps = pc.cast(frames.column("TimeStamp"), pa.timestamp("us"))
+        frames = frames.filter(pc.less(timestamps, pa.scalar(pd.Timestamp(end), pa.timestamp("us"))))
+        for offset in range(0, frames.num_rows, batch_size):
+            yield frames.slice(offset, batch_size)
+
+
+def create_dcs_source(kind=DCS_SOURCE, path=DCS_SOURCE_PATH):
+    """Builds the configured DCS source."""
+    if kind == "azure":
+        return AzureDeltaDcsSource()
+    if kind == "local":
+        if os.path.isdir(os.path.join(path, "_delta_log")):
+            return DeltaDcsSource(path)
+        return ParquetDcsSource(path)
+    if kind == "replay":
+        return ReplayDcsSource(path or DCS_CORPUS_PATH, speedup=DCS_REPLAY_SPEEDUP, loop=DCS_REPLAY_LOOP)
+    raise ValueError(f"Unknown DCS source '{kind}', expected azure, local or replay")
+
+
+_source = None
+_source_lock = threading.Lock()
+
+
+def get_dcs_source():
+    """Returns the process-wide DCS source, creating it on first use."""
+    global _source
+    with _source_lock:
+        if _source is None:
+            _source = create_dcs_source()
+        return _source
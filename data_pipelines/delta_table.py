@@ -1,177 +1,269 @@
-import decimal
-import os
-import streamlit as st
 import numpy as np
+import pandas as pd
+import pyarrow as pa
 import pyarrow.compute as pc
-from deltalake import DeltaTable
-from data_pipelines.bank_parameter_generation import get_bank_data, get_bank_compressors_data, vent_check
-from database import save_norm_value, get_latest_norm_value
+from data_pipelines.signal_formulas import get_compiled_signals
+from data_pipelines.norm_estimator import get_norm_estimator
 
 from parameters.constants import *
-from parameters.credentials import *
+from params import DCS_READ_WINDOW_MIN, DCS_READ_WINDOW_WIDENINGS, DCS_HISTORY_BATCH_ROWS
 
 
-def get_dcs_data_table(table_name):
-    # Set credentials via environment variables for adlfs to work with DeltaTable
-    print("Reading DCS Data...")
-    os.environ["AZURE_STORAGE_ACCOUNT_NAME"] = storage_account_name
-    os.environ["AZURE_STORAGE_ACCOUNT_KEY"] = storage_account_key
+# --- Scans ---
+# Shared by every DCS source in data_pipelines/dcs_sources.py; they hand in a pyarrow dataset.
+
+def _timestamp_scalar(value, timestamp_type):
+    return pa.scalar(pd.Timestamp(value).to_pydatetime(), timestamp_type)
+
+
+def _dcs_columns(dataset):
+    """TimeStamp plus the mapped tags (as codes or already renamed): the only columns the pipeline reads."""
+    mapped_names = set(column_name_mapping.values())
+    return [name for name in dataset.schema.names
+            if name == "TimeStamp" or name in column_name_mapping or name in mapped_names]
+
+
+def latest_timestamp_from_stats(dt):
+    """
+    Newest TimeStamp according to the per-file max statistics in the Delta log, or None if the log has no
+    statistics for it. Reads only the log, no data files.
+    """
+    try:
+        actions = pa.table(dt.get_add_actions(flatten=True))  # an arro3 table (Arrow C stream) on deltalake 1.x
+        if "max.TimeStamp" not in actions.schema.names or actions.num_rows == 0:
+            return None
+        return pc.max(actions.column("max.TimeStamp")).as_py()
+    except Exception as e:
+        print(f"Could not read TimeStamp statistics from the Delta log: {e}")
+        return None
+
+
+def scan_latest_frames(dataset, n_frames=10, newest=None):
+    """
+    Reads the newest `n_frames` DCS frames of a dataset, newest first, decoded with decode_dcs_table.
+
+    With `newest` (e.g. from the Delta statistics) only frames within DCS_READ_WINDOW_MIN of it are scanned:
+    the filter is pushed into the dataset scan, whose Delta fragments carry the file min/max statistics, so
+    files whose TimeStamp range ends before it are never opened, and only the mapped tags are read. The
+    window widens until it holds `n_frames` rows; otherwise there is one full (projected) scan.
+    """
+    columns = _dcs_columns(dataset)
+    timestamp_type = dataset.schema.field("TimeStamp").type
+
+    table = None
+    if newest is not None:
+        window = pd.Timedelta(minutes=DCS_READ_WINDOW_MIN)
+        for _ in range(DCS_READ_WINDOW_WIDENINGS + 1):
+            lower_bound = _timestamp_scalar(pd.Timestamp(newest) - window, timestamp_type)
+            table = dataset.to_table(columns=columns, filter=pc.field("TimeStamp") >= lower_bound)
+            if table.num_rows >= n_frames:
+                break
+            window *= 4
+    if table is None or table.num_rows == 0:
+        table = dataset.to_table(columns=columns)
 
-    storage_options = {"account_name": storage_account_name,
-                       "account_key": storage_account_key,
-                       }
-    delta_table_path = f"abfss://{container_name}@{storage_account_name}.dfs.core.windows.net/Margin_Maximizer_db/external/{table_name}"
-    dt = DeltaTable(delta_table_path, storage_options=storage_options)
-    table = dt.to_pyarrow_table()
     sorted_indices = pc.sort_indices(table, sort_keys=[("TimeStamp", "descending")])
-    sorted_table = pc.take(table, sorted_indices[:10])
+    return decode_dcs_table(pc.take(table, sorted_indices[:n_frames]))
+
+
+def time_range_filter(start, end, timestamp_type, end_exclusive=False):
+    """Dataset filter for start <= TimeStamp <= end (< end with `end_exclusive`); either bound may be None."""
+    row_filter = None
+    if start is not None:
+        row_filter = pc.field("TimeStamp") >= _timestamp_scalar(start, timestamp_type)
+    if end is not None:
+        end_value = _timestamp_scalar(end, timestamp_type)
+        upper = pc.field("TimeStamp") < end_value if end_exclusive else pc.field("TimeStamp") <= end_value
+        row_filter = upper if row_filter is None else row_filter & upper
+    return row_filter
+
 
-    pdf = sorted_table.to_pandas()
-    pdf.rename(columns=column_name_mapping, inplace=True)
-    return pdf
+def scan_frame_range(dataset, start=None, end=None):
+    """Reads every DCS frame with start <= TimeStamp <= end, oldest first. The range is pushed into the scan."""
+    row_filter = time_range_filter(start, end, dataset.schema.field("TimeStamp").type)
+    table = dataset.to_table(columns=_dcs_columns(dataset), filter=row_filter)
+    table = pc.take(table, pc.sort_indices(table, sort_keys=[("TimeStamp", "ascending")]))
+    return decode_dcs_table(table)
 
 
-def populate_latest_dcs_constraints():
-    data = get_dcs_data_table(table_name='DCS_Tag1_st')
-    data = data.apply(np.vectorize(lambda x: float(x) if isinstance(x, decimal.Decimal) else x))
-    data = data.fillna(0)
-    print("DCS Data Fetched")
-    st.session_state.dcs_raw_data = data
+def scan_frame_batches(dataset, start, end, batch_size=DCS_HISTORY_BATCH_ROWS):
+    """
+    Streams the frames with start <= TimeStamp < end as decoded tables of at most `batch_size` rows, in scan
+    order. Only one batch is held in memory at a time.
+    """
+    row_filter = time_range_filter(start, end, dataset.schema.field("TimeStamp").type, end_exclusive=True)
+    for batch in dataset.to_batches(columns=_dcs_columns(dataset), filter=row_filter, batch_size=batch_size):
+        if batch.num_rows:
+            yield decode_dcs_table(pa.Table.from_batches([batch]))
 
-    data = data.iloc[:1]
 
-    caustic_production = (data['Caustic_Caustic Production_332tpd_TPH'].values[0] +
-                          data['Caustic_Caustic Production_450tpd_TPH'].values[0] +
-                          data['Caustic_Caustic Production_600tpd_TPH'].values[0] +
-                          data['Caustic_Caustic Production_850tpd_TPH'].values[0]) / 24  # original data in TPD
+# --- Decoding ---
 
-    # pipeline_flow = data['Hydrogen_Pipeline_current_NM3_per_hr'].values[0]
-    pipeline_flow = (data['AARTI_H2_PIPELINE_SUPPLY'].values[0] + data['FARMSON_H2_PIPELINE_SUPPLY'].values[0] +
-                     data['VALIANT_1_H2_PIPELINE_SUPPLY'].values[0] + data['GULSHANH2_PIPELINE_SUPPLY'].values[0] +
-                     data['PANOLIH2_PIPELINE_SUPPLY'].values[0] + data['VALIANT_2_H2_PIPELINE_SUPPLY'].values[0] +
-                     data['CHEMIE_H2_PIPELINE_SUPPLY'].values[0] + data['LANXESS_H2_PIPELINE_SUPPLY'].values[0] +
-                     data['ANUPAM_RASAYAN_H2_PIPELINE_SUPPLY'].values[0] + data['UPL_5_H2_PIPELINE_SUPPLY'].values[0])
+def decode_dcs_table(table):
+    """
+    Decodes raw DCS frames in Arrow: decimal and integer tags are cast to float64, nulls are filled with 0
+    and the tag codes are renamed via column_name_mapping. TimeStamp and non-numeric columns are kept as-is.
+    """
+    decoded = []
+    for name, column in zip(table.column_names, table.columns):
+        if name != "TimeStamp" and (pa.types.is_decimal(column.type) or pa.types.is_integer(column.type)
+                                    or pa.types.is_floating(column.type) or pa.types.is_boolean(column.type)):
+            column = pc.fill_null(pc.cast(column, pa.float64()), 0.0)
+        decoded.append(column)
+    names = [column_name_mapping.get(name, name) for name in table.column_names]
+    return pa.Table.from_arrays(decoded, names=names)
 
-    header_pressure = data['Hydrogen_Header_pressure_current_kgf_per_cm2'].values[0]
 
-    bank_available_quantity, number_of_banks_available = get_bank_data(data)
+def clean_dcs_frames(data):
+    """Decodes a pandas frame of DCS tags (e.g. read from a file) the same way as decode_dcs_table."""
+    return decode_dcs_table(pa.Table.from_pandas(data, preserve_index=False)).to_pandas()
 
-    # original data in TPD
-    hcl_production = (data['1350TPD_HCL_FURNACE_1'].values[0] + data['1350TPD_HCL_FURNACE_2'].values[0] +
-                      data['1350TPD_HCL_FURNACE_3'].values[0] + data['1350TPD_HCL_FURNACE_4'].values[0] +
-                      data['850TPD_HCL_FURNACE_A'].values[0] + data['850TPD_HCL_FURNACE_B'].values[0]) / 24
 
-    h2o2_production = data['H2O2_H2O2_current_TPH'].values[
-                          0] / 2000  # original data in KG/H # original data in 50% conc
-    flaker1_load = data['Flaker_450tpd_current_load_TPH'].values[0] / 24  # original data in TPD
-    flaker2_load = data['Flaker_600tpd_current_load_TPH'].values[0] / 24  # original data in TPD
-    flaker3_load = data['Flaker_850tpd_current_load_TPH_1'].values[0] / 24  # original data in TPD
-    flaker4_load = data['Flaker_850tpd_current_load_TPH_2'].values[0] / 24  # original data in TPD
+def dcs_signal_inputs(data):
+    """Tag name -> float64 NumPy array over all frames, from a decoded Arrow table or a pandas frame."""
+    if isinstance(data, pa.Table):
+        return {name: column.to_numpy() for name, column in zip(data.column_names, data.columns)
+                if name != "TimeStamp"}
+    return {name: data[name].to_numpy() for name in data.columns if name != "TimeStamp"}
 
-    flaker3_consumption_norm = (data['Flaker_850tpd_running_or_not_binary_1'].values[0] + (
-            data['NG_flow_in_Flaker3'].values[0] * (220 / 67))) / (
-                                       data['Flaker_850tpd_current_load_TPH_1'].values[0] / 24)
 
-    flaker4_consumption_norm = (data['Flaker_850tpd_running_or_not_binary_2'].values[0] + (
-            data['NG_flow_in_Flaker4'].values[0] * (220 / 67))) / (
-                                       data['Flaker_850tpd_current_load_TPH_2'].values[0] / 24)
+def get_frame_timestamp(data):
+    """Returns the TimeStamp of the newest DCS frame, or None if it is not available."""
+    if isinstance(data, pa.Table):
+        if 'TimeStamp' not in data.column_names or data.num_rows == 0:
+            return None
+        return str(pd.Timestamp(data.column('TimeStamp')[0].as_py()))
+    if 'TimeStamp' not in data.columns or data.empty:
+        return None
+    return str(data['TimeStamp'].iloc[0])
 
-    boiler_p60_run = 1 if data['Boiler_P60_running_or_not_binary'].values[0] > 0 else 0
-    boiler_p120_run = 1 if data['Boiler_P120_running_or_not_binary'].values[0] > 0 else 0
 
-    ech_flow = data['ECH_H2_PIPELINE_SUPPLY'].values[0]
+def frame_times_s(data):
+    """TimeStamp of every frame as float seconds since epoch, from a decoded Arrow table or a pandas frame."""
+    if isinstance(data, pa.Table):
+        times = pc.cast(data.column('TimeStamp'), pa.timestamp("us")).to_numpy()
+    else:
+        times = pd.to_datetime(data['TimeStamp']).to_numpy()
+    return times.astype('datetime64[us]').astype('int64') / 1e6
+
+
+# --- Derived signals ---
 
-    h2_in_hcl = (data['H2_FLOW_TO_HCL_FURNACE_1'].values[0] + data['H2_FLOW_TO_HCL_FURNACE_2'].values[0] +
-                 data['H2_FLOW_TO_HCL_FURNACE_3'].values[0] + data['H2_FLOW_TO_HCL_FURNACE_4'].values[0] +
-                 data['H2_FLOW_TO_HCL_FURNACE_5'].values[0] + data['H2_FLOW_TO_HCL_FURNACE_6'].values[0])
+def derive_dcs_signals(tags):
+    """
+    Computes every derived DCS signal for all frames at once from the formulas in SIGNAL_SPEC_PATH.
 
-    flaker1_flow = data['Flaker_450tpd_running_or_not_binary'].values[0]
-    flaker2_flow = data['Flaker_600tpd_running_or_not_binary'].values[0]
+    Args:
+        tags (dict): tag name -> float64 array over frames (see dcs_signal_inputs)
 
-    venting_check = vent_check(data)
+    Returns:
+        dict: signal name -> array over frames
+    """
+    return get_compiled_signals().evaluate(tags)
 
-    total_bank_flow = get_bank_compressors_data(data)
-    bank_in_filling = 1 if total_bank_flow > 0 else 0
+
+def compute_dcs_constraints(data, record_norm=True):
+    """
+    Derives the optimizer's DCS constraints and current flows from the newest DCS frame of a decoded Arrow
+    table or pandas frame. `record_norm=False` leaves the caustic norm log alone, e.g. when replaying
+    historical frames.
+    """
+    data = data.slice(0, 1) if isinstance(data, pa.Table) else data.iloc[:1]
+    tags = dcs_signal_inputs(data)
+    signals = {name: values[0] for name, values in derive_dcs_signals(tags).items()}
+
+    venting_check = int(signals["venting"])
+    bank_in_filling = int(signals["bank_in_filling"])
+    total_bank_flow = signals["total_bank_flow"]
 
     dcs_constraints = {
-        "332tpd_caustic": data['Caustic_Caustic Production_332tpd_TPH'].values[0],
-        "450tpd_caustic": data['Caustic_Caustic Production_450tpd_TPH'].values[0],
-        "600tpd_caustic": data['Caustic_Caustic Production_600tpd_TPH'].values[0],
-        "850tpd_caustic": data['Caustic_Caustic Production_850tpd_TPH'].values[0],
-
-        "caustic_production": caustic_production,
-        "pipeline_flow": pipeline_flow,
-        "header_pressure": header_pressure,
-        "bank_available": bank_available_quantity,
-        'hcl_production': hcl_production,
-        "h2o2_production": h2o2_production,
-        "flaker-1_load": flaker1_load,
-        "flaker-2_load": flaker2_load,
-        "flaker-3_load": flaker3_load,
-        "flaker-4_load": flaker4_load,
-        "flaker-3_consumption_norm": flaker3_consumption_norm,
-        "flaker-4_consumption_norm": flaker4_consumption_norm,
-        "boiler_p60_run": boiler_p60_run,
-        "boiler_p120_run": boiler_p120_run,
-        "hcl_h2_flow": h2_in_hcl + ech_flow,
-        "h2o2_h2_flow": data['H2O2_H2_current_NM3_per_hr'].values[0],
-        "flaker-1_h2_flow": flaker1_flow,
-        "flaker-2_h2_flow": flaker2_flow,
-        "flaker-3_h2_flow": data['Flaker_850tpd_running_or_not_binary_1'].values[0],
-        "flaker-4_h2_flow": data['Flaker_850tpd_running_or_not_binary_2'].values[0],
-        "pipeline_disruption_hrs": data['pipeline_disruption_hrs'].values[0],
+        "332tpd_caustic": tags.get('Caustic_Caustic Production_332tpd_TPH', [0.0])[0],
+        "450tpd_caustic": tags.get('Caustic_Caustic Production_450tpd_TPH', [0.0])[0],
+        "600tpd_caustic": tags.get('Caustic_Caustic Production_600tpd_TPH', [0.0])[0],
+        "850tpd_caustic": tags.get('Caustic_Caustic Production_850tpd_TPH', [0.0])[0],
+
+        "caustic_production": signals["caustic_production"],
+        "pipeline_flow": signals["pipeline_flow"],
+        "header_pressure": signals["header_pressure"],
+        "bank_available": signals["bank_available"],
+        'hcl_production': signals["hcl_production"],
+        "h2o2_production": signals["h2o2_production"],
+        "flaker-1_load": signals["flaker1_load"],
+        "flaker-2_load": signals["flaker2_load"],
+        "flaker-3_load": signals["flaker3_load"],
+        "flaker-4_load": signals["flaker4_load"],
+        "flaker-3_consumption_norm": signals["flaker3_consumption_norm"],
+        "flaker-4_consumption_norm": signals["flaker4_consumption_norm"],
+        "boiler_p60_run": int(signals["boiler_p60_run"]),
+        "boiler_p120_run": int(signals["boiler_p120_run"]),
+        "hcl_h2_flow": signals["h2_in_hcl"] + signals["ech_flow"],
+        "h2o2_h2_flow": signals["h2o2_flow"],
+        "flaker-1_h2_flow": signals["flaker1_flow"],
+        "flaker-2_h2_flow": signals["flaker2_flow"],
+        "flaker-3_h2_flow": signals["flaker3_flow"],
+        "flaker-4_h2_flow": signals["flaker4_flow"],
+        "pipeline_disruption_hrs": signals["pipeline_disruption_hrs"],
         "is_bank_on": bank_in_filling,
         "is_vent_on": venting_check,
-        "number_of_banks": number_of_banks_available,
+        "number_of_banks": signals["number_of_banks"],
         "calculated_bank_flow": total_bank_flow,
-        "total_h2_flow": (pipeline_flow + h2_in_hcl + ech_flow + total_bank_flow +
-                          data['Flaker_450tpd_running_or_not_binary'].values[0] +
-                          data['Flaker_600tpd_running_or_not_binary'].values[0] +
-                          data['Flaker_850tpd_running_or_not_binary_1'].values[0] +
-                          data['Flaker_850tpd_running_or_not_binary_2'].values[0] +
-                          data['H2O2_H2_current_NM3_per_hr'].values[0] +
-                          data['Boiler_P60_current_H2_NM3_per_hr'].values[0] +
-                          data['Boiler_P120_current_H2_NM3_per_hr'].values[0])
+        "total_h2_flow": signals["total_h2_flow"],
     }
 
-    balance = (caustic_production * 280) - (pipeline_flow + total_bank_flow +
-                                            h2_in_hcl + ech_flow +
-                                            data['Flaker_450tpd_running_or_not_binary'].values[0] +
-                                            data['Flaker_600tpd_running_or_not_binary'].values[0] +
-                                            data['Flaker_850tpd_running_or_not_binary_1'].values[0] +
-                                            data['Flaker_850tpd_running_or_not_binary_2'].values[0] +
-                                            data['H2O2_H2_current_NM3_per_hr'].values[0] +
-                                            data['Boiler_P60_current_H2_NM3_per_hr'].values[0] +
-                                            data['Boiler_P120_current_H2_NM3_per_hr'].values[0])
-
     current_flow = {
-        "pipeline": pipeline_flow,
+        "pipeline": signals["pipeline_flow"],
         "bank": total_bank_flow if bank_in_filling == 1 else 0,
-        "ech_flow": ech_flow,
-        "hcl": h2_in_hcl + ech_flow,
-        "flaker-1": 0 if flaker1_flow < 10 else flaker1_flow,
-        "flaker-2": 0 if flaker2_flow < 10 else flaker2_flow,
-        "flaker-3": data['Flaker_850tpd_running_or_not_binary_1'].values[0],
-        "flaker-4": data['Flaker_850tpd_running_or_not_binary_2'].values[0],
-        "h2o2": data['H2O2_H2_current_NM3_per_hr'].values[0],
-        "boiler_p60": data['Boiler_P60_current_H2_NM3_per_hr'].values[0],
-        "boiler_p120": data['Boiler_P120_current_H2_NM3_per_hr'].values[0],
-        "vent": balance if venting_check == 1 else 0
+        "ech_flow": signals["ech_flow"],
+        "hcl": signals["h2_in_hcl"] + signals["ech_flow"],
+        "flaker-1": 0 if signals["flaker1_flow"] < 10 else signals["flaker1_flow"],
+        "flaker-2": 0 if signals["flaker2_flow"] < 10 else signals["flaker2_flow"],
+        "flaker-3": signals["flaker3_flow"],
+        "flaker-4": signals["flaker4_flow"],
+        "h2o2": signals["h2o2_flow"],
+        "boiler_p60": signals["boiler_p60_flow"],
+        "boiler_p120": signals["boiler_p120_flow"],
+        "vent": signals["balance"] if venting_check == 1 else 0
     }
-    dcs_constraints = {k: round(v if v >= 0 else 0, 2) for k, v in dcs_constraints.items()}
-    current_flow = {k: round(v if v >= 0 else 0, 2) for k, v in current_flow.items()}
+    # negative and non-finite values (e.g. a consumption norm with the flaker stopped) are zeroed here;
+    # data_pipelines/data_quality.py reports them
+    dcs_constraints = {k: round(v if np.isfinite(v) and v >= 0 else 0, 2) for k, v in dcs_constraints.items()}
+    current_flow = {k: round(v if np.isfinite(v) and v >= 0 else 0, 2) for k, v in current_flow.items()}
 
-    caustic_production_norm = process_norm(dcs_constraints)
+    caustic_production_norm = process_norm(dcs_constraints, record_norm)
     dcs_constraints["caustic_production_norm"] = round(caustic_production_norm, 2)
 
     return dcs_constraints, current_flow
 
 
-def process_norm(dcs_constraints):
-    if dcs_constraints["is_vent_on"] == 0:
-        caustic_production_norm = dcs_constraints['total_h2_flow'] / dcs_constraints['caustic_production']
-        save_norm_value(caustic_production_norm)
-    else:
-        caustic_production_norm = get_latest_norm_value()
+def record_norm_samples(signals):
+    """
+    Feeds the caustic norm estimator one sample per non-venting frame of `signals` (signal name -> array over
+    frames, oldest first, see derive_dcs_signals), cleaned like compute_dcs_constraints does for one frame.
+    """
+    def cleaned(values):
+        values = np.asarray(values, dtype=float)
+        return np.round(np.where(np.isfinite(values) & (values >= 0), values, 0), 2)
 
-    return caustic_production_norm
+    venting = np.asarray(signals["venting"], dtype=float) > 0
+    caustic_production = cleaned(signals["caustic_production"])
+    total_h2_flow = cleaned(signals["total_h2_flow"])
+    estimator = get_norm_estimator()
+    for i in np.flatnonzero(~venting):
+        estimator.update(total_h2_flow[i] / caustic_production[i] if caustic_production[i] else float('nan'))
+
+
+def process_norm(dcs_constraints, record_norm=True):
+    """
+    Caustic consumption norm for a frame. Non-venting frames feed the online estimator, which serves the
+    norm (also while venting) without a database read. With `record_norm=False` the estimator is left
+    alone and a non-venting frame uses its own norm.
+    """
+    estimator = get_norm_estimator()
+    if dcs_constraints["is_vent_on"] == 0:
+        caustic_production = dcs_constraints['caustic_production']
+        sample = dcs_constraints['total_h2_flow'] / caustic_production if caustic_production else float('nan')
+        if record_norm:
+            return estimator.update(sample)
+        if sample == sample:
+            return sample
+    return estimator.value()
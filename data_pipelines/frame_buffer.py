@@ -0,0 +1,129 @@
+import threading
+
+import numpy as np
+
+from params import *
+
+
+class DcsFrameBuffer:
+    """
+    Fixed-size ring buffer of recent DCS frames, one float64 column per signal, preallocated once.
+
+    Each push updates the rolling statistics over the newest `window` frames incrementally: a running sum
+    gives the mean in O(1), a per-column sorted copy of the window gives the median (the leaving value is
+    swapped for the new one and only the window is re-sorted), and the delta reads two slots. Nothing is
+    re-read from DCS to look back in time.
+    """
+
+    def __init__(self, columns, capacity=DCS_BUFFER_CAPACITY, window=DCS_BUFFER_WINDOW):
+        if not 1 <= window <= capacity:
+            raise ValueError(f"window must be between 1 and capacity ({capacity}), got {window}")
+        self.columns = list(columns)
+        self.capacity = capacity
+        self.window = window
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        self._values = np.zeros((capacity, len(self.columns)))
+        self._times = np.zeros(capacity)  # frame time, seconds since epoch
+        self._count = 0  # frames pushed so far
+        self._window_sum = np.zeros(len(self.columns))
+        self._window_sorted = np.empty((0, len(self.columns)))
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def last_time(self):
+        return self._times[(self._count - 1) % self.capacity] if self._count else None
+
+    def _slot(self, age):
+        """Ring slot of the frame `age` frames before the newest one."""
+        return (self._count - 1 - age) % self.capacity
+
+    def push(self, frame_time, row):
+        """
+        Appends one frame (values in `self.columns` order). Frames not newer than the last one are ignored,
+        so the same frame can be offered twice. Non-finite values are stored as 0, like missing DCS tags.
+        Returns True if the frame was added.
+        """
+        with self._lock:
+            if self._count and frame_time <= self.last_time:
+                return False
+            row = np.nan_to_num(np.asarray(row, dtype=float), nan=0.0, posinf=0.0, neginf=0.0)
+            in_window = min(self._count, self.window)
+            if in_window == self.window:
+                leaving = self._values[self._slot(self.window - 1)]
+                self._window_sum += row - leaving
+                # swap the leaving value for the new one in each column, then restore the order
+                positions = np.argmax(self._window_sorted == leaving, axis=0)
+                self._window_sorted[positions, np.arange(len(self.columns))] = row
+                self._window_sorted.sort(axis=0)
+            else:
+                self._window_sum += row
+                self._window_sorted = np.sort(np.vstack([self._window_sorted, row]), axis=0)
+
+            slot = self._count % self.capacity
+            self._values[slot] = row
+            self._times[slot] = frame_time
+            self._count += 1
+            if self._count % self.capacity == 0:
+                # re-sum now and then so rounding errors of the running sum do not accumulate
+                self._window_sum = self._window_values().sum(axis=0)
+            return True
+
+    def extend(self, frame_times, rows):
+        """Pushes frames oldest first. Returns the number added."""
+        return sum(self.push(t, row) for t, row in zip(frame_times, rows))
+
+    def _window_values(self):
+        n = min(self._count, self.window)
+        return self._values[[self._slot(age) for age in range(n)]]
+
+    def latest(self, name):
+        with self._lock:
+            return self._values[self._slot(0), self._index[name]] if self._count else np.nan
+
+    def mean(self, name=None):
+        """Rolling mean over the window, of one column or of every column as an array."""
+        with self._lock:
+            n = min(self._count, self.window)
+            means = self._window_sum / n if n else np.full(len(self.columns), np.nan)
+        return means if name is None else means[self._index[name]]
+
+    def median(self, name=None):
+        """Rolling median over the window, of one column or of every column as an array."""
+        with self._lock:
+            sorted_window = self._window_sorted
+            n = len(sorted_window)
+            if n == 0:
+                medians = np.full(len(self.columns), np.nan)
+            elif n % 2:
+                medians = sorted_window[n // 2].copy()
+            else:
+                medians = (sorted_window[n // 2 - 1] + sorted_window[n // 2]) / 2
+        return medians if name is None else medians[self._index[name]]
+
+    def delta(self, name=None, lag=None):
+        """
+        Newest value minus the value `lag` frames earlier (default: the oldest frame of the window), of one
+        column or of every column. NaN until the buffer holds `lag` + 1 frames.
+        """
+        lag = self.window - 1 if lag is None else lag
+        if not 0 <= lag < self.capacity:
+            raise ValueError(f"lag must be between 0 and {self.capacity - 1}, got {lag}")
+        with self._lock:
+            if self._count <= lag:
+                deltas = np.full(len(self.columns), np.nan)
+            else:
+                deltas = self._values[self._slot(0)] - self._values[self._slot(lag)]
+        return deltas if name is None else deltas[self._index[name]]
+
+    def window_stats(self, names=None):
+        """name -> {"latest", "mean", "median", "delta"} over the window, for display."""
+        names = self.columns if names is None else names
+        means, medians, deltas = self.mean(), self.median(), self.delta()
+        with self._lock:
+            latest = self._values[self._slot(0)] if self._count else np.full(len(self.columns), np.nan)
+        return {name: {"latest": round(float(latest[i]), 2), "mean": round(float(means[i]), 2),
+                       "median": round(float(medians[i]), 2), "delta": round(float(deltas[i]), 2)}
+                for name, i in ((name, self._index[name]) for name in names)}
@@ -0,0 +1,147 @@
+import glob
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from data_pipelines.delta_table import time_range_filter
+from params import *
+
+# Local history of every decoded DCS frame the app fetched, so the exact input behind a recommendation can
+# be read back at disk speed instead of from ADLS. Layout:
+#   <root>/day=YYYY-MM-DD/part-<ms>-<id>.parquet   one small file per append
+#   <root>/day=YYYY-MM-DD/day.parquet              the day after compaction: deduplicated, sorted by TimeStamp
+# The files hold decoded tables (tag names, float64), so the directory also works as a local DCS source
+# (H2_DCS_SOURCE=local, H2_DCS_SOURCE_PATH=<root>).
+
+COMPACTED_FILE = "day.parquet"
+
+
+def _day(value):
+    return str(pd.Timestamp(value).date())
+
+
+def _frame_days(frames):
+    times = pc.cast(frames.column("TimeStamp"), pa.timestamp("us")).to_numpy()
+    return times.astype("datetime64[D]").astype(str)
+
+
+def sorted_unique_frames(table):
+    """Sorts by TimeStamp and keeps the last written row of every TimeStamp."""
+    table = table.append_column("_row", pa.array(np.arange(table.num_rows)))
+    table = pc.take(table, pc.sort_indices(table, sort_keys=[("TimeStamp", "ascending"), ("_row", "ascending")]))
+    times = pc.cast(table.column("TimeStamp"), pa.timestamp("us")).to_numpy()
+    keep = np.ones(len(times), dtype=bool)
+    keep[:-1] = times[1:] != times[:-1]
+    return table.filter(pa.array(keep)).drop_columns(["_row"])
+
+
+class DcsFrameStore:
+    """Append-only, day-partitioned Parquet store of decoded DCS frames with a range reader and compaction."""
+
+    def __init__(self, root=DCS_FRAME_STORE_DIR, row_group_rows=DCS_FRAME_STORE_ROW_GROUP_ROWS):
+        self.root = root
+        self.row_group_rows = row_group_rows
+        self._last_time = None  # newest TimeStamp appended by this process
+        self._lock = threading.Lock()
+        self.appended_frames = 0
+
+    def _day_dir(self, day):
+        return os.path.join(self.root, f"day={day}")
+
+    def days(self):
+        """Partition days present in the store, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name[len("day="):] for name in os.listdir(self.root) if name.startswith("day="))
+
+    def append(self, frames):
+        """
+        Writes the frames not appended before (newer than the last appended TimeStamp), one file per day
+        touched. Returns the number of frames written.
+        """
+        with self._lock:
+            if self._last_time is not None:
+                frames = frames.filter(pc.greater(pc.cast(frames.column("TimeStamp"), pa.timestamp("us")),
+                                                  pa.scalar(self._last_time, pa.timestamp("us"))))
+            if frames.num_rows == 0:
+                return 0
+            frames = sorted_unique_frames(frames)
+            days = _frame_days(frames)
+            for day in np.unique(days):
+                os.makedirs(self._day_dir(day), exist_ok=True)
+                name = f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet"
+                path = os.path.join(self._day_dir(day), name)
+                pq.write_table(frames.filter(pa.array(days == day)), path + ".tmp")
+                os.replace(path + ".tmp", path)
+            self._last_time = pc.cast(frames.column("TimeStamp"), pa.timestamp("us"))[-1].as_py()
+            self.appended_frames += frames.num_rows
+            return frames.num_rows
+
+    def _files(self, start=None, end=None):
+        days = self.days()
+        if start is not None:
+            days = [day for day in days if day >= _day(start)]
+        if end is not None:
+            days = [day for day in days if day <= _day(end)]
+        return [path for day in days for path in sorted(glob.glob(os.path.join(self._day_dir(day), "*.parquet")))]
+
+    def read(self, start=None, end=None, columns=None):
+        """
+        Frames with start <= TimeStamp <= end as an Arrow table, oldest first. Only the day partitions in range
+        are opened, and the range and the `columns` projection (TimeStamp is always included) are pushed into
+        the scan. Frames written twice before compaction are returned once.
+        """
+        files = self._files(start, end)
+        if not files:
+            return pa.table({"TimeStamp": pa.array([], pa.timestamp("us"))})
+        schema = pa.unify_schemas([pq.read_schema(path) for path in files], promote_options="permissive")
+        dataset = ds.dataset(files, schema=schema, format="parquet")
+        if columns is not None:
+            columns = ["TimeStamp"] + [name for name in columns if name != "TimeStamp"]
+        row_filter = time_range_filter(start, end, schema.field("TimeStamp").type)
+        return sorted_unique_frames(dataset.to_table(columns=columns, filter=row_filter))
+
+    def compact(self, before=None):
+        """
+        Rewrites every day partition before `before` (default: today, which is still being appended to) into
+        one deduplicated file sorted by TimeStamp, with row groups of `row_group_rows`. Returns the days
+        compacted.
+        """
+        last_day = _day(before) if before is not None else _day(pd.Timestamp.now())
+        compacted = []
+        for day in self.days():
+            if day >= last_day:
+                continue
+            files = sorted(glob.glob(os.path.join(self._day_dir(day), "*.parquet")))
+            if len(files) < 2 and all(os.path.basename(path) == COMPACTED_FILE for path in files):
+                continue
+            table = self.read(day, f"{day}T23:59:59.999999")
+            target = os.path.join(self._day_dir(day), COMPACTED_FILE)
+            pq.write_table(table, target + ".tmp", row_group_size=self.row_group_rows)
+            os.replace(target + ".tmp", target)
+            for path in files:
+                if path != target:
+                    os.remove(path)  # a crash before this only leaves duplicates, which read() drops
+            compacted.append(day)
+        return compacted
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_dcs_frame_store():
+    """Returns the process-wide DcsFrameStore, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DcsFrameStore()
+        return _store
@@ -0,0 +1,114 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_pipelines.dcs_sources import create_dcs_source
+from data_pipelines.delta_table import derive_dcs_signals, dcs_signal_inputs
+from params import *
+
+# Streams the full DCS history into a local columnar store for norm studies and backtests. The range is
+# processed in chunks of DCS_HISTORY_CHUNK_HOURS; each chunk is streamed batch by batch (decoded, derived
+# signals added) into its own Parquet file, and a checkpoint is written once the file is complete. A rerun
+# resumes after the last completed chunk, reading the same Delta version until the range is done.
+
+STATE_FILE = "_ingest_state.json"
+SIGNAL_PREFIX = "sig_"
+
+
+def load_ingest_state(output_dir):
+    path = os.path.join(output_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_ingest_state(output_dir, state):
+    path = os.path.join(output_dir, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2, default=str)
+    os.replace(path + ".tmp", path)
+
+
+def add_derived_signals(frames):
+    """Appends every derived signal as a `sig_<name>` float64 column to a decoded table of frames."""
+    signals = derive_dcs_signals(dcs_signal_inputs(frames))
+    for name, values in signals.items():
+        frames = frames.append_column(SIGNAL_PREFIX + name, pa.array(np.asarray(values, dtype=float)))
+    return frames
+
+
+def _write_chunk(source, chunk_start, chunk_end, output_dir):
+    """Streams one chunk into its Parquet file. Returns the number of frames written."""
+    path = os.path.join(output_dir, f"dcs_{chunk_start:%Y%m%d_%H%M}.parquet")
+    writer = None
+    rows = 0
+    try:
+        for frames in source.iter_batches(chunk_start, chunk_end):
+            frames = add_derived_signals(frames)
+            if writer is None:
+                writer = pq.ParquetWriter(path + ".tmp", frames.schema)
+            writer.write_table(frames.cast(writer.schema))
+            rows += frames.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        os.replace(path + ".tmp", path)  # a chunk file only appears once it is complete
+    return rows
+
+
+def ingest_dcs_history(start=None, end=None, output_dir=DCS_HISTORY_INGEST_DIR,
+                       chunk_hours=DCS_HISTORY_CHUNK_HOURS, source=None, progress=print):
+    """
+    Ingests DCS frames with start <= TimeStamp < end into `output_dir`, resuming from its checkpoint.
+
+    Args:
+        start: first TimeStamp; may be omitted when resuming
+        end: end of the range (default: now)
+        output_dir (str): directory of the columnar store
+        chunk_hours (float): hours per chunk file / checkpoint
+        source (DcsSource): defaults to a new instance of the configured DCS source (it may get pinned
+            to an older version, so the process-wide one is not used)
+        progress (callable): called with a dict after every chunk
+
+    Returns:
+        dict: the final checkpoint state
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    source = source or create_dcs_source()
+    state = load_ingest_state(output_dir)
+
+    if state.get("last_timestamp") and not state.get("complete"):
+        # an interrupted run: continue from the same Delta version so the chunks stay consistent
+        if state.get("version") is not None and source.pin_version(state["version"]):
+            print(f"Resuming DCS history ingestion at version {state['version']}")
+        end = end or state.get("end")
+    else:
+        source.refresh()
+        state["version"] = source.version()
+    position = pd.Timestamp(state["last_timestamp"]) if state.get("last_timestamp") else None
+    if start is not None and (position is None or pd.Timestamp(start) > position):
+        position = pd.Timestamp(start)
+    if position is None:
+        raise ValueError("No start given and no checkpoint to resume from")
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp.now().floor("min")
+    state.update({"end": str(end), "complete": False})
+
+    chunk = pd.Timedelta(hours=chunk_hours)
+    while position < end:
+        chunk_end = min(position + chunk, end)
+        rows = _write_chunk(source, position, chunk_end, output_dir)
+        position = chunk_end
+        state["last_timestamp"] = str(position)
+        state["frames"] = state.get("frames", 0) + rows
+        save_ingest_state(output_dir, state)
+        progress({"chunk_end": str(chunk_end), "rows": rows, "total_frames": state["frames"]})
+
+    state["complete"] = True
+    save_ingest_state(output_dir, state)
+    return state
@@ -0,0 +1,145 @@
+import datetime
+import json
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pytz
+
+from database import save_norm_batch, load_norm_state, compact_norm_log, get_latest_norm_value
+from params import *
+
+
+class CausticNormEstimator:
+    """
+    Online estimate of the caustic consumption norm (NM3 H2 per ton caustic) from the non-venting frames.
+
+    The norm served is the median of the last `window` accepted samples. A sample further than `outlier_k`
+    robust standard deviations (1.4826 x MAD) from that median is rejected, unless as many samples in a row
+    disagree as the window is half long; then the plant has moved and the window restarts from them.
+    Nothing is read from the database per frame. The state is written at most every `flush_interval_s`,
+    together with one aggregate row (the median of the interval) in caustic_norm_log.
+    """
+
+    def __init__(self, window=NORM_WINDOW, min_samples=NORM_MIN_SAMPLES, outlier_k=NORM_OUTLIER_K,
+                 flush_interval_s=NORM_FLUSH_INTERVAL_S, initial=DEFAULT_H2_PER_TON_CAUSTIC):
+        self.window = window
+        self.min_samples = min_samples
+        self.outlier_k = outlier_k
+        self.flush_interval_s = flush_interval_s
+        self.initial = initial  # served until the first sample is accepted
+        self._samples = deque(maxlen=window)
+        self._rejected = deque(maxlen=max(window // 2, 1))  # consecutive rejected samples
+        self._interval_samples = []  # accepted since the last flush
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.flushes = 0
+
+    def value(self):
+        with self._lock:
+            return float(np.median(self._samples)) if self._samples else self.initial
+
+    def _is_outlier(self, sample):
+        if len(self._samples) < self.min_samples:
+            return False
+        samples = np.asarray(self._samples)
+        median = np.median(samples)
+        scale = max(1.4826 * np.median(np.abs(samples - median)), 0.01 * abs(median))
+        return abs(sample - median) > self.outlier_k * scale
+
+    def update(self, sample):
+        """Adds one norm sample and returns the current estimate. Non-finite or non-positive samples are skipped."""
+        with self._lock:
+            if not math.isfinite(sample) or sample <= 0:
+                self.rejected += 1
+            elif self._is_outlier(sample):
+                self.rejected += 1
+                self._rejected.append(sample)
+                if len(self._rejected) == self._rejected.maxlen:
+                    print(f"Caustic norm moved to ~{np.median(self._rejected):.1f}, restarting the estimate")
+                    self._samples.clear()
+                    self._samples.extend(self._rejected)
+                    self._interval_samples.extend(self._rejected)
+                    self._rejected.clear()
+            else:
+                self.accepted += 1
+                self._samples.append(sample)
+                self._interval_samples.append(sample)
+                self._rejected.clear()
+            estimate = float(np.median(self._samples)) if self._samples else self.initial
+        self.maybe_flush()
+        return estimate
+
+    def maybe_flush(self, force=False):
+        """Writes the state and the interval aggregate if `flush_interval_s` has passed since the last write."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and (now - self._last_flush < self.flush_interval_s or not self._interval_samples):
+                return False
+            self._last_flush = now
+            aggregates = []
+            if self._interval_samples:
+                ist = pytz.timezone('Asia/Kolkata')
+                timestamp = datetime.datetime.now(ist).isoformat(timespec='milliseconds')
+                aggregates.append((timestamp, float(np.median(self._interval_samples))))
+                self._interval_samples = []
+            state_json = json.dumps({"samples": list(self._samples)})
+        save_norm_batch(aggregates, state_json)
+        self.flushes += 1
+        return True
+
+    def rewind(self):
+        """
+        Restarts the estimate from `initial` after the DCS source went back in time; the window holds the
+        samples of the later frames, which the source is about to replay. Accepted samples not yet written
+        are still flushed.
+        """
+        with self._lock:
+            self._samples.clear()
+            self._rejected.clear()
+
+    def restore(self, state_json):
+        state = json.loads(state_json)
+        with self._lock:
+            self._samples.extend(state.get("samples", []))
+
+    def summary(self):
+        return {"norm": round(self.value(), 2), "samples": len(self._samples), "accepted": self.accepted,
+                "rejected": self.rejected, "flushes": self.flushes}
+
+
+_estimator = None
+_estimator_lock = threading.Lock()
+
+
+def get_norm_estimator():
+    """
+    Returns the process-wide CausticNormEstimator. On first use it restores the saved state (or starts from
+    the last logged norm) and compacts the older raw rows of caustic_norm_log to one per flush interval.
+    """
+    global _estimator
+    with _estimator_lock:
+        if _estimator is None:
+            estimator = CausticNormEstimator(initial=get_latest_norm_value())
+            state_json = load_norm_state()
+            if state_json:
+                estimator.restore(state_json)
+            ist = pytz.timezone('Asia/Kolkata')
+            cutoff = (datetime.datetime.now(ist) - datetime.timedelta(seconds=NORM_FLUSH_INTERVAL_S))
+            removed = compact_norm_log(NORM_FLUSH_INTERVAL_S, cutoff.isoformat(timespec='milliseconds'))
+            if removed:
+                print(f"Compacted {removed} caustic norm log rows")
+            _estimator = estimator
+        return _estimator
+
+
+def flush_norm_estimator():
+    """Writes the process-wide estimator's pending samples and state, if it was used. Call on shutdown."""
+    with _estimator_lock:
+        estimator = _estimator
+    if estimator is not None:
+        estimator.maybe_flush(force=True)
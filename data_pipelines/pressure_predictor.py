@@ -0,0 +1,131 @@
+import datetime
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from params import *
+
+FEATURE_NAMES = ["bias", "header_pressure", "balance_knm3_per_hr", "holder_level_max"]
+
+
+def _frame_time(timestamp):
+    """Seconds since epoch of a DCS TimeStamp string, falling back to the arrival time."""
+    if timestamp is not None:
+        try:
+            return datetime.datetime.fromisoformat(str(timestamp)).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+def extract_pressure_features(dcs_constraints, raw_data, h2_per_ton_caustic):
+    """
+    Features for the header pressure model from one DCS frame: current pressure, generation minus
+    consumption (in 1000 NM3/hr) and the fuller of the two holders.
+    """
+    generation = dcs_constraints['caustic_production'] * h2_per_ton_caustic
+    balance = generation - dcs_constraints['total_h2_flow']
+    holder_level = 0.0
+    if raw_data is not None and len(raw_data):
+        holder_level = max(float(raw_data['Hydrogen_Holder_level_current_per_1'].iloc[0]),
+                           float(raw_data['Hydrogen_Holder_level_current_per_2'].iloc[0]))
+    return np.array([1.0, dcs_constraints['header_pressure'], balance / 1000, holder_level])
+
+
+class HeaderPressurePredictor:
+    """
+    Predicts header pressure `horizon_s` ahead with recursive least squares over the features above.
+
+    Each frame's features are kept until the frame `horizon_s` later arrives; that frame's pressure is the
+    training target. Both the update and the prediction are O(1) per frame (4x4 matrices). The forgetting
+    factor lets the model follow changes in plant behaviour.
+    """
+
+    def __init__(self, horizon_s=PRESSURE_PREDICTION_HORIZON_S, forgetting=PRESSURE_PREDICTOR_FORGETTING,
+                 min_samples=PRESSURE_PREDICTOR_MIN_SAMPLES):
+        self.horizon_s = horizon_s
+        self.forgetting = forgetting
+        self.min_samples = min_samples
+        n = len(FEATURE_NAMES)
+        self.theta = np.zeros(n)
+        self.theta[1] = 1.0  # start from "pressure stays where it is"
+        self.P = np.eye(n) * 1000.0
+        self.samples = 0
+        self._pending = deque()  # (frame time, features, prediction made at that frame)
+        self._lock = threading.Lock()
+        self.last_prediction = None
+        self.last_frame_time = None
+        # running error statistics of matured predictions
+        self.error_count = 0
+        self.error_mean = 0.0
+        self.abs_error_mean = 0.0
+        self.sq_error_mean = 0.0
+
+    def is_ready(self):
+        return self.samples >= self.min_samples
+
+    def _learn(self, x, target, predicted):
+        Px = self.P @ x
+        gain = Px / (self.forgetting + x @ Px)
+        self.theta = self.theta + gain * (target - x @ self.theta)
+        self.P = (self.P - np.outer(gain, Px)) / self.forgetting
+        self.samples += 1
+
+        error = target - predicted
+        self.error_count += 1
+        self.error_mean += (error - self.error_mean) / self.error_count
+        self.abs_error_mean += (abs(error) - self.abs_error_mean) / self.error_count
+        self.sq_error_mean += (error * error - self.sq_error_mean) / self.error_count
+
+    def update(self, features, timestamp=None):
+        """
+        Feeds one DCS frame and returns the predicted header pressure `horizon_s` after it.
+        Frames with an already seen timestamp only return the last prediction.
+        """
+        with self._lock:
+            frame_time = _frame_time(timestamp)
+            if self.last_frame_time is not None and frame_time <= self.last_frame_time:
+                return self.last_prediction
+            self.last_frame_time = frame_time
+
+            current_pressure = features[1]
+            matured = None
+            while self._pending and self._pending[0][0] <= frame_time - self.horizon_s:
+                matured = self._pending.popleft()
+            if matured is not None:
+                # the newest frame that is at least horizon_s old is the closest match to the horizon
+                self._learn(matured[1], current_pressure, matured[2])
+
+            prediction = float(features @ self.theta)
+            self._pending.append((frame_time, features, prediction))
+            self.last_prediction = prediction
+            return prediction
+
+    def rewind(self):
+        """
+        Starts over from the next frame after the DCS source went back in time: the pending frames and the
+        last prediction belong to the later frames. The learned coefficients and error statistics are kept.
+        """
+        with self._lock:
+            self._pending.clear()
+            self.last_frame_time = None
+            self.last_prediction = None
+
+    def predicts_breach(self, threshold):
+        return self.is_ready() and self.last_prediction is not None and self.last_prediction > threshold
+
+    def summary(self):
+        with self._lock:
+            return {
+                "horizon_min": round(self.horizon_s / 60, 1),
+                "ready": self.is_ready(),
+                "samples": self.samples,
+                "predicted_header_pressure": None if self.last_prediction is None
+                else round(self.last_prediction, 2),
+                "mean_error": round(self.error_mean, 3),
+                "mean_abs_error": round(self.abs_error_mean, 3),
+                "rmse": round(float(np.sqrt(self.sq_error_mean)), 3),
+                "coefficients": dict(zip(FEATURE_NAMES, np.round(self.theta, 4).tolist())),
+            }
@@ -0,0 +1,152 @@
+import json
+import threading
+
+import numpy as np
+
+from params import SIGNAL_SPEC_PATH
+
+# Derived DCS signals are declared in parameters/signal_formulas.json:
+#   "linear":   signal -> {"terms": {tag or earlier linear signal: coefficient}, "divisor": d}
+#               coefficients may be numbers or fractions written as "220/67"
+#   "post_ops": ordered non-linear steps on signals or tags, each adding one signal:
+#               gt (input > value, as 0/1), any (any input non-zero, as 0/1), ratio (numerator / denominator)
+#               and dot (sum of a * b over pairs)
+#   "missing_tags": "zero" (default) evaluates a tag absent from the frames as 0, like a null DCS tag, and
+#               "reject" raises ValueError instead; some exports lack tags the spec reads
+# The linear part is compiled once into a tags x signals weight matrix, so every linear signal for one
+# frame, or for a whole history, comes out of one matrix multiply. Adding a tag to a sum is a spec edit.
+
+
+def _coefficient(value):
+    if isinstance(value, str) and "/" in value:
+        numerator, denominator = value.split("/")
+        return float(numerator) / float(denominator)
+    return float(value)
+
+
+class CompiledSignals:
+    """A signal spec compiled to a weight matrix over its input tags plus the post-op steps."""
+
+    def __init__(self, tags, linear_names, weights, post_ops, missing_tags="zero"):
+        self.tags = tags  # column order of the input matrix
+        self.linear_names = linear_names
+        self.weights = weights  # len(tags) x len(linear_names)
+        self.post_ops = post_ops
+        self.missing_tags = missing_tags
+        self._tag_index = {tag: i for i, tag in enumerate(tags)}
+
+    @property
+    def signal_names(self):
+        return self.linear_names + [op["name"] for op in self.post_ops]
+
+    def missing(self, tag_values, tags=None):
+        """The input tags of the spec (or `tags`) absent from `tag_values`."""
+        return [tag for tag in (self.tags if tags is None else tags) if tag not in tag_values]
+
+    def input_matrix(self, tag_values, tags=None):
+        """
+        Stacks tag name -> array over frames into a frames x tags float64 matrix, in compiled order or in the
+        order of `tags`. Absent tags are zero columns, or raise ValueError with `missing_tags` "reject".
+        """
+        tags = self.tags if tags is None else tags
+        missing = self.missing(tag_values, tags)
+        if missing and self.missing_tags == "reject":
+            raise ValueError(f"DCS frames lack {len(missing)} tag(s) of the signal spec: {', '.join(missing)}")
+        n_frames = next((len(tag_values[tag]) for tag in tags if tag not in missing), 0)
+        return np.column_stack([np.zeros(n_frames) if tag in missing else np.asarray(tag_values[tag], dtype=float)
+                                for tag in tags])
+
+    def evaluate(self, tag_values):
+        """
+        Args:
+            tag_values: tag name -> array over frames (a dict, a DataFrame, ...), or a frames x tags matrix
+                already in `self.tags` order
+
+        Returns:
+            dict: signal name -> float64 array over frames
+        """
+        x = tag_values if isinstance(tag_values, np.ndarray) else self.input_matrix(tag_values)
+        linear = x @ self.weights
+        signals = {name: linear[:, j] for j, name in enumerate(self.linear_names)}
+
+        def resolve(name):
+            return signals[name] if name in signals else x[:, self._tag_index[name]]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for op in self.post_ops:
+                if op["op"] == "gt":
+                    value = (resolve(op["input"]) > op["value"]).astype(float)
+                elif op["op"] == "any":
+                    value = np.any([resolve(name) != 0 for name in op["inputs"]], axis=0).astype(float)
+                elif op["op"] == "ratio":
+                    value = resolve(op["numerator"]) / resolve(op["denominator"])
+                else:  # dot
+                    value = np.sum([resolve(a) * resolve(b) for a, b in op["pairs"]], axis=0)
+                signals[op["name"]] = value
+        return signals
+
+
+def _post_op_inputs(op):
+    if op["op"] == "gt":
+        return [op["input"]]
+    if op["op"] == "any":
+        return op["inputs"]
+    if op["op"] == "ratio":
+        return [op["numerator"], op["denominator"]]
+    return [name for pair in op["pairs"] for name in pair]
+
+
+def compile_signal_spec(spec):
+    """
+    Compiles a signal spec (see the module comment). Linear signals referencing earlier linear signals are
+    expanded into their tag weights here, so evaluation never chains them.
+
+    Raises:
+        ValueError: on an unknown post-op or `missing_tags` mode
+    """
+    tag_weights = {}  # linear signal -> {tag: weight}
+    for name, formula in spec["linear"].items():
+        divisor = _coefficient(formula.get("divisor", 1))
+        weights = {}
+        for term, coefficient in formula["terms"].items():
+            coefficient = _coefficient(coefficient) / divisor
+            expanded = tag_weights.get(term, {term: 1.0})
+            for tag, weight in expanded.items():
+                weights[tag] = weights.get(tag, 0.0) + coefficient * weight
+        tag_weights[name] = weights
+
+    post_ops = spec.get("post_ops", [])
+    missing_tags = spec.get("missing_tags", "zero")
+    if missing_tags not in ("zero", "reject"):
+        raise ValueError(f"Unknown missing_tags mode '{missing_tags}', expected 'zero' or 'reject'")
+    tags = list(dict.fromkeys(tag for weights in tag_weights.values() for tag in weights))
+    known = set(tag_weights)
+    for op in post_ops:
+        if op["op"] not in ("gt", "any", "ratio", "dot"):
+            raise ValueError(f"Unknown post-op '{op['op']}' for signal '{op['name']}'")
+        for name in _post_op_inputs(op):
+            if name not in known and name not in tags:
+                tags.append(name)  # a raw tag used directly by a post-op
+        known.add(op["name"])
+
+    linear_names = list(tag_weights)
+    tag_index = {tag: i for i, tag in enumerate(tags)}
+    weights = np.zeros((len(tags), len(linear_names)))
+    for j, name in enumerate(linear_names):
+        for tag, weight in tag_weights[name].items():
+            weights[tag_index[tag], j] = weight
+    return CompiledSignals(tags, linear_names, weights, post_ops, missing_tags)
+
+
+_compiled = None
+_compiled_lock = threading.Lock()
+
+
+def get_compiled_signals(path=SIGNAL_SPEC_PATH):
+    """Loads and compiles the signal spec once per process."""
+    global _compiled
+    with _compiled_lock:
+        if _compiled is None:
+            with open(path) as f:
+                _compiled = compile_signal_spec(json.load(f))
+        return _compiled
@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from parameters.constants import column_name_mapping
+from params import *
+
+# Synthetic DCS frames for scale and stress tests. Every frame is built consumption first: the consumer flows
+# are drawn for the frame's regime, the vent flow is added when venting, and the caustic production is then
+# set so that generation (DEFAULT_H2_PER_TON_CAUSTIC NM3 per ton) equals consumption plus vent. The derived
+# `balance` signal is therefore the vent flow, and 0 outside venting. Tags are drawn in realistic ranges,
+# everything is vectorized over frames, and the columns are the raw DCS_Tag1_st tag codes, so the frames
+# decode like a real read. Where the recorded exports differ from what the tag names suggest they are followed:
+# the boiler "binary" running tags read a load (about 59 for P60 and 96 for P120) and a closed vent valve
+# commands 0 or slightly below (down to about -1.4); an open one commands a few to tens of percent.
+#
+# Regimes (knob: `regime_mix`, regime -> weight):
+#   normal            every unit running, header pressure below the threshold
+#   h2o2_low          H2O2 below 1900 NM3/hr (shutdown or ramping down)
+#   flaker_trickle    flakers 3 and 4 on trickle flow below 750 NM3/hr
+#   no_banks          no bank available at any post, bank compressors off
+#   pressure_breach   header pressure above the threshold with a long pipeline disruption
+#   venting           surplus vented: vent valves open and a holder above 90%
+
+REGIMES = ["normal", "h2o2_low", "flaker_trickle", "no_banks", "pressure_breach", "venting"]
+DEFAULT_REGIME_MIX = {"normal": 0.7, "h2o2_low": 0.06, "flaker_trickle": 0.06, "no_banks": 0.06,
+                      "pressure_breach": 0.06, "venting": 0.06}
+
+CAUSTIC_PLANTS_TPD = {"332tpd": 332, "450tpd": 450, "600tpd": 600, "850tpd": 850}
+PIPELINE_CUSTOMERS = ["AARTI", "FARMSON", "VALIANT_1", "GULSHAN", "PANOLI", "VALIANT_2", "CHEMIE", "LANXESS",
+                      "ANUPAM_RASAYAN", "UPL_5"]
+PIPELINE_TAGS = [f"{name}_H2_PIPELINE_SUPPLY" if name not in ("GULSHAN", "PANOLI") else f"{name}H2_PIPELINE_SUPPLY"
+                 for name in PIPELINE_CUSTOMERS]
+COMPRESSORS = ["ZH", "ZI", "ZJ", "G", "K", "L", "M", "N", "O", "P"]
+VENT_VALVES = ["332", "450", "600", "850"]
+BOILER_RUNNING_LOAD = {"P60": (55, 65), "P120": (90, 100)}  # reading of the running tags, as recorded
+VENT_CMD_CLOSED = (-1.4, 0.0)  # command of a closed vent valve, as recorded
+VENT_CMD_OPEN = (5, 60)
+H2O2_H2_PER_TON = 750  # NM3 H2 per ton of H2O2 (100%), to derive the H2O2 production tag from its H2 flow
+BANK_CAPACITY_NM3 = 3000  # per bank
+
+
+def _regimes(rng, n_frames, regime_mix):
+    unknown = set(regime_mix) - set(REGIMES)
+    if unknown:
+        raise ValueError(f"Unknown regime(s) {sorted(unknown)}, expected some of {REGIMES}")
+    weights = np.array([regime_mix.get(name, 0.0) for name in REGIMES], dtype=float)
+    if weights.sum() <= 0:
+        raise ValueError("regime_mix needs at least one positive weight")
+    return rng.choice(len(REGIMES), size=n_frames, p=weights / weights.sum())
+
+
+def synthesize_tags(n_frames, regime_mix=None, rng=None):
+    """
+    Draws `n_frames` consistent frames as decoded tag name -> float64 array, plus the regime of every frame.
+
+    Returns:
+        tuple: (dict of tag arrays, array of regime names)
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    regime = _regimes(rng, n_frames, regime_mix or DEFAULT_REGIME_MIX)
+    is_regime = {name: regime == i for i, name in enumerate(REGIMES)}
+    n = n_frames
+    tags = {}
+
+    def uniform(low, high):
+        return rng.uniform(low, high, n)
+
+    # --- consumers (NM3/hr) ---
+    h2o2_flow = np.where(is_regime["h2o2_low"], uniform(0, 1900), uniform(1900, 3000))
+    tags["H2O2_H2_current_NM3_per_hr"] = h2o2_flow
+    tags["H2O2_H2O2_current_TPH"] = h2o2_flow / H2O2_H2_PER_TON * 2000  # KG/H at 50% concentration
+
+    for tag, trickle_tag in (("Flaker_850tpd_running_or_not_binary_1", "Flaker_850tpd_current_load_TPH_1"),
+                             ("Flaker_850tpd_running_or_not_binary_2", "Flaker_850tpd_current_load_TPH_2")):
+        flow = np.where(is_regime["flaker_trickle"], uniform(0, 750), uniform(750, 1600))
+        tags[tag] = flow
+        tags[trickle_tag] = flow / uniform(110, 160) * 24  # load in TPD at a 110-160 NM3/ton norm
+    for tag, load_tag in (("Flaker_450tpd_running_or_not_binary", "Flaker_450tpd_current_load_TPH"),
+                          ("Flaker_600tpd_running_or_not_binary", "Flaker_600tpd_current_load_TPH")):
+        running = rng.random(n) < 0.8
+        tags[tag] = np.where(running, uniform(100, 700), 0.0)
+        tags[load_tag] = tags[tag] / 130 * 24
+    tags["NG_flow_in_Flaker3"] = np.zeros(n)
+    tags["NG_flow_in_Flaker4"] = np.zeros(n)
+
+    for i in range(1, 7):
+        tags[f"H2_FLOW_TO_HCL_FURNACE_{i}"] = uniform(200, 600)
+        tags[f"CL2_FLOW_TO_HCL_FURNACE_{i}"] = tags[f"H2_FLOW_TO_HCL_FURNACE_{i}"] * uniform(0.95, 1.0)
+    for name in ["1350TPD_HCL_FURNACE_1", "1350TPD_HCL_FURNACE_2", "1350TPD_HCL_FURNACE_3", "1350TPD_HCL_FURNACE_4",
+                 "850TPD_HCL_FURNACE_A", "850TPD_HCL_FURNACE_B"]:
+        tags[name] = uniform(100, 300)
+    tags["ECH_H2_PIPELINE_SUPPLY"] = uniform(100, 400)
+
+    for boiler, coal_tags in (("P60", 4), ("P120", 5)):
+        running = rng.random(n) < 0.7
+        tags[f"Boiler_{boiler}_running_or_not_binary"] = np.where(running, uniform(*BOILER_RUNNING_LOAD[boiler]), 0.0)
+        tags[f"Boiler_{boiler}_current_H2_NM3_per_hr"] = np.where(running, uniform(200, 1500), 0.0)
+        for i in range(1, coal_tags + 1):
+            tags[f"Boiler_{boiler}_current_coal_TPH_{i}"] = uniform(0, 10)
+
+    # --- banks: 7 posts, 10 compressors at the spec's 440 NM3/hr each ---
+    no_banks = is_regime["no_banks"]
+    for post in range(1, 8):
+        in_filling = np.where(no_banks, 0.0, rng.integers(0, 2, n))
+        tags[f"H2_POST_{post}_BANK_IN_FILLING"] = in_filling
+        tags[f"H2_POST_{post}_BANK_AVAILABLE"] = np.where(no_banks, 0.0, rng.integers(0, 3, n))
+        tags[f"H2_POST_{post}_BANK_FILLING__HOLD"] = np.where(no_banks, 0.0, rng.integers(0, 2, n))
+        tags[f"H2_POST_{post}_BANK_NOT_AVAILABLE"] = rng.integers(0, 3, n).astype(float)
+        tags[f"H2_POST_{post}_BANK_CAPACITY"] = np.full(n, float(BANK_CAPACITY_NM3))
+    filling_posts = sum(tags[f"H2_POST_{post}_BANK_IN_FILLING"] for post in range(1, 8))
+    compressors_on = np.where(filling_posts > 0, rng.integers(0, 5, n), 0)
+    for i, name in enumerate(COMPRESSORS):
+        tags[f"Bank_compressor_status_{name}"] = (i < compressors_on).astype(float)
+    for i in range(1, 4):
+        tags[f"H2_Bank_Pressure_Tag_{i}"] = uniform(100, 200)
+
+    # --- pipeline, disrupted during a pressure breach ---
+    breach = is_regime["pressure_breach"]
+    tags["pipeline_disruption_hrs"] = np.where(breach, uniform(2, 8), 0.0)
+    pipeline_total = np.where(breach, uniform(0, 300), uniform(1000, 4000))
+    shares = rng.dirichlet(np.ones(len(PIPELINE_TAGS)), n)
+    for j, tag in enumerate(PIPELINE_TAGS):
+        tags[tag] = pipeline_total * shares[:, j]
+    tags["H202_H2_PIPELINE_SUPPLY"] = h2o2_flow
+    threshold = DEFAULT_HEADER_PRESSURE_THRESHOLD
+    tags["Hydrogen_Header_pressure_current_kgf_per_cm2"] = np.where(breach, uniform(threshold + 1, threshold + 15),
+                                                                    uniform(threshold - 20, threshold - 1))
+    tags["Hydrogen_Pipeline_current_NM3_per_hr"] = pipeline_total
+
+    # --- vent: the valve commands add up to more than 3 and a holder is full ---
+    venting = is_regime["venting"]
+    for valve in VENT_VALVES:
+        tags[f"H2_vent_valve_CMD_{valve}"] = np.where(venting, uniform(*VENT_CMD_OPEN), uniform(*VENT_CMD_CLOSED))
+    tags["Hydrogen_Holder_level_current_per_1"] = np.where(venting, uniform(91, 99), uniform(20, 85))
+    tags["Hydrogen_Holder_level_current_per_2"] = uniform(20, 85)
+    vent_flow = np.where(venting, uniform(500, 3000), 0.0)
+
+    # --- generation = consumption + vent ---
+    consumption = (pipeline_total + sum(tags[f"H2_FLOW_TO_HCL_FURNACE_{i}"] for i in range(1, 7))
+                   + tags["ECH_H2_PIPELINE_SUPPLY"] + compressors_on * 440 + h2o2_flow
+                   + tags["Flaker_450tpd_running_or_not_binary"] + tags["Flaker_600tpd_running_or_not_binary"]
+                   + tags["Flaker_850tpd_running_or_not_binary_1"] + tags["Flaker_850tpd_running_or_not_binary_2"]
+                   + tags["Boiler_P60_current_H2_NM3_per_hr"] + tags["Boiler_P120_current_H2_NM3_per_hr"])
+    caustic_tpd = (consumption + vent_flow) / DEFAULT_H2_PER_TON_CAUSTIC * 24
+    capacity = np.array(list(CAUSTIC_PLANTS_TPD.values()), dtype=float)
+    split = capacity * rng.uniform(0.8, 1.0, (n, len(capacity)))
+    split /= split.sum(axis=1, keepdims=True)
+    for j, plant in enumerate(CAUSTIC_PLANTS_TPD):
+        tags[f"Caustic_Caustic Production_{plant}_TPH"] = caustic_tpd * split[:, j]
+
+    for name in column_name_mapping.values():
+        tags.setdefault(name, np.zeros(n))
+    return tags, np.array(REGIMES)[regime]
+
+
+def generate_dcs_frames(n_frames, regime_mix=None, seed=None, start="2025-01-01", interval_s=60):
+    """
+    Synthetic DCS frames as an Arrow table with the raw DCS_Tag1_st columns, oldest first, one every
+    `interval_s` seconds from `start`. Decode it with decode_dcs_table like any DCS read.
+    """
+    tags, _ = synthesize_tags(n_frames, regime_mix, np.random.default_rng(seed))
+    codes = {name: code for code, name in column_name_mapping.items()}
+    times = pd.Timestamp(start).to_datetime64() + np.arange(n_frames) * np.timedelta64(int(interval_s * 1e6), "us")
+    columns = {"TimeStamp": pa.array(times.astype("datetime64[us]"))}
+    columns.update({codes[name]: pa.array(values, pa.float64()) for name, values in tags.items()})
+    return pa.table(columns)
+
+
+def iter_dcs_frames(n_frames, batch_rows=DCS_HISTORY_BATCH_ROWS, regime_mix=None, seed=None, start="2025-01-01",
+                    interval_s=60):
+    """Generates `n_frames` frames in tables of at most `batch_rows`, so millions of frames fit in memory."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start)
+    for offset in range(0, n_frames, batch_rows):
+        size = min(batch_rows, n_frames - offset)
+        yield generate_dcs_frames(size, regime_mix, seed=rng.integers(2 ** 63),
+                                  start=start + pd.Timedelta(seconds=offset * interval_s), interval_s=interval_s)
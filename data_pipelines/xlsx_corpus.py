@@ -0,0 +1,97 @@
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from data_pipelines.delta_table import decode_dcs_table
+from data_pipelines.frame_store import sorted_unique_frames
+from data_pipelines.history_ingest import add_derived_signals, SIGNAL_PREFIX
+from data_pipelines.signal_formulas import get_compiled_signals
+from params import *
+
+# The Excel tag exports in data/ are the only real plant data available offline, and parsing them with
+# openpyxl takes seconds. build_dcs_corpus() converts them once into one uncompressed Arrow IPC file:
+# decoded like a DCS read (tag names, float64), sorted by TimeStamp, with a sig_* column per derived signal.
+# Spec tags that no export carries are written as zero columns.
+# load_dcs_corpus() memory-maps that file, so bench and replay start without touching Excel. Only sheets with
+# a TimeStamp column hold frames; other sheets (e.g. the data request specification) are skipped.
+
+MANIFEST_KEY = b"h2_corpus_sources"
+
+
+def _source_manifest(sources):
+    return {os.path.basename(path): [os.path.getsize(path), os.path.getmtime(path)] for path in sorted(sources)}
+
+
+def read_frame_sheets(path):
+    """Every sheet of an Excel export that holds DCS frames, as decoded Arrow tables."""
+    tables = []
+    for sheet_name, data in pd.read_excel(path, sheet_name=None).items():
+        if "TimeStamp" not in data.columns:
+            print(f"Skipping sheet '{sheet_name}' of {os.path.basename(path)}: no TimeStamp column")
+            continue
+        data = data.dropna(subset=["TimeStamp"])
+        data["TimeStamp"] = pd.to_datetime(data["TimeStamp"])
+        tables.append(decode_dcs_table(pa.Table.from_pandas(data, preserve_index=False)))
+    return tables
+
+
+def build_dcs_corpus(sources=None, output=DCS_CORPUS_PATH):
+    """
+    Converts the Excel exports into the corpus file at `output` (written atomically).
+
+    Args:
+        sources (list): Excel files (default: every file matching DCS_CORPUS_SOURCES)
+
+    Returns:
+        pa.Table: the corpus as written
+    """
+    sources = sorted(sources if sources is not None else glob.glob(DCS_CORPUS_SOURCES))
+    tables = [table for path in sources for table in read_frame_sheets(path)]
+    if not tables:
+        raise ValueError(f"No DCS frames found in {sources}")
+    frames = sorted_unique_frames(pa.concat_tables(tables, promote_options="permissive"))
+    frames = decode_dcs_table(frames)  # tags missing from some exports are nulls after the concat; fill them
+    # tags the signal spec reads that no export has are added as zeros, like a null DCS tag, so the corpus
+    # replays and benches like a full DCS read
+    missing = get_compiled_signals().missing(frames.column_names)
+    if missing:
+        print(f"The exports lack {len(missing)} tag(s) of the signal spec, written as 0: {', '.join(missing)}")
+        for tag in missing:
+            frames = frames.append_column(tag, pa.array(np.zeros(frames.num_rows)))
+    corpus = add_derived_signals(frames)
+    corpus = corpus.replace_schema_metadata({MANIFEST_KEY: json.dumps(_source_manifest(sources)).encode()})
+
+    with pa.OSFile(output + ".tmp", "wb") as sink:
+        with pa.ipc.new_file(sink, corpus.schema) as writer:
+            writer.write_table(corpus)
+    os.replace(output + ".tmp", output)
+    print(f"Wrote {corpus.num_rows} DCS frames from {len(sources)} file(s) to {output}")
+    return corpus
+
+
+def corpus_is_current(path=DCS_CORPUS_PATH, sources=None):
+    """True if the corpus exists and was built from the current versions of the source files."""
+    if not os.path.exists(path):
+        return False
+    sources = sorted(sources if sources is not None else glob.glob(DCS_CORPUS_SOURCES))
+    with pa.memory_map(path) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    return json.loads(metadata.get(MANIFEST_KEY, b"{}")) == _source_manifest(sources)
+
+
+def load_dcs_corpus(path=DCS_CORPUS_PATH, build_if_missing=True, signals=True):
+    """
+    Memory-maps the corpus as an Arrow table (zero-copy: columns are read from the page cache on use).
+    Builds it first if it is missing, or out of date when it is the default corpus. Without `signals` the
+    sig_* columns are dropped, leaving the frames as a DCS source returns them.
+    """
+    if build_if_missing and (not os.path.exists(path) or (path == DCS_CORPUS_PATH and not corpus_is_current(path))):
+        build_dcs_corpus(output=path)
+    corpus = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    if not signals:
+        corpus = corpus.drop_columns([name for name in corpus.column_names if name.startswith(SIGNAL_PREFIX)])
+    return corpus
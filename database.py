@@ -1,20 +1,73 @@
 import datetime
 import json
 import sqlite3
+import threading
+import time
 from params import *
 import pandas as pd
 import pytz
 
+from utils.audit_logging import initialize_audit_log_table
+from utils.leader_election import LEASE_TABLE_NAME
+from utils.sqlite_pool import get_sqlite_pool
+
 # --- Database Configuration ---
 # DB_PATH = 'hydrogen_allocation_tool.db'  # SQLite database file
 
 
 # --- Utility for database connection ---
 def get_db_connection():
-    """Establishes and returns a database connection."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # Allows accessing columns by name
-    return conn
+    """Returns this thread's pooled database connection (see utils/sqlite_pool.py)."""
+    return get_sqlite_pool(DB_PATH).connection()
+
+
+def release_db_connection(conn):
+    """Hands the connection back to the pool, rolling back anything left uncommitted."""
+    get_sqlite_pool(DB_PATH).release(conn)
+
+
+# --- Schema cache ---
+# The tables in the database are read from sqlite_master once per process (by initialize_db, or on first
+# use), and the SQL of the hot paths below is built once per table and column set. Loading or saving
+# constraints and allocations then runs no catalog query and formats no SQL per call. Only tables found in
+# the catalog ever reach the cached statements. A table missing from the cache is looked up in the catalog
+# again before it is reported missing, so tables created later, by this process or another, are picked up.
+
+_schema_lock = threading.Lock()
+_schema_ready = False  # initialize_db has run in this process
+_known_tables = None  # table names, loaded on first use
+_statements = {}  # cache key -> SQL
+_allocation_revision = 0  # bumped on every allocation row this process saves
+
+
+def constraint_table_name(role_name):
+    """Table holding a role's constraint history."""
+    return f"constraints_{role_name.replace(' ', '_').replace('-', '_').replace('.', '_').lower()}"
+
+
+def _load_known_tables():
+    conn = get_db_connection()
+    try:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    finally:
+        release_db_connection(conn)
+
+
+def table_exists(table_name):
+    """True if the table exists, answered from the schema cache and re-read from the catalog on a miss."""
+    global _known_tables
+    with _schema_lock:
+        if _known_tables is None or table_name not in _known_tables:
+            _known_tables = _load_known_tables()
+        return table_name in _known_tables
+
+
+def _statement(key, build):
+    """The SQL cached under `key`, built by `build()` on first use."""
+    sql = _statements.get(key)
+    if sql is None:
+        sql = _statements.setdefault(key, build())
+    return sql
 
 
 # --- Table Creation Functions ---
@@ -29,7 +82,7 @@ def create_constraint_table(role_name, constraints_schema):
     cursor = conn.cursor()
 
     # Sanitize role name for table name (replace spaces and special chars)
-    table_name = f"constraints_{role_name.replace(' ', '_').replace('-', '_').replace('.', '_').lower()}"
+    table_name = constraint_table_name(role_name)
 
     columns_sql_parts = []
     for constraint in constraints_schema:
@@ -46,7 +99,7 @@ def create_constraint_table(role_name, constraints_schema):
 
     if not columns_sql:
         print(f"Skipping table creation for '{table_name}' as no constraints are defined.")
-        conn.close()
+        release_db_connection(conn)
         return table_name  # Return early if no columns
 
     create_table_sql = f"""
@@ -64,7 +117,7 @@ def create_constraint_table(role_name, constraints_schema):
     except sqlite3.Error as e:
         print(f"Error creating table {table_name}: {e}")
     finally:
-        conn.close()
+        release_db_connection(conn)
     return table_name
 
 
@@ -110,7 +163,7 @@ def create_allocation_table(allocation_areas):
     except sqlite3.Error as e:
         print(f"Error creating table {table_name}: {e}")
     finally:
-        conn.close()
+        release_db_connection(conn)
     return table_name
 
 
@@ -141,7 +194,7 @@ def create_optimizer_state_table():
     except sqlite3.Error as e:
         print(f"Error creating table {table_name}: {e}")
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 
 # --- Data Loading Functions ---
@@ -154,17 +207,14 @@ def load_all_allocations():
         pd.DataFrame: A DataFrame containing all allocation records,
                       or an empty DataFrame if the table doesn't exist or is empty.
     """
+    if not table_exists("allocations"):
+        print("Table 'allocations' does not exist. Returning empty DataFrame.")
+        return pd.DataFrame()  # Return empty DataFrame if table doesn't exist
+
     conn = None
     try:
         conn = get_db_connection()
 
-        # Check if the allocations table exists
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='allocations';")
-        if cursor.fetchone() is None:
-            print("Table 'allocations' does not exist. Returning empty DataFrame.")
-            return pd.DataFrame()  # Return empty DataFrame if table doesn't exist
-
         # Load all data from the allocations table
         df = pd.read_sql_query("SELECT * FROM allocations ORDER BY timestamp ASC;", conn)
         print("Successfully loaded all allocations data.")
@@ -174,7 +224,42 @@ def load_all_allocations():
         return pd.DataFrame()  # Return empty DataFrame on error
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
+
+
+def load_allocations_between(start=None, end=None, limit=None):
+    """
+    Loads the allocation rows with start <= timestamp <= end (IST ISO strings, a prefix such as
+    '2025-07-21' works), oldest first, at most `limit` of them.
+    """
+    conditions = []
+    params = []
+    if start:
+        conditions.append("timestamp >= ?")
+        params.append(start)
+    if end:
+        conditions.append("timestamp <= ?")
+        # a date-only end bound includes the whole day
+        params.append(end if len(end) > 10 else end + "T99")
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    limit_sql = ""
+    if limit is not None:
+        limit_sql = " LIMIT ?"
+        params.append(int(limit))
+    conn = get_db_connection()
+    try:
+        return pd.read_sql_query(f"SELECT * FROM allocations {where_sql} ORDER BY timestamp ASC{limit_sql};", conn,
+                                 params=params)
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        print(f"Error loading allocations between {start} and {end}: {e}")
+        return pd.DataFrame()
+    finally:
+        release_db_connection(conn)
+
+
+def get_allocation_revision():
+    """Number of allocation rows this process has saved; the HTTP API keys /history by it without a query."""
+    return _allocation_revision
 
 
 def load_latest_constraints(role_name, constraints_schema):
@@ -182,18 +267,15 @@ def load_latest_constraints(role_name, constraints_schema):
     Loads the latest constraint entry for a given role.
     Returns a dictionary of current values, respecting single/range types.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    table_name = f"constraints_{role_name.replace(' ', '_').replace('-', '_').replace('.', '_').lower()}"
-
-    # Check if table exists
-    cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}';")
-    if cursor.fetchone() is None:
-        conn.close()
+    table_name = constraint_table_name(role_name)
+    if not table_exists(table_name):
         return {c["name"]: ({"min": 0, "max": 100} if c["type"] == "range" else 0) for c in constraints_schema}
 
+    conn = get_db_connection()
+    cursor = conn.cursor()
     try:
-        cursor.execute(f"SELECT * FROM {table_name} ORDER BY timestamp DESC LIMIT 1;")
+        cursor.execute(_statement(("latest", table_name),
+                                  lambda: f'SELECT * FROM "{table_name}" ORDER BY timestamp DESC LIMIT 1;'))
         row = cursor.fetchone()
         if row:
             latest_constraints = {}
@@ -220,7 +302,7 @@ def load_latest_constraints(role_name, constraints_schema):
         print(f"Error loading latest constraints for {role_name}: {e}")
         return {c["name"]: ({"min": 0, "max": 100} if c["type"] == "range" else 0) for c in constraints_schema}
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 
 def load_latest_allocation_data(allocation_data_schema):
@@ -228,17 +310,13 @@ def load_latest_allocation_data(allocation_data_schema):
     Loads the latest hydrogen allocation data from the database.
     Returns a dictionary matching the HYDROGEN_ALLOCATION_DATA structure.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    table_name = "allocations"
-
-    cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}';")
-    if cursor.fetchone() is None:
-        conn.close()
+    if not table_exists("allocations"):
         return allocation_data_schema  # Return default if table doesn't exist
 
+    conn = get_db_connection()
+    cursor = conn.cursor()
     try:
-        cursor.execute(f"SELECT * FROM {table_name} ORDER BY timestamp DESC LIMIT 1;")
+        cursor.execute("SELECT * FROM allocations ORDER BY timestamp DESC LIMIT 1;")
         row = cursor.fetchone()
         if row:
             latest_data = {}
@@ -263,7 +341,7 @@ def load_latest_allocation_data(allocation_data_schema):
         print(f"Error loading latest allocation data: {e}")
         return allocation_data_schema  # Return default on error
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 
 def load_optimizer_last_run_constraints():
@@ -285,7 +363,7 @@ def load_optimizer_last_run_constraints():
         print(f"Error loading optimizer state: {e}")
         return {}  # Return empty dict on error
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 
 # --- Data Writing Functions ---
@@ -295,14 +373,9 @@ def save_constraints(role_name, current_constraint_values, constraints_schema):
     Saves a new timestamped entry of constraint values for a given role,
     handling single vs. range types.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    table_name = f"constraints_{role_name.replace(' ', '_').replace('-', '_').replace('.', '_').lower()}"
-
-    cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}';")
-    if cursor.fetchone() is None:
+    table_name = constraint_table_name(role_name)
+    if not table_exists(table_name):
         print(f"Table '{table_name}' does not exist. Skipping constraint save.")
-        conn.close()
         return  # Exit if table does not exist
 
     ist = pytz.timezone('Asia/Kolkata')
@@ -330,11 +403,12 @@ def save_constraints(role_name, current_constraint_values, constraints_schema):
             values.append(current_constraint_values.get(c_name, 0))
             placeholders.append("?")
 
-    columns_sql = ", ".join(columns)
-    placeholders_sql = ", ".join(placeholders)
-
-    insert_sql = f"INSERT INTO {table_name} ({columns_sql}) VALUES ({placeholders_sql});"
+    insert_sql = _statement(("insert", table_name, tuple(columns)),
+                            lambda: f'INSERT INTO "{table_name}" ({", ".join(columns)}) '
+                                    f'VALUES ({", ".join(placeholders)});')
 
+    conn = get_db_connection()
+    cursor = conn.cursor()
     try:
         cursor.execute(insert_sql, values)
         conn.commit()
@@ -342,19 +416,16 @@ def save_constraints(role_name, current_constraint_values, constraints_schema):
     except sqlite3.Error as e:
         print(f"Error saving constraints for {role_name}: {e}")
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 
 def save_allocation_data(allocation_data):
     """
     Saves a new timestamped entry of allocation data.
     """
+    global _allocation_revision
     allocation_data.pop("caustic", None)  # dropping keys which are not required to be saved
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    table_name = "allocations"
-
     ist = pytz.timezone('Asia/Kolkata')
     timestamp_key = datetime.datetime.now(ist).isoformat(timespec='milliseconds')
 
@@ -382,19 +453,21 @@ def save_allocation_data(allocation_data):
 
         placeholders.extend(["?", "?", "?", "?", "?", "?", "?"])
 
-    columns_sql = ", ".join(columns)
-    placeholders_sql = ", ".join(placeholders)
-
-    insert_sql = f"INSERT INTO {table_name} ({columns_sql}) VALUES ({placeholders_sql});"
+    insert_sql = _statement(("insert", "allocations", tuple(columns)),
+                            lambda: f'INSERT INTO allocations ({", ".join(columns)}) '
+                                    f'VALUES ({", ".join(placeholders)});')
 
+    conn = get_db_connection()
+    cursor = conn.cursor()
     try:
         cursor.execute(insert_sql, values)
         conn.commit()
+        _allocation_revision += 1
         print(f"Allocation data saved successfully at {timestamp_key}.")
     except sqlite3.Error as e:
         print(f"Error saving allocation data: {e}")
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 
 def save_optimizer_last_run_constraints(constraints_snapshot):
@@ -421,23 +494,7 @@ def save_optimizer_last_run_constraints(constraints_snapshot):
     except sqlite3.Error as e:
         print(f"Error saving optimizer state: {e}")
     finally:
-        conn.close()
-
-
-# --- Initial Database Setup (Called once at app start) ---
-def initialize_db(roles, role_constraints_map, allocation_areas):
-    """
-    Initializes the database by creating all necessary tables if they don't exist.
-    """
-    # Create constraint tables for each role
-    for role in roles:
-        constraints_schema = role_constraints_map.get(role, [])
-        if constraints_schema:  # Only attempt to create if constraints are defined
-            create_constraint_table(role, constraints_schema)
-    # Create the common allocation table
-    create_allocation_table(allocation_areas)
-    create_optimizer_state_table()
-    create_norm_table()
+        release_db_connection(conn)
 
 
 # CONSUMPTION NORM
@@ -453,7 +510,7 @@ def create_norm_table():
         )
     ''')
     conn.commit()
-    conn.close()
+    release_db_connection(conn)
 
 
 def save_norm_value(norm_value):
@@ -478,7 +535,7 @@ def save_norm_value(norm_value):
         else:
             raise e  # Re-raise if it's another error
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 
 def get_latest_norm_value():
@@ -489,12 +546,325 @@ def get_latest_norm_value():
     try:
         cur.execute(f"SELECT norm_value FROM {table_name} ORDER BY timestamp DESC LIMIT 1")
         row = cur.fetchone()
-        return row[0] if row else 280
+        return row[0] if row else DEFAULT_H2_PER_TON_CAUSTIC
     except sqlite3.OperationalError as e:
         if "no such table" in str(e):
             create_norm_table()
-            return 280  # fallback if table didn't exist
+            return DEFAULT_H2_PER_TON_CAUSTIC  # fallback if table didn't exist
         else:
             raise e
     finally:
-        conn.close()
+        release_db_connection(conn)
+
+
+def create_norm_state_table():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    table_name = "caustic_norm_state"
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            id INTEGER PRIMARY KEY DEFAULT 1,
+            state_json TEXT,
+            last_updated TEXT
+        )
+    ''')
+    conn.commit()
+    release_db_connection(conn)
+
+
+def save_norm_batch(aggregates, state_json):
+    """
+    Appends interval aggregates [(timestamp, norm_value), ...] to the norm log and replaces the estimator
+    state, in one transaction.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    ist = pytz.timezone('Asia/Kolkata')
+    last_updated = datetime.datetime.now(ist).isoformat(timespec='milliseconds')
+    try:
+        cursor.executemany("INSERT INTO caustic_norm_log (timestamp, norm_value) VALUES (?, ?)", aggregates)
+        cursor.execute("INSERT OR REPLACE INTO caustic_norm_state (id, state_json, last_updated) VALUES (1, ?, ?)",
+                       (state_json, last_updated))
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Error saving caustic norm state: {e}")
+    finally:
+        release_db_connection(conn)
+
+
+def load_norm_state():
+    """Returns the saved norm estimator state as a JSON string, or None."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT state_json FROM caustic_norm_state WHERE id = 1")
+        row = cursor.fetchone()
+        return row['state_json'] if row else None
+    except sqlite3.Error as e:
+        print(f"Error loading caustic norm state: {e}")
+        return None
+    finally:
+        release_db_connection(conn)
+
+
+def compact_norm_log(interval_s, before):
+    """
+    Replaces the norm log rows older than `before` (an ISO timestamp) with one row per `interval_s`
+    bucket: the first timestamp of the bucket and the mean norm. Returns the number of rows removed.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    bucket = "CAST(strftime('%s', substr(timestamp, 1, 19)) AS INTEGER) / ?"
+    try:
+        cursor.execute(f"SELECT MIN(timestamp), AVG(norm_value), COUNT(*) FROM caustic_norm_log "
+                       f"WHERE timestamp < ? GROUP BY {bucket}", (before, interval_s))
+        buckets = cursor.fetchall()
+        removed = sum(row[2] for row in buckets) - len(buckets)
+        if removed > 0:
+            cursor.execute("DELETE FROM caustic_norm_log WHERE timestamp < ?", (before,))
+            cursor.executemany("INSERT INTO caustic_norm_log (timestamp, norm_value) VALUES (?, ?)",
+                               [(row[0], row[1]) for row in buckets])
+            conn.commit()
+        return max(removed, 0)
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Error compacting caustic norm log: {e}")
+        return 0
+    finally:
+        release_db_connection(conn)
+
+
+# PUBLISHED OPTIMIZER RUNS (shared between replicas)
+
+def create_published_runs_table():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    table_name = "published_runs"
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            run_id INTEGER PRIMARY KEY,
+            published_at REAL,
+            payload_json TEXT
+        )
+    ''')
+    conn.commit()
+    release_db_connection(conn)
+
+
+def save_published_run(run_id, published_at, payload_json, holder=None, lease_name="optimizer"):
+    """
+    Stores a published optimizer run for follower replicas, keeping the last PUBLISHED_RUNS_KEPT runs.
+
+    With `holder` the run is fenced by the leader lease: it is only stored if `holder` still holds the
+    unexpired lease `lease_name`, checked in the same write transaction as the insert, so a leader that
+    lost its lease mid-solve cannot publish over the new leader. A run_id that is already stored is
+    never overwritten.
+
+    Returns:
+        bool: True if the run was stored
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    table_name = "published_runs"
+    try:
+        cursor.execute("BEGIN IMMEDIATE")  # take the write lock before checking the lease
+        if holder is not None:
+            cursor.execute(f"SELECT holder, expires_at FROM {LEASE_TABLE_NAME} WHERE name = ?", (lease_name,))
+            row = cursor.fetchone()
+            if row is None or row['holder'] != holder or row['expires_at'] < time.time():
+                print(f"Not publishing run {run_id}: {holder} no longer holds the '{lease_name}' lease")
+                conn.rollback()
+                return False
+        cursor.execute(f"INSERT INTO {table_name} (run_id, published_at, payload_json) VALUES (?, ?, ?)",
+                       (run_id, published_at, payload_json))
+        cursor.execute(f"DELETE FROM {table_name} WHERE run_id <= ?", (run_id - PUBLISHED_RUNS_KEPT,))
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"Error saving published run {run_id}: {e}")
+        return False
+    finally:
+        release_db_connection(conn)
+
+
+def load_latest_published_run(after_run_id=0):
+    """
+    Returns (run_id, payload_json) of the latest published run if it is newer than `after_run_id`,
+    otherwise None.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    table_name = "published_runs"
+    try:
+        cursor.execute(f"SELECT run_id, payload_json FROM {table_name} WHERE run_id > ? "
+                       f"ORDER BY run_id DESC LIMIT 1", (after_run_id,))
+        row = cursor.fetchone()
+        return (row['run_id'], row['payload_json']) if row else None
+    except sqlite3.Error as e:
+        print(f"Error loading latest published run: {e}")
+        return None
+    finally:
+        release_db_connection(conn)
+
+
+def get_max_published_run_id():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(run_id) FROM published_runs")
+        row = cursor.fetchone()
+        return row[0] or 0
+    except sqlite3.Error as e:
+        print(f"Error reading published run ids: {e}")
+        return 0
+    finally:
+        release_db_connection(conn)
+
+
+# OPTIMIZER TRIGGER REQUESTS (forwarded from follower replicas to the leader)
+
+def create_trigger_request_table():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    table_name = "optimizer_trigger_requests"
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            reason TEXT,
+            priority INTEGER,
+            force INTEGER,
+            refresh_dcs INTEGER,
+            requested_at TEXT
+        )
+    ''')
+    conn.commit()
+    release_db_connection(conn)
+
+
+def save_trigger_request(reason, priority, force, refresh_dcs):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    table_name = "optimizer_trigger_requests"
+
+    ist = pytz.timezone('Asia/Kolkata')
+    requested_at = datetime.datetime.now(ist).isoformat(timespec='milliseconds')
+
+    try:
+        cursor.execute(f"INSERT INTO {table_name} (reason, priority, force, refresh_dcs, requested_at) "
+                       f"VALUES (?, ?, ?, ?, ?)", (reason, priority, int(force), int(refresh_dcs), requested_at))
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Error saving optimizer trigger request: {e}")
+    finally:
+        release_db_connection(conn)
+
+
+def pop_trigger_requests():
+    """Removes and returns every queued trigger request, oldest first."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    table_name = "optimizer_trigger_requests"
+    try:
+        cursor.execute(f"SELECT * FROM {table_name} ORDER BY id ASC")
+        rows = [dict(row) for row in cursor.fetchall()]
+        if rows:
+            cursor.execute(f"DELETE FROM {table_name} WHERE id <= ?", (rows[-1]['id'],))
+            conn.commit()
+        return rows
+    except sqlite3.Error as e:
+        print(f"Error loading optimizer trigger requests: {e}")
+        return []
+    finally:
+        release_db_connection(conn)
+
+
+# --- Schema versioning (applied once per process) ---
+# The fixed tables are created by ordered migrations. Each applied version is recorded in schema_version,
+# so a process only runs the migrations its database has not seen. Every migration is idempotent
+# (IF NOT EXISTS), so databases created before versioning adopt version 1 as they are, and two replicas
+# migrating at the same time only repeat no-ops. The constraint tables of the configured roles and the
+# allocation table depend on the role and area configuration. initialize_db creates them when they are
+# missing from the catalog.
+
+SCHEMA_VERSION_TABLE = "schema_version"
+
+
+def _migrate_baseline():
+    create_optimizer_state_table()
+    create_norm_table()
+    create_norm_state_table()
+    create_published_runs_table()
+    create_trigger_request_table()
+
+
+def _migrate_norm_log_index():
+    conn = get_db_connection()
+    try:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_caustic_norm_log_timestamp ON caustic_norm_log (timestamp)")
+        conn.commit()
+    finally:
+        release_db_connection(conn)
+
+
+SCHEMA_MIGRATIONS = [
+    (1, "optimizer state, caustic norm, published run and trigger request tables", _migrate_baseline),
+    (2, "audit log table", initialize_audit_log_table),
+    (3, "caustic norm log timestamp index", _migrate_norm_log_index),
+]
+
+
+def _schema_version(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT
+        )
+    """)
+    conn.commit()
+    return conn.execute(f"SELECT MAX(version) FROM {SCHEMA_VERSION_TABLE}").fetchone()[0] or 0
+
+
+def _record_migration(version, description):
+    conn = get_db_connection()
+    ist = pytz.timezone('Asia/Kolkata')
+    applied_at = datetime.datetime.now(ist).isoformat(timespec='milliseconds')
+    try:
+        conn.execute(f"INSERT OR IGNORE INTO {SCHEMA_VERSION_TABLE} (version, description, applied_at) "
+                     f"VALUES (?, ?, ?)", (version, description, applied_at))
+        conn.commit()
+    finally:
+        release_db_connection(conn)
+
+
+def initialize_db(roles, role_constraints_map, allocation_areas):
+    """
+    Brings the database schema up to date, once per process. It applies the pending migrations in order and
+    creates the constraint tables of configured roles and the allocation table if they are missing. It then
+    loads the schema cache. Later calls return immediately.
+    """
+    global _schema_ready, _known_tables
+    with _schema_lock:
+        if _schema_ready:
+            return
+        conn = get_db_connection()
+        try:
+            current_version = _schema_version(conn)
+        finally:
+            release_db_connection(conn)
+        for version, description, migrate in SCHEMA_MIGRATIONS:
+            if version > current_version:
+                migrate()
+                _record_migration(version, description)
+                print(f"Applied schema migration {version}: {description}")
+
+        tables = _load_known_tables()
+        for role in roles:
+            constraints_schema = role_constraints_map.get(role, [])
+            # Only attempt to create if constraints are defined
+            if constraints_schema and constraint_table_name(role) not in tables:
+                create_constraint_table(role, constraints_schema)
+        if "allocations" not in tables:
+            create_allocation_table(allocation_areas)
+        _known_tables = _load_known_tables()
+        _schema_ready = True
@@ -1,16 +1,444 @@
-# This is a sample Python script.
+"""
+Headless entry point for the optimizer. Nothing here imports Streamlit, so the pipeline can run on a
+schedule independent of UI traffic:
 
-# Press ⌃R to execute it or replace it with your code.
-# Press Double ⇧ to search everywhere for classes, files, tool windows, actions, and settings.
+    python main.py run-once [--force]
+    python main.py daemon [--interval 60]
+    python main.py backfill --start "2025-07-19 00:00" --end "2025-07-20 00:00" [--input frames.xlsx]
+    python main.py bench [--runs 20] [--input frames.xlsx]
+    python main.py serve [--port 8600]
+    python main.py ingest-history --start 2023-01-01 [--end 2025-01-01] [--output-dir data/dcs_history_ingest]
+    python main.py compact-frames [--before 2025-07-20]
+    python main.py build-corpus [--output data/dcs_corpus.arrow]
+    python main.py synthesize --frames 1000000 [--mix normal=0.5,venting=0.5] [--seed 7]
 
+Every line a command writes to stdout is one JSON log event; plain-text diagnostics printed by the pipeline,
+the optimizer service and the data sources go to stderr while the command runs. Exit codes are listed below.
+"""
+import argparse
+import contextlib
+import datetime
+import fcntl
+import json
+import os
+import signal
+import sys
+import threading
+import time
 
-def print_hi(name):
-    # Use a breakpoint in the code line below to debug your script.
-    print(f'Hi, {name}')  # Press ⌘F8 to toggle the breakpoint.
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytz
 
+from data_pipelines.bank_fleet import bank_fleet_history
+from data_pipelines.dcs_sources import get_dcs_source
+from data_pipelines.frame_store import get_dcs_frame_store
+from data_pipelines.delta_table import (clean_dcs_frames, compute_dcs_constraints, get_frame_timestamp,
+                                        dcs_signal_inputs, frame_times_s)
+from data_pipelines.history_ingest import ingest_dcs_history
+from data_pipelines.norm_estimator import flush_norm_estimator
+from data_pipelines.synthetic_frames import iter_dcs_frames
+from data_pipelines.xlsx_corpus import build_dcs_corpus, load_dcs_corpus
+from database import initialize_db
+from optimizer.optimizer_service import OptimizerService
+from optimizer.pipeline import fetch_dcs_snapshot, load_constraint_snapshot, generate_recommendations
+from optimizer.recommendation_api import start_api_server
+from optimizer.run_context import RunContext
+from optimizer.trigger_queue import PRIORITY_MANUAL
+from parameters.constants import column_name_mapping
+from params import *
+from utils.leader_election import LeaderLease
 
-# Press the green button in the gutter to run the script.
-if __name__ == '__main__':
-    print_hi('PyCharm')
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2  # argparse
+EXIT_LOCKED = 3  # another daemon / run-once holds the lock file
+EXIT_NO_DATA = 4  # backfill or bench found no DCS frames
+EXIT_NOT_LEADER = 5  # run-once: another replica holds the optimizer lease
+
+
+# --- Logging ---
+# main() points sys.stdout at stderr while a command runs, so the print() diagnostics of the modules below
+# (run logs, header pressure, service and cache messages) never interleave with the events, which keep
+# writing to the stream that was stdout when the command started.
+
+_event_stream = None
+
+
+def log_event(event, **fields):
+    ist = pytz.timezone('Asia/Kolkata')
+    record = {"ts": datetime.datetime.now(ist).isoformat(timespec='milliseconds'), "event": event, **fields}
+    print(json.dumps(record, default=str), file=_event_stream or sys.stdout, flush=True)
+
+
+# --- PID / lock file ---
+
+class LockHeldError(RuntimeError):
+    pass
+
+
+class PidLock:
+    """Exclusive lock on a PID file, so only one scheduled optimizer writes recommendations per host."""
+
+    def __init__(self, path=DAEMON_LOCK_PATH):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+")
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._file.seek(0)
+            holder = self._file.read().strip()
+            self._file.close()
+            raise LockHeldError(f"{self.path} is locked by pid {holder or 'unknown'}")
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(str(os.getpid()))
+        self._file.flush()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+# --- Helpers ---
+
+def load_frames(args):
+    """Historical DCS frames (oldest first) from --input, the local frame store (--from-store) or the DCS source."""
+    if args.input:
+        if args.input.endswith((".xlsx", ".xls")):
+            data = pd.read_excel(args.input)
+        elif args.input.endswith(".parquet"):
+            data = pd.read_parquet(args.input)
+        elif args.input.endswith(".arrow"):
+            data = load_dcs_corpus(args.input, signals=False).to_pandas()
+        else:
+            data = pd.read_csv(args.input)
+        data = data.rename(columns=column_name_mapping)
+        data['TimeStamp'] = pd.to_datetime(data['TimeStamp'])
+        if args.start:
+            data = data[data['TimeStamp'] >= pd.Timestamp(args.start)]
+        if args.end:
+            data = data[data['TimeStamp'] <= pd.Timestamp(args.end)]
+        data = clean_dcs_frames(data.sort_values('TimeStamp'))
+    elif args.from_store:
+        data = get_dcs_frame_store().read(args.start, args.end).to_pandas()
+    else:
+        log_event("load_frames.reading", source=get_dcs_source().name, start=args.start, end=args.end)
+        data = get_dcs_source().read_range(args.start, args.end).to_pandas()
+    return data.reset_index(drop=True)
+
+
+def snapshot_from_frame(frame, bank_fleet=None):
+    """
+    Builds a DCS snapshot like fetch_dcs_snapshot() from a single-row frame without touching the norm log.
+    `bank_fleet` adds the bank fleet model's entries for the frame (see bank_fleet_history).
+    """
+    dcs_constraints, current_flow = compute_dcs_constraints(frame, record_norm=False)
+    if bank_fleet is not None:
+        dcs_constraints.update({k: round(v, 2) for k, v in bank_fleet.items()})
+    return {
+        "timestamp": get_frame_timestamp(frame),
+        "dcs_constraints": dcs_constraints,
+        "current_flow": current_flow,
+        "raw_data": frame,
+    }
+
+
+def summarize(values):
+    values = np.asarray(values, dtype=float)
+    return {
+        "mean": round(float(values.mean()), 4),
+        "p50": round(float(np.percentile(values, 50)), 4),
+        "p95": round(float(np.percentile(values, 95)), 4),
+        "max": round(float(values.max()), 4),
+    }
+
+
+# --- Commands ---
+
+def run_once(args):
+    with PidLock(args.lock_file):
+        service = OptimizerService()
+        # Hold the optimizer lease (renewed while solving) for the run, so it never publishes next to a
+        # daemon or dashboard replica that leads on the shared database
+        service.lease.start()
+        try:
+            if not service.is_leader():
+                log_event("run_once.not_leader", holder=service.lease.current_holder())
+                return EXIT_NOT_LEADER
+            previous = service.sync_from_store()
+            published = service.run_now(["CLI run-once."], force=args.force, refresh_dcs=True,
+                                        priority=PRIORITY_MANUAL)
+        finally:
+            service.lease.stop()
+        if published is None:
+            log_event("run_once.not_published")
+            return EXIT_FAILURE
+        skipped = previous is not None and published is previous
+        log_event("run_once.finished", skipped=skipped, run_id=published.run_id,
+                  reasons=list(published.reasons), dcs_timestamp=published.dcs_timestamp,
+                  timings=published.timings)
+    return EXIT_OK
+
+
+def stop_on_signal(command):
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        log_event(f"{command}.stopping", signal=signal.Signals(signum).name)
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    return stop_event
+
+
+def daemon(args):
+    stop_event = stop_on_signal("daemon")
+    with PidLock(args.lock_file):
+        service = OptimizerService(poll_interval_s=args.interval)
+        service.start()
+        server = start_api_server(service, port=args.http_port) if args.http_port else None
+        log_event("daemon.started", pid=os.getpid(), interval_s=args.interval, holder=service.lease.holder_id,
+                  http_port=args.http_port)
+        try:
+            while not stop_event.wait(args.interval):
+                latest = service.latest()
+                log_event("daemon.heartbeat", leader=service.is_leader(), busy=service.is_busy(),
+                          run_id=latest.run_id if latest is not None else None,
+                          dcs_timestamp=latest.dcs_timestamp if latest is not None else None)
+        finally:
+            if server is not None:
+                server.shutdown()
+            service.stop()
+            log_event("daemon.stopped")
+    return EXIT_OK
+
+
+def serve(args):
+    """Serves the recommendation API from the runs published in the shared database, never solving."""
+    stop_event = stop_on_signal("serve")
+    service = OptimizerService(lease=LeaderLease("optimizer", candidate=False))
+    service.start()
+    server = start_api_server(service, host=args.host, port=args.port)
+    log_event("serve.started", pid=os.getpid(), host=args.host, port=server.server_address[1])
+    try:
+        stop_event.wait()
+    finally:
+        server.shutdown()
+        service.stop()
+        log_event("serve.stopped")
+    return EXIT_OK
+
+
+def backfill(args):
+    frames = load_frames(args)
+    if frames.empty:
+        log_event("backfill.no_data", start=args.start, end=args.end)
+        return EXIT_NO_DATA
 
-# See PyCharm help at https://www.jetbrains.com/help/pycharm/
+    constraints = load_constraint_snapshot()
+    bank_fleet = bank_fleet_history(frame_times_s(frames), dcs_signal_inputs(frames))
+    rows = []
+    failed = 0
+    for i in range(len(frames)):
+        frame = frames.iloc[[i]]
+        try:
+            ctx = RunContext(run_id=i + 1, reasons=["CLI backfill."], priority=PRIORITY_MANUAL, force=True)
+            ctx.set_constraints(constraints)
+            ctx.dcs_snapshot = snapshot_from_frame(frame, bank_fleet[i])
+            recommendations, duration = generate_recommendations(ctx)
+        except Exception as e:
+            failed += 1
+            log_event("backfill.frame_failed", timestamp=get_frame_timestamp(frame), error=str(e))
+            continue
+        for area, row in recommendations.items():
+            rows.append({"TimeStamp": ctx.dcs_snapshot["timestamp"], "area": area, **row.as_dict()})
+
+    output = args.output or os.path.join(
+        DATA_DIR, f"backfill_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    pd.DataFrame(rows).to_csv(output, index=False)
+    log_event("backfill.finished", frames=len(frames), failed=failed, output=output)
+    return EXIT_OK if failed < len(frames) else EXIT_FAILURE
+
+
+def bench(args):
+    fetch_start = time.perf_counter()
+    if args.input or args.from_store:
+        frames = load_frames(args)
+        if frames.empty:
+            log_event("bench.no_data", input=args.input)
+            return EXIT_NO_DATA
+        raw = frames.iloc[[-1]]
+    else:
+        raw = fetch_dcs_snapshot()["raw_data"]
+    fetch_s = time.perf_counter() - fetch_start
+    constraints = load_constraint_snapshot()
+
+    timings = {}
+    for i in range(args.runs):
+        ctx = RunContext(run_id=i + 1, reasons=["CLI bench."], priority=PRIORITY_MANUAL, force=True)
+        ctx.set_constraints(constraints)
+        with ctx.timed("dcs_constraints"):
+            ctx.dcs_snapshot = snapshot_from_frame(raw)
+        with ctx.timed("total"):
+            generate_recommendations(ctx)
+        for stage, seconds in ctx.timings.items():
+            timings.setdefault(stage, []).append(seconds)
+
+    log_event("bench.finished", runs=args.runs, fetch_s=round(fetch_s, 4),
+              stages_s={stage: summarize(values) for stage, values in timings.items()})
+    return EXIT_OK
+
+
+def ingest_history(args):
+    state = ingest_dcs_history(args.start, args.end, output_dir=args.output_dir, chunk_hours=args.chunk_hours,
+                               progress=lambda chunk: log_event("ingest_history.chunk", **chunk))
+    log_event("ingest_history.finished", **state)
+    return EXIT_OK
+
+
+def build_corpus(args):
+    corpus = build_dcs_corpus(output=args.output)
+    log_event("build_corpus.finished", frames=corpus.num_rows, columns=corpus.num_columns, output=args.output)
+    return EXIT_OK
+
+
+def parse_regime_mix(text):
+    """"normal=0.5,venting=0.5" -> {"normal": 0.5, "venting": 0.5}"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def synthesize(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    regime_mix = parse_regime_mix(args.mix) if args.mix else None
+    written = 0
+    for i, table in enumerate(iter_dcs_frames(args.frames, batch_rows=args.batch_rows, regime_mix=regime_mix,
+                                              seed=args.seed, start=args.start, interval_s=args.interval)):
+        pq.write_table(table, os.path.join(args.output_dir, f"part-{i:05d}.parquet"))
+        written += table.num_rows
+    log_event("synthesize.finished", frames=written, output_dir=args.output_dir)
+    return EXIT_OK
+
+
+def compact_frames(args):
+    days = get_dcs_frame_store().compact(args.before)
+    log_event("compact_frames.finished", days=days)
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Hydrogen allocation optimizer without the UI.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_once_parser = subparsers.add_parser("run-once", help="fetch, solve and publish one recommendation")
+    run_once_parser.add_argument("--force", action="store_true",
+                                 help="solve even if neither DCS data nor constraints changed")
+    run_once_parser.add_argument("--lock-file", default=DAEMON_LOCK_PATH)
+    run_once_parser.set_defaults(handler=run_once)
+
+    daemon_parser = subparsers.add_parser("daemon", help="run the optimizer service until SIGTERM")
+    daemon_parser.add_argument("--interval", type=float, default=OPTIMIZER_POLL_INTERVAL_S,
+                               help="seconds between DCS polls")
+    daemon_parser.add_argument("--http-port", type=int, default=None,
+                               help="also serve the recommendation API on this port")
+    daemon_parser.add_argument("--lock-file", default=DAEMON_LOCK_PATH)
+    daemon_parser.set_defaults(handler=daemon)
+
+    serve_parser = subparsers.add_parser("serve", help="serve published recommendations over HTTP")
+    serve_parser.add_argument("--host", default=HTTP_API_HOST)
+    serve_parser.add_argument("--port", type=int, default=HTTP_API_PORT)
+    serve_parser.set_defaults(handler=serve)
+
+    ingest_parser = subparsers.add_parser("ingest-history",
+                                          help="stream DCS history with derived signals into local Parquet")
+    ingest_parser.add_argument("--start", help="first TimeStamp (optional when resuming)")
+    ingest_parser.add_argument("--end", help="end of the range, exclusive (default: now)")
+    ingest_parser.add_argument("--output-dir", default=DCS_HISTORY_INGEST_DIR)
+    ingest_parser.add_argument("--chunk-hours", type=float, default=DCS_HISTORY_CHUNK_HOURS)
+    ingest_parser.set_defaults(handler=ingest_history)
+
+    compact_parser = subparsers.add_parser("compact-frames",
+                                           help="merge each day of the local DCS frame store into one file")
+    compact_parser.add_argument("--before", help="compact days before this date (default: today)")
+    compact_parser.set_defaults(handler=compact_frames)
+
+    corpus_parser = subparsers.add_parser("build-corpus",
+                                          help="convert the data/*.xlsx tag exports into a memory-mapped corpus")
+    corpus_parser.add_argument("--output", default=DCS_CORPUS_PATH)
+    corpus_parser.set_defaults(handler=build_corpus)
+
+    synthesize_parser = subparsers.add_parser("synthesize",
+                                              help="write synthetic DCS frames for scale and stress tests")
+    synthesize_parser.add_argument("--frames", type=int, required=True)
+    synthesize_parser.add_argument("--mix", help="regime weights, e.g. normal=0.7,venting=0.3 "
+                                                 "(see synthetic_frames.REGIMES)")
+    synthesize_parser.add_argument("--seed", type=int, default=None)
+    synthesize_parser.add_argument("--start", default="2025-01-01", help="TimeStamp of the first frame")
+    synthesize_parser.add_argument("--interval", type=float, default=60, help="seconds between frames")
+    synthesize_parser.add_argument("--batch-rows", type=int, default=DCS_HISTORY_BATCH_ROWS)
+    synthesize_parser.add_argument("--output-dir", default=DCS_SYNTHETIC_DIR)
+    synthesize_parser.set_defaults(handler=synthesize)
+
+    for name, handler, help_text in [("backfill", backfill, "re-solve historical DCS frames into a CSV"),
+                                     ("bench", bench, "time the pipeline stages on one frame")]:
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--input", help="csv/xlsx/parquet/arrow (corpus) of DCS frames instead of the DCS source")
+        sub.add_argument("--from-store", action="store_true",
+                         help="read the frames from the local DCS frame store instead of the DCS source")
+        sub.add_argument("--start", help="first TimeStamp to include")
+        sub.add_argument("--end", help="last TimeStamp to include")
+        sub.set_defaults(handler=handler)
+        if name == "backfill":
+            sub.add_argument("--output", help="CSV path for the recommendations (default: data/backfill_*.csv)")
+        else:
+            sub.add_argument("--runs", type=int, default=20)
+    return parser
+
+
+def run_command(args):
+    if args.command == "backfill" and not args.input and not args.from_store and not (args.start and args.end):
+        log_event("usage_error", message="backfill from the DCS source needs --start and --end")
+        return EXIT_USAGE
+
+    initialize_db(ROLES, get_constraints(), list(HYDROGEN_ALLOCATION_DATA.keys()))
+    log_event("command.started", command=args.command)
+    try:
+        return args.handler(args)
+    except LockHeldError as e:
+        log_event("command.locked", command=args.command, error=str(e))
+        return EXIT_LOCKED
+    except Exception as e:
+        log_event("command.failed", command=args.command, error=repr(e))
+        return EXIT_FAILURE
+    finally:
+        # keep the norm samples of the last flush interval, also when a signal stopped the daemon
+        flush_norm_estimator()
+
+
+def main(argv=None):
+    global _event_stream
+    args = build_parser().parse_args(argv)
+    _event_stream = sys.stdout
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            return run_command(args)
+    finally:
+        _event_stream = None
+
+
+if __name__ == '__main__':
+    sys.exit(main())
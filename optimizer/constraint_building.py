@@ -9,8 +9,15 @@ def fix_bank_constraints(dcs_constraints, prices, constraints, final_constraints
 
     final_constraints['bank']['max'] = dcs_constraints['bank_available'] - (
             dcs_constraints['bank_available'] / dcs_constraints['number_of_banks'])
-    if final_constraints['bank']['max'] < dcs_constraints['calculated_bank_flow']:
-        final_constraints['bank']['max'] = dcs_constraints['calculated_bank_flow']
+    if 'bank_max_intake_flow' in dcs_constraints:
+        # bank fleet model: the compressors cannot move more, and the banks cannot take more than they have left
+        final_constraints['bank']['max'] = min(final_constraints['bank']['max'],
+                                               dcs_constraints['bank_max_intake_flow'],
+                                               dcs_constraints['bank_remaining_capacity'] / BANK_PLANNING_HORIZON_HRS)
+    # never below what the running compressors move now (at the fleet model's throughput when it ran)
+    current_bank_flow = dcs_constraints.get('bank_estimated_flow', dcs_constraints['calculated_bank_flow'])
+    if final_constraints['bank']['max'] < current_bank_flow:
+        final_constraints['bank']['max'] = current_bank_flow
 
     if dcs_constraints['number_of_banks'] < 1:
         final_constraints['bank']['max'] = 0
@@ -81,13 +88,13 @@ def fix_flaker_constraints(dcs_constraints, constraints, final_constraints):
                 final_constraints[f'flaker-{i}']['min'] = dcs_constraints[f'flaker-{i}_h2_flow']
                 final_constraints[f'flaker-{i}']['max'] = dcs_constraints[f'flaker-{i}_h2_flow']
         else:
-            if not np.isinf(dcs_constraints['flaker-3_consumption_norm']):
+            if np.isfinite(dcs_constraints['flaker-3_consumption_norm']):
                 if dcs_constraints['flaker-3_consumption_norm'] > 100:
                     final_constraints['flaker-3']['min'] = dcs_constraints['flaker-3_h2_flow']
                     final_constraints['flaker-3']['max'] = dcs_constraints['flaker-3_consumption_norm'] * \
                                                            dcs_constraints[
                                                                'flaker-3_load']
-            if not np.isinf(dcs_constraints['flaker-4_consumption_norm']):
+            if np.isfinite(dcs_constraints['flaker-4_consumption_norm']):
                 if dcs_constraints['flaker-4_consumption_norm'] > 100:
                     final_constraints['flaker-4']['min'] = dcs_constraints['flaker-4_h2_flow']
                     final_constraints['flaker-4']['max'] = dcs_constraints['flaker-4_consumption_norm'] * \
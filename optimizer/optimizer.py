@@ -1,11 +1,11 @@
-import streamlit as st
 from pyomo.environ import *
 from pyomo.opt import SolverFactory
 
 from params import *
 
 
-def build_h2_optimizer(total_h2_generated, duration, final_constraints, prices):
+def build_h2_optimizer(total_h2_generated, duration, final_constraints, prices,
+                       duration_threshold=DEFAULT_H2O2_DURATION_THRESHOLD, bank_unit_flow=BANK_COMPRESSOR_FLOW_NM3_HR):
     """
     Builds a Pyomo optimization model for hydrogen allocation.
 
@@ -14,6 +14,8 @@ def build_h2_optimizer(total_h2_generated, duration, final_constraints, prices):
         duration (int): The duration in days, used to determine H2O2 allocation priority.
         final_constraints (dict): Final min and max for allocation areas
         prices (dict): Contribution margin for all allocation areas
+        duration_threshold (float): H2O2 load increase/decrease time (hrs) beyond which H2O2 is prioritised
+        bank_unit_flow (float): Flow of one bank compressor; the bank is allocated in multiples of it
 
     Returns:
         pyomo.environ.ConcreteModel: The constructed Pyomo model.
@@ -26,15 +28,6 @@ def build_h2_optimizer(total_h2_generated, duration, final_constraints, prices):
     # Determine effective contribution margins, applying priority for H2O2 if duration > 3
     effective_contribution_margin = contribution_margin_base.copy()
 
-    if 'H2O2 Plant' in st.session_state.constraint_values.keys():
-        duration_threshold = \
-            st.session_state.constraint_values['H2O2 Plant']['Load increase/decrease time for H2O2 (hrs)']
-    elif 'H2O2 Plant' in st.session_state.last_run_constraints.keys():
-        duration_threshold = \
-            st.session_state.last_run_constraints['H2O2 Plant']['Load increase/decrease time for H2O2 (hrs)']
-    else:
-        duration_threshold = 8
-
     if duration > duration_threshold:
         effective_contribution_margin['H2O2'] += 1_000_000  # A large number to ensure priority
 
@@ -67,12 +60,12 @@ def build_h2_optimizer(total_h2_generated, duration, final_constraints, prices):
 
     model.total_h2_constraint = Constraint(rule=total_h2_constraint_rule)
 
-    # Ensure bank is allocated in multiples of 440
+    # Ensure bank is allocated in multiples of one compressor's flow
     if 'bank' in dummy_constraints:
         model.bank_units = Var(domain=NonNegativeIntegers)
 
         def bank_allocation_multiple_rule(model):
-            return model.h2_amount['bank'] == 440 * model.bank_units
+            return model.h2_amount['bank'] == bank_unit_flow * model.bank_units
 
         model.bank_allocation_multiple = Constraint(rule=bank_allocation_multiple_rule)
 
@@ -167,7 +160,8 @@ def flaker_mismatch_handling(p, allocation_amount, dcs_constraints):
 
 def solve_h2_optimizer(duration, final_constraints, prices,
                        current_flow,
-                       dcs_constraints=dcs_constraints_dummy):
+                       dcs_constraints=dcs_constraints_dummy,
+                       duration_threshold=DEFAULT_H2O2_DURATION_THRESHOLD):
     """
     Builds and solves the H2 allocation optimization model.
 
@@ -177,6 +171,7 @@ def solve_h2_optimizer(duration, final_constraints, prices,
         prices (dict): Contribution margin for all allocation areas
         current_flow (dict): current flows
         dcs_constraints (dict): constraints from DCS
+        duration_threshold (float): H2O2 load increase/decrease time (hrs), see build_h2_optimizer
 
     Returns:
         dict: A dictionary containing the optimization results (objective value,
@@ -195,7 +190,10 @@ def solve_h2_optimizer(duration, final_constraints, prices,
         total_h2_generated = total_flow_excluding_vent
 
     # total_h2_generated = max(total_h2_generated, dcs_constraints['caustic_production'] * 280)
-    model = build_h2_optimizer(total_h2_generated, duration, final_constraints, prices)
+    # the bank fleet model's learned per-compressor throughput, the flat first estimate without it
+    bank_unit_flow = dcs_constraints.get('bank_throughput_per_compressor', BANK_COMPRESSOR_FLOW_NM3_HR)
+    model = build_h2_optimizer(total_h2_generated, duration, final_constraints, prices, duration_threshold,
+                               bank_unit_flow)
 
     # Initialize the CBC solver. Ensure 'cbc' is installed and accessible in your system's PATH.
     # If you have another solver (e.g., GLPK), you can specify it here: SolverFactory('glpk')
@@ -0,0 +1,360 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, fields
+from io import StringIO
+
+import pandas as pd
+
+from data_pipelines.dcs_cache import DcsLogWatcher, get_dcs_snapshot_cache
+from data_pipelines.norm_estimator import flush_norm_estimator
+from data_pipelines.pressure_predictor import HeaderPressurePredictor, extract_pressure_features
+from database import (save_published_run, load_latest_published_run, get_max_published_run_id,
+                      save_trigger_request, pop_trigger_requests)
+from optimizer.pipeline import (fetch_dcs_snapshot,
+                                dcs_frame_advanced,
+                                load_constraint_snapshot,
+                                is_header_pressure_breached,
+                                generate_recommendations,
+                                persist_recommendations)
+from optimizer.run_context import RunContext, derive_thresholds
+from optimizer.results import AllocationRow, RecommendationResult
+from optimizer.trigger_queue import (TriggerQueue, TriggerRequest, merge_reasons,
+                                     PRIORITY_HEADER_PRESSURE, PRIORITY_ROUTINE)
+from params import *
+from utils.leader_election import LeaderLease
+
+
+@dataclass(frozen=True)
+class PublishedRecommendation:
+    """Result of one optimizer run, shared read-only by every session."""
+    run_id: int
+    started_at: float
+    published_at: float
+    reasons: tuple
+    priority: int
+    dcs_timestamp: object
+    dcs_constraints: dict
+    current_flow: dict
+    raw_data: object
+    constraints: dict
+    thresholds: dict
+    timings: dict
+    recommendations: RecommendationResult
+    duration: float
+    data_quality: dict = None
+    dcs_epoch: int = 0  # DcsSnapshotCache epoch of the DCS frame
+
+
+def json_default(value):
+    item = getattr(value, "item", None)  # numpy scalars
+    if callable(item):
+        return item()
+    return str(value)
+
+
+def published_to_json(published):
+    payload = {f.name: getattr(published, f.name) for f in fields(published)}
+    payload["recommendations"] = [asdict(row) for row in published.recommendations.rows]
+    payload["raw_data"] = published.raw_data.to_json(orient="split", date_format="iso") \
+        if isinstance(published.raw_data, pd.DataFrame) else None
+    return json.dumps(payload, default=json_default)
+
+
+def published_from_json(payload_json):
+    payload = json.loads(payload_json)
+    payload["reasons"] = tuple(payload["reasons"])
+    payload["recommendations"] = RecommendationResult(tuple(AllocationRow(**row)
+                                                            for row in payload["recommendations"]))
+    payload["raw_data"] = pd.read_json(StringIO(payload["raw_data"]), orient="split") \
+        if payload["raw_data"] else None
+    return PublishedRecommendation(**payload)
+
+
+class OptimizerService:
+    """
+    Runs the fetch -> constrain -> solve -> persist pipeline once per DCS update for the whole process
+    and publishes the result. Sessions only read the latest published recommendation, so the cost stays
+    constant however many dashboards are open.
+
+    A poller thread fetches DCS and queues a trigger when a new frame lands; a single worker thread
+    drains the trigger queue, so triggers from the poller and from every session are coalesced into
+    one run per debounce window.
+
+    With several replicas on a shared database only the holder of the leader lease fetches DCS and
+    solves. Followers forward their triggers to the leader through the database and serve the runs
+    it publishes there.
+    """
+
+    def __init__(self, poll_interval_s=OPTIMIZER_POLL_INTERVAL_S, lease=None):
+        self.poll_interval_s = poll_interval_s
+        self.triggers = TriggerQueue()
+        self.lease = lease if lease is not None else LeaderLease("optimizer")
+        self.lease.on_change = self._on_leadership_change
+        self._run_lock = threading.Lock()  # serialises pipeline runs
+        self._state_lock = threading.Lock()  # guards start/stop
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._io_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="optimizer-io")
+        self._dcs_snapshot = None
+        self._observed_timestamp = None  # newest DCS frame the triggers have seen
+        self._observed_epoch = 0
+        self._observe_lock = threading.Lock()
+        self._dcs_watcher = DcsLogWatcher(get_dcs_snapshot_cache(), active=self.is_leader)
+        get_dcs_snapshot_cache().subscribe(self._on_dcs_snapshot)
+        self._latest = None
+        self._run_count = 0
+        self.pressure_predictor = HeaderPressurePredictor()
+
+    def start(self):
+        """Starts the poller and worker threads. Safe to call on every Streamlit rerun."""
+        with self._state_lock:
+            if self._threads and all(thread.is_alive() for thread in self._threads):
+                return
+            self._stop_event.clear()
+            self.sync_from_store()  # serve the last published run straight away, also after a restart
+            self.lease.start()
+            self._threads = [
+                threading.Thread(target=self._poll_loop, name="optimizer-poller", daemon=True),
+                threading.Thread(target=self._worker_loop, name="optimizer-worker", daemon=True),
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._dcs_watcher.start()
+
+    def stop(self, timeout=None):
+        with self._state_lock:
+            self._stop_event.set()
+            self._dcs_watcher.stop()
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+            self.lease.stop()
+            flush_norm_estimator()  # the estimator only writes on its flush interval otherwise
+
+    def latest(self):
+        """Returns the latest PublishedRecommendation, or None if nothing has been published yet."""
+        return self._latest
+
+    def is_leader(self):
+        return self.lease.is_leader()
+
+    def is_busy(self):
+        """True while a run is in progress or triggers are waiting in the queue."""
+        return self._run_lock.locked() or self.triggers.pending_count() > 0
+
+    def request_run(self, reason, priority, force=False, refresh_dcs=False):
+        """
+        Queues an optimizer trigger. On a follower replica the trigger is forwarded to the leader.
+
+        Returns:
+            TriggerRequest: wait on it to get the PublishedRecommendation of the run that covered it
+                (forwarded requests are never resolved locally)
+        """
+        if not self.is_leader():
+            save_trigger_request(reason, priority, force, refresh_dcs)
+            return TriggerRequest(reason, priority, force, refresh_dcs)
+        return self.triggers.submit(reason, priority, force, refresh_dcs)
+
+    def run_now(self, reasons, force=False, refresh_dcs=True, priority=PRIORITY_ROUTINE):
+        """
+        Runs the pipeline synchronously and returns the latest published recommendation.
+        Without `force` the solve is skipped when neither the DCS frame nor the constraints changed.
+        """
+        with self._run_lock:
+            # continue after the latest published run, also when it was loaded from the shared store; the id
+            # is only taken once the run is published, so skipped runs leave no gaps
+            latest = self._latest
+            run_id = max(self._run_count, latest.run_id if latest is not None else 0) + 1
+            ctx = RunContext(run_id=run_id, reasons=list(reasons), priority=priority, force=force)
+            return self._run_pipeline(ctx, refresh_dcs)
+
+    def _load_inputs(self, ctx, refresh_dcs):
+        if refresh_dcs or self._dcs_snapshot is None:
+            # The Azure read and the constraint loads are independent, so overlap them
+            dcs_future = self._io_executor.submit(fetch_dcs_snapshot, 0)
+            with ctx.timed("load_constraints"):
+                ctx.set_constraints(load_constraint_snapshot())
+            with ctx.timed("fetch_dcs"):
+                self._dcs_snapshot = dcs_future.result()
+        else:
+            with ctx.timed("load_constraints"):
+                ctx.set_constraints(load_constraint_snapshot())
+        ctx.dcs_snapshot = self._dcs_snapshot
+
+    def _run_pipeline(self, ctx, refresh_dcs):
+        self._load_inputs(ctx, refresh_dcs)
+
+        latest = self._latest
+        changes = []
+        if latest is None:
+            changes.append("No published recommendation yet.")
+        else:
+            if dcs_frame_advanced(ctx.dcs_snapshot["timestamp"], latest.dcs_timestamp,
+                                  ctx.dcs_snapshot.get("epoch", 0), latest.dcs_epoch):
+                changes.append("New DCS data.")
+            if ctx.constraints != latest.constraints:
+                changes.append("Constraint changes detected.")
+        if not ctx.force and not changes:
+            # TimeStamp not advanced and same constraints as the published run, re-solving would give the same answer
+            ctx.log("No new DCS data or constraint changes, keeping the published recommendation.")
+            return latest
+        quality = ctx.dcs_snapshot.get("quality")
+        if not ctx.force and latest is not None and quality is not None and not quality["ok"]:
+            ctx.log(f"DCS data quality gate failed on {', '.join(quality['critical_tags'])}, "
+                    f"keeping the published recommendation.")
+            return latest
+
+        ctx.reasons += changes
+        if is_header_pressure_breached(ctx.dcs_constraints, ctx.thresholds):
+            ctx.reasons.append("Header pressure condition met.")
+        reasons = tuple(dict.fromkeys(ctx.reasons))
+
+        ctx.log(f"Optimizer service run due to: {', '.join(reasons)}")
+        recommendations, duration = generate_recommendations(ctx)
+
+        published = PublishedRecommendation(
+            run_id=ctx.run_id,
+            started_at=ctx.created_at,
+            published_at=time.time(),
+            reasons=reasons,
+            priority=ctx.priority,
+            dcs_timestamp=ctx.dcs_snapshot["timestamp"],
+            dcs_constraints=ctx.dcs_constraints,
+            current_flow=ctx.current_flow,
+            raw_data=ctx.dcs_snapshot["raw_data"],
+            constraints=ctx.constraints,
+            thresholds=ctx.thresholds,
+            timings=dict(ctx.timings),
+            recommendations=recommendations,
+            duration=duration,
+            data_quality=ctx.dcs_snapshot.get("quality"),
+            dcs_epoch=ctx.dcs_snapshot.get("epoch", 0),
+        )
+        if not save_published_run(published.run_id, published.published_at, published_to_json(published),
+                                  holder=self.lease.holder_id, lease_name=self.lease.name):
+            # lost the lease during the run, or the run id is taken: serve what the leader published instead
+            ctx.log(f"Run {published.run_id} was not published.")
+            return self.sync_from_store()
+        # the allocation and optimizer state rows are only written once the fenced publish went through, so
+        # a leader deposed mid-solve leaves nothing next to the new leader's rows
+        persist_recommendations(ctx, recommendations)
+        ctx.log(f"Stage timings (s): {ctx.timings}")
+        self._run_count = published.run_id
+        self._latest = published
+        return published
+
+    def sync_from_store(self):
+        """Picks up a run published by another replica (or by this one before a restart)."""
+        latest = self._latest
+        stored = load_latest_published_run(after_run_id=latest.run_id if latest is not None else 0)
+        if stored is not None:
+            self._latest = published_from_json(stored[1])
+        return self._latest
+
+    def _on_leadership_change(self, is_leader):
+        if is_leader:
+            with self._run_lock:
+                # continue the run ids of the previous leader so sessions notice the next run
+                self._run_count = max(self._run_count, get_max_published_run_id())
+            self.sync_from_store()
+
+    def _drain_forwarded_triggers(self):
+        for request in pop_trigger_requests():
+            self.triggers.submit(request['reason'], request['priority'], bool(request['force']),
+                                 bool(request['refresh_dcs']))
+
+    def poll_dcs(self):
+        """
+        Fetches the latest DCS frame and queues a trigger if it is new. The DCS log watcher normally gets
+        there first; this is the fallback on the poll interval.
+        """
+        return self._on_dcs_snapshot(fetch_dcs_snapshot(0))
+
+    def _on_dcs_snapshot(self, dcs_snapshot):
+        """
+        Stores a DCS frame the service has not seen yet as the input of the next run and queues a trigger
+        for it. A header pressure breach, or one the
+        pressure predictor expects within its horizon, queues the trigger as urgent. Called by the poller
+        and, through the snapshot cache, by the DCS log watcher as soon as a new commit is read.
+        """
+        if not self.is_leader():
+            return None
+        with self._observe_lock:
+            if not dcs_frame_advanced(dcs_snapshot["timestamp"], self._observed_timestamp,
+                                      dcs_snapshot.get("epoch", 0), self._observed_epoch):
+                return None
+            if dcs_snapshot.get("epoch", 0) != self._observed_epoch:
+                self.pressure_predictor.rewind()  # its pending frames and last prediction are from later frames
+            self._observed_timestamp = dcs_snapshot["timestamp"]
+            self._observed_epoch = dcs_snapshot.get("epoch", 0)
+            # the queued run solves this snapshot without fetching again
+            self._dcs_snapshot = dcs_snapshot
+
+            latest = self._latest
+            thresholds = latest.thresholds if latest is not None else derive_thresholds(load_constraint_snapshot())
+            features = extract_pressure_features(dcs_snapshot["dcs_constraints"], dcs_snapshot["raw_data"],
+                                                 thresholds["h2_per_ton_caustic"])
+            predicted = self.pressure_predictor.update(features, dcs_snapshot["timestamp"])
+        if is_header_pressure_breached(dcs_snapshot["dcs_constraints"], thresholds):
+            return self.request_run("Header pressure condition met.", PRIORITY_HEADER_PRESSURE)
+        if self.pressure_predictor.predicts_breach(thresholds["header_pressure"]):
+            horizon_min = round(self.pressure_predictor.horizon_s / 60)
+            print(f"Header pressure predicted to reach {predicted:.2f} within {horizon_min} min.")
+            return self.request_run(f"Header pressure predicted to breach within {horizon_min} min.",
+                                    PRIORITY_HEADER_PRESSURE)
+        return self.request_run("New DCS data.", PRIORITY_ROUTINE)
+
+    def _poll_loop(self):
+        while not self._stop_event.is_set():
+            is_leader = self.is_leader()
+            try:
+                if is_leader:
+                    self.poll_dcs()
+                else:
+                    self.sync_from_store()
+            except Exception as e:
+                print(f"Optimizer service {'DCS poll' if is_leader else 'follower sync'} failed: {e}")
+            self._stop_event.wait(self.poll_interval_s if is_leader else FOLLOWER_SYNC_INTERVAL_S)
+
+    def _worker_loop(self):
+        while not self._stop_event.is_set():
+            if self.is_leader():
+                self._drain_forwarded_triggers()
+            batch = self.triggers.next_batch(timeout=1.0)
+            if not batch:
+                continue
+            if not self.is_leader():
+                # leadership was lost while these were queued, hand them to the new leader
+                for request in batch:
+                    save_trigger_request(request.reason, request.priority, request.force, request.refresh_dcs)
+                    request.resolve(self._latest)
+                continue
+            reasons = merge_reasons(batch)
+            print(f"Optimizer service merged {len(batch)} trigger(s): {', '.join(reasons)}")
+            try:
+                published = self.run_now(reasons,
+                                         force=any(request.force for request in batch),
+                                         refresh_dcs=any(request.refresh_dcs for request in batch),
+                                         priority=batch[0].priority)
+            except Exception as e:
+                print(f"Optimizer service run failed: {e}")
+                for request in batch:
+                    request.resolve(error=e)
+                continue
+            for request in batch:
+                request.resolve(published)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_optimizer_service():
+    """Returns the process-wide OptimizerService, creating it on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = OptimizerService(lease=LeaderLease("optimizer", candidate=OPTIMIZER_IN_UI))
+        return _service
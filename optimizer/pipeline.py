@@ -0,0 +1,155 @@
+import pandas as pd
+
+from data_pipelines.dcs_cache import get_dcs_snapshot_cache
+from database import (load_latest_constraints,
+                      save_optimizer_last_run_constraints,
+                      save_allocation_data)
+from optimizer.constraint_building import get_final_constraint_values
+from optimizer.optimizer import solve_h2_optimizer
+from optimizer.results import AllocationRow, RecommendationResult
+from params import *
+
+# Stages of the fetch -> constrain -> solve -> persist pipeline. Nothing in here touches Streamlit so the
+# same code can be driven from the shared optimizer service or any other process.
+
+
+def load_constraint_snapshot():
+    """
+    Loads the latest constraints of every role from the database.
+
+    Returns:
+        dict: role name -> latest constraint values for that role
+    """
+    role_constraints = get_constraints()
+    constraints_snapshot = {}
+    for role_name in ROLES:
+        if role_name in role_constraints:
+            constraints_snapshot[role_name] = load_latest_constraints(role_name, role_constraints[role_name])
+    return constraints_snapshot
+
+
+def fetch_dcs_snapshot(max_age_s=None):
+    """
+    Returns the optimizer inputs derived from the newest DCS frame, from the process-wide snapshot cache.
+    The cache only re-reads Delta when its table version moved.
+
+    Args:
+        max_age_s (float): accept a cached snapshot checked this recently (default DCS_CACHE_TTL_S);
+            0 always checks the Delta version
+
+    Returns:
+        dict: timestamp of the newest frame, Delta version, dcs_constraints, current_flow, the raw frames and
+            the data quality report. Shared between callers, do not modify.
+    """
+    return get_dcs_snapshot_cache().get(max_age_s)
+
+
+def dcs_frame_advanced(timestamp, previous_timestamp, epoch=0, previous_epoch=0):
+    """
+    True if a DCS frame is newer than the previous one. A frame without a TimeStamp, or the first frame,
+    counts as new; a repeated or older TimeStamp (e.g. a source replaying old data) does not, unless the
+    snapshot cache has since seen the source go back in time (a different `epoch`, see DcsSnapshotCache).
+    """
+    if timestamp is None or previous_timestamp is None or epoch != previous_epoch:
+        return True
+    return pd.Timestamp(timestamp) > pd.Timestamp(previous_timestamp)
+
+
+def is_header_pressure_breached(dcs_constraints, thresholds):
+    header_pressure = dcs_constraints['header_pressure']
+    print(f'Header Pressure - {header_pressure}')
+    return header_pressure > thresholds["header_pressure"]
+
+
+def generate_recommendations(ctx):
+    """
+    Builds the final constraints, solves the allocation model and maps the solution to the dashboard areas.
+
+    Args:
+        ctx (RunContext): run context holding the DCS and constraint snapshots and derived thresholds
+
+    Returns:
+        tuple: (RecommendationResult, pipeline disruption duration)
+    """
+    dcs_constraints = ctx.dcs_constraints
+    current_flow = ctx.current_flow
+
+    if 'pipeline_disruption_hrs' in dcs_constraints:
+        duration = dcs_constraints['pipeline_disruption_hrs']
+    else:
+        # Default duration or handle error if constraint is not found.
+        duration = 0.5
+        ctx.log("Duration constraint for Caustic Plant not found. Using default duration of 30 min.")
+
+    with ctx.timed("build_constraints"):
+        final_constraints, prices = get_final_constraint_values(ctx.constraints, dcs_constraints)
+
+    with ctx.timed("solve"):
+        solution = solve_h2_optimizer(duration, final_constraints, prices, current_flow, dcs_constraints,
+                                      ctx.thresholds["h2o2_duration"])
+
+    rows = []
+    if solution and solution.get("status") == "optimal":
+        for display_name, internal_key in key_mapping.items():
+            if internal_key not in solution['allocation_details']:
+                print(
+                    f"Warning: Internal key '{internal_key}' "
+                    f"not found in optimizer allocation details for display name '{display_name}'.")
+                if display_name in HYDROGEN_ALLOCATION_DATA:
+                    rows.append(AllocationRow(area=display_name, **HYDROGEN_ALLOCATION_DATA[display_name]))
+                continue
+            if display_name not in HYDROGEN_ALLOCATION_DATA:
+                print(
+                    f"Warning: Display name '{display_name}' "
+                    f"from key_mapping not found in HYDROGEN_ALLOCATION_DATA.")
+                continue
+
+            details = solution['allocation_details'][internal_key]
+            if display_name == 'Bank':
+                margin_per_unit = prices['Pipeline']
+            elif display_name == 'H2O2':
+                margin_per_unit = prices['H2O2']
+            else:
+                margin_per_unit = details['margin_per_unit']
+            rows.append(AllocationRow(
+                area=display_name,
+                allocated=current_flow[internal_key],
+                recommended=details["amount"],
+                status="accepted",
+                comment="",
+                min_constrained=final_constraints[internal_key]['min'],
+                max_constrained=final_constraints[internal_key]['max'],
+                margin_per_unit=margin_per_unit,
+            ))
+    else:
+        # Reset recommendations to the current H2 flow as per DCS, if optimizer fails.
+        for area in HYDROGEN_ALLOCATION_DATA:
+            internal_key = key_mapping.get(area)
+            if area == 'Bank':
+                margin_per_unit = prices['Pipeline']
+            elif area == 'H2O2':
+                margin_per_unit = prices['H2O2']
+            else:
+                margin_per_unit = prices[allocation_to_margin_category.get(internal_key)]
+            rows.append(AllocationRow(
+                area=area,
+                allocated=current_flow[internal_key],
+                recommended=current_flow[internal_key],  # Keep current allocated as recommended
+                status="accepted",
+                comment=".",
+                min_constrained=final_constraints[internal_key]['min'],
+                max_constrained=final_constraints[internal_key]['max'],
+                margin_per_unit=margin_per_unit,
+            ))
+
+    # Keep the dashboard order of HYDROGEN_ALLOCATION_DATA
+    order = list(HYDROGEN_ALLOCATION_DATA)
+    rows.sort(key=lambda row: order.index(row.area))
+    return RecommendationResult(tuple(rows)), duration
+
+
+def persist_recommendations(ctx, recommendations):
+    """Saves the constraints the run was based on and its recommendations."""
+    with ctx.timed("persist"):
+        save_optimizer_last_run_constraints(ctx.constraints)
+        save_allocation_data(recommendations.to_allocation_data())
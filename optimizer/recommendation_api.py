@@ -0,0 +1,157 @@
+import datetime
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+import pytz
+
+from database import load_allocations_between, get_allocation_revision
+from optimizer.optimizer_service import json_default
+from params import *
+
+# Read-only HTTP API over the runs published by the optimizer service, for DCS advisory screens and
+# reporting jobs:
+#   GET /recommendation               latest recommendation rows
+#   GET /run                          metadata of the latest run (reasons, DCS frame, thresholds, timings)
+#   GET /history?start=...&end=...    saved allocation rows in a timestamp range (default: the last
+#                                     HTTP_API_HISTORY_DEFAULT_HRS), at most HTTP_API_HISTORY_MAX_ROWS
+#   GET /health
+# Responses are built once per published run and carry an ETag, so polling consumers get a 304 without
+# touching SQLite. /history also changes when an operator saves allocations between runs; its responses are
+# keyed by the allocation rows this process saved as well (an in-memory counter), so edits made in another
+# process show up with the next published run.
+
+RUN_METADATA_FIELDS = ["run_id", "started_at", "published_at", "reasons", "priority", "dcs_timestamp",
+                       "dcs_constraints", "current_flow", "thresholds", "timings", "duration", "data_quality"]
+
+
+class ResponseCache:
+    """
+    Encoded responses keyed by path and query, and by a `version` for responses that also change between
+    runs. Everything is dropped when a new run is published.
+    """
+
+    def __init__(self, max_entries=HTTP_API_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._run_id = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, run_id, key, build, version=None):
+        """Returns (etag, body) for `key` at `version`, building the body with `build()` on a miss."""
+        key = (key, version)
+        with self._lock:
+            if run_id != self._run_id:
+                self._entries.clear()
+                self._run_id = run_id
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        body = json.dumps(build(), default=json_default).encode("utf-8")
+        digest = hashlib.sha1(f"{version}".encode("utf-8") + body).hexdigest()[:16]
+        entry = (f'"{run_id}-{digest}"', body)
+        with self._lock:
+            self.misses += 1
+            if run_id == self._run_id:
+                self._entries[key] = entry
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+
+def recommendation_payload(published):
+    return {
+        "run_id": published.run_id,
+        "published_at": published.published_at,
+        "dcs_timestamp": published.dcs_timestamp,
+        "recommendations": [asdict(row) for row in published.recommendations.rows],
+    }
+
+
+def run_payload(published):
+    return {name: getattr(published, name) for name in RUN_METADATA_FIELDS}
+
+
+def history_payload(query):
+    """
+    Allocation rows from `start` to `end`, oldest first. Without a start the range covers the
+    HTTP_API_HISTORY_DEFAULT_HRS before `end` (or now). `truncated` is set when more than
+    HTTP_API_HISTORY_MAX_ROWS rows match; the next page starts at the last row's timestamp.
+    """
+    start = query.get("start", [None])[0]
+    end = query.get("end", [None])[0]
+    if not start:
+        until = pd.Timestamp(end) if end else pd.Timestamp(datetime.datetime.now(pytz.timezone('Asia/Kolkata')))
+        start = (until - pd.Timedelta(hours=HTTP_API_HISTORY_DEFAULT_HRS)).strftime("%Y-%m-%dT%H:%M:%S")
+    df = load_allocations_between(start, end, limit=HTTP_API_HISTORY_MAX_ROWS + 1)
+    return {"start": start, "end": end, "truncated": len(df) > HTTP_API_HISTORY_MAX_ROWS,
+            "rows": json.loads(df.head(HTTP_API_HISTORY_MAX_ROWS).to_json(orient="records"))}
+
+
+def make_handler(service, cache):
+    class RecommendationRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/health":
+                latest = service.latest()
+                return self._send_json(200, {"leader": service.is_leader(),
+                                             "run_id": latest.run_id if latest is not None else None,
+                                             "cache_hits": cache.hits, "cache_misses": cache.misses})
+
+            routes = {
+                "/recommendation": recommendation_payload,
+                "/run": run_payload,
+                "/history": lambda published: history_payload(parse_qs(url.query)),
+            }
+            if url.path not in routes:
+                return self._send_json(404, {"error": f"Unknown resource {url.path}"})
+            published = service.latest()
+            if published is None:
+                return self._send_json(503, {"error": "No recommendation published yet."})
+
+            if url.path == "/history":
+                key, version = f"{url.path}?{url.query}", get_allocation_revision()
+            else:
+                key, version = url.path, None
+            etag, body = cache.get_or_build(published.run_id, key, lambda: routes[url.path](published), version)
+            if etag in (tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self._send(200, body, etag)
+
+        def _send_json(self, status, payload):
+            self._send(status, json.dumps(payload, default=json_default).encode("utf-8"))
+
+        def _send(self, status, body, etag=None):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-cache")
+            if etag is not None:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # consumers poll often, don't flood the logs
+
+    return RecommendationRequestHandler
+
+
+def start_api_server(service, host=HTTP_API_HOST, port=HTTP_API_PORT):
+    """Serves the API on a daemon thread and returns the server; call `shutdown()` on it to stop."""
+    server = ThreadingHTTPServer((host, port), make_handler(service, ResponseCache()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="recommendation-api", daemon=True).start()
+    print(f"Recommendation API listening on http://{host}:{server.server_address[1]}")
+    return server
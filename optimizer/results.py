@@ -0,0 +1,91 @@
+from dataclasses import dataclass, replace, asdict
+
+from params import *
+
+MERGED_FLAKER_AREA = "Flaker - 3 and 4"
+
+
+@dataclass(frozen=True, slots=True)
+class AllocationRow:
+    """Recommendation for one allocation area, as shown on the dashboard and saved in `allocations`."""
+    area: str
+    allocated: float = 0
+    recommended: float = 0
+    status: str = "pending"
+    comment: str = ""
+    min_constrained: float = 0
+    max_constrained: float = 0
+    margin_per_unit: float = 0
+
+    def as_dict(self):
+        row = asdict(self)
+        row.pop("area")
+        return row
+
+
+@dataclass(frozen=True, slots=True)
+class RecommendationResult:
+    """
+    Immutable set of allocation rows, in HYDROGEN_ALLOCATION_DATA order. A published result is shared by
+    reference across sessions; operator edits produce a new result that reuses every unchanged row.
+    """
+    rows: tuple
+
+    @classmethod
+    def from_allocation_data(cls, allocation_data):
+        """Builds a result from a dict shaped like HYDROGEN_ALLOCATION_DATA (e.g. a row loaded from the DB)."""
+        return cls(tuple(AllocationRow(area=area, **{k: v for k, v in data.items() if k != "area"})
+                         for area, data in allocation_data.items()))
+
+    def __getitem__(self, area):
+        for row in self.rows:
+            if row.area == area:
+                return row
+        raise KeyError(area)
+
+    def __contains__(self, area):
+        return any(row.area == area for row in self.rows)
+
+    def items(self):
+        return ((row.area, row) for row in self.rows)
+
+    def with_updates(self, areas, **changes):
+        """Returns a new result with `changes` (e.g. status, comment) applied to the given areas."""
+        return RecommendationResult(tuple(replace(row, **changes) if row.area in areas else row
+                                          for row in self.rows))
+
+    def to_allocation_data(self):
+        """Returns a fresh dict of dicts in the shape save_allocation_data expects."""
+        return {row.area: row.as_dict() for row in self.rows}
+
+
+def source_areas(area):
+    """Maps a display area back to the allocation areas it stands for."""
+    if area == MERGED_FLAKER_AREA:
+        return ["Flaker - 3", "Flaker - 4"]
+    return [area]
+
+
+def display_rows(result):
+    """
+    View of a result for display: Flaker - 3 and Flaker - 4 are shown as one merged row placed after the
+    first five areas. Every other row is the result's own object, nothing is copied.
+    """
+    if "Flaker - 3" not in result or "Flaker - 4" not in result:
+        return list(result.rows)
+
+    flaker_3 = result["Flaker - 3"]
+    flaker_4 = result["Flaker - 4"]
+    merged = AllocationRow(
+        area=MERGED_FLAKER_AREA,
+        allocated=flaker_3.allocated + flaker_4.allocated,
+        recommended=flaker_3.recommended + flaker_4.recommended,
+        status=flaker_3.status,
+        comment=flaker_3.comment,
+        min_constrained=flaker_3.min_constrained,
+        max_constrained=flaker_3.max_constrained + flaker_4.max_constrained,
+        margin_per_unit=flaker_3.margin_per_unit,
+    )
+    rows = [row for row in result.rows if row.area not in ("Flaker - 3", "Flaker - 4")]
+    rows.insert(min(5, len(rows)), merged)
+    return rows
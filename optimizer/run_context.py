@@ -0,0 +1,71 @@
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from params import *
+
+
+def derive_thresholds(constraints_snapshot):
+    """
+    Derives the thresholds the pipeline stages need from a constraint snapshot, falling back to the
+    plant defaults when a role has no constraints saved.
+
+    Returns:
+        dict: header_pressure (kgf/cm2), h2o2_duration (hrs) and h2_per_ton_caustic (NM3/ton)
+    """
+    thresholds = {
+        "header_pressure": DEFAULT_HEADER_PRESSURE_THRESHOLD,
+        "h2o2_duration": DEFAULT_H2O2_DURATION_THRESHOLD,
+        "h2_per_ton_caustic": DEFAULT_H2_PER_TON_CAUSTIC,
+    }
+    if 'H2 Plant' in constraints_snapshot:
+        thresholds["header_pressure"] = \
+            constraints_snapshot['H2 Plant']['Header Pressure Threshold (kgf/cm2)']['max']
+    if 'H2O2 Plant' in constraints_snapshot:
+        thresholds["h2o2_duration"] = \
+            constraints_snapshot['H2O2 Plant']['Load increase/decrease time for H2O2 (hrs)']
+    if 'Caustic Plant' in constraints_snapshot:
+        thresholds["h2_per_ton_caustic"] = \
+            constraints_snapshot['Caustic Plant']['H2 generated (NM3) per ton of caustic']
+    return thresholds
+
+
+@dataclass
+class RunContext:
+    """
+    Everything one optimizer run works from, created once per run and handed to every stage, so each
+    input is fetched exactly once and the run can be traced end to end.
+    """
+    run_id: int
+    reasons: list
+    priority: int
+    force: bool = False
+    created_at: float = field(default_factory=time.time)
+    dcs_snapshot: dict = None
+    constraints: dict = None
+    thresholds: dict = field(default_factory=dict)
+    timings: dict = field(default_factory=dict)
+
+    @property
+    def dcs_constraints(self):
+        return self.dcs_snapshot["dcs_constraints"]
+
+    @property
+    def current_flow(self):
+        return self.dcs_snapshot["current_flow"]
+
+    def set_constraints(self, constraints_snapshot):
+        self.constraints = constraints_snapshot
+        self.thresholds = derive_thresholds(constraints_snapshot)
+
+    @contextmanager
+    def timed(self, stage):
+        """Records the wall time of a stage in seconds under `timings[stage]`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = round(time.perf_counter() - start, 4)
+
+    def log(self, message):
+        print(f"[run {self.run_id}] {message}")
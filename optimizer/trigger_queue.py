@@ -0,0 +1,108 @@
+import threading
+import time
+
+from params import *
+
+# Lower number = more urgent. Urgent triggers use the short debounce window and are merged with whatever
+# routine requests are pending, so they never wait behind a routine refresh in the queue.
+PRIORITY_HEADER_PRESSURE = 0
+PRIORITY_MANUAL = 1
+PRIORITY_CONSTRAINT_CHANGE = 2
+PRIORITY_ROUTINE = 3
+
+
+class TriggerRequest:
+    """A request for an optimizer run. Callers can wait on it for the run that covered it."""
+
+    def __init__(self, reason, priority=PRIORITY_ROUTINE, force=False, refresh_dcs=False):
+        self.reason = reason
+        self.priority = priority
+        self.force = force
+        self.refresh_dcs = refresh_dcs
+        self.submitted_at = time.monotonic()
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    def resolve(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the run covering this request has finished.
+
+        Returns:
+            The run's result, or None if the timeout expired first.
+        """
+        if not self._done.wait(timeout):
+            return None
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class TriggerQueue:
+    """
+    Collects optimizer trigger requests and hands them out in coalesced batches.
+
+    A batch is released once the debounce window of its most urgent request has passed; every request
+    pending at that point is merged into it, so N triggers arriving close together cost a single run.
+    """
+
+    def __init__(self, debounce_s=TRIGGER_DEBOUNCE_S, urgent_debounce_s=URGENT_TRIGGER_DEBOUNCE_S):
+        self.debounce_s = debounce_s
+        self.urgent_debounce_s = urgent_debounce_s
+        self._pending = []
+        self._cond = threading.Condition()
+
+    def submit(self, reason, priority=PRIORITY_ROUTINE, force=False, refresh_dcs=False):
+        request = TriggerRequest(reason, priority, force, refresh_dcs)
+        with self._cond:
+            self._pending.append(request)
+            self._cond.notify_all()
+        return request
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _debounce_for(self, priority):
+        return self.urgent_debounce_s if priority <= PRIORITY_MANUAL else self.debounce_s
+
+    def _release_at(self):
+        return min(r.submitted_at + self._debounce_for(r.priority) for r in self._pending)
+
+    def next_batch(self, timeout=None):
+        """
+        Waits for the next coalesced batch of requests.
+
+        Args:
+            timeout (float): seconds to wait for a first request to arrive, None waits forever
+
+        Returns:
+            list: the merged requests, most urgent first, or an empty list if nothing arrived in time
+        """
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._pending:
+                    release_at = self._release_at()
+                    if now >= release_at:
+                        batch = sorted(self._pending, key=lambda r: (r.priority, r.submitted_at))
+                        self._pending = []
+                        return batch
+                    wait_s = release_at - now
+                else:
+                    if give_up_at is not None and now >= give_up_at:
+                        return []
+                    wait_s = None if give_up_at is None else give_up_at - now
+                # a new, more urgent request wakes us up and may pull the release time forward
+                self._cond.wait(wait_s)
+
+
+def merge_reasons(batch):
+    """Returns the distinct reasons of a batch, most urgent first."""
+    return list(dict.fromkeys(request.reason for request in batch))
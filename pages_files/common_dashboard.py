@@ -1,8 +1,12 @@
+import time
+
 import pandas as pd
 import streamlit as st
-import copy
 from database import save_allocation_data, load_all_allocations
+from optimizer.optimizer_service import get_optimizer_service
+from optimizer.results import MERGED_FLAKER_AREA, display_rows, source_areas
 from optimizer.run_optimizer import trigger_optimizer_if_needed
+from params import DASHBOARD_REFRESH_CHECK_S
 from utils.downloader import downloader_allocation, downloader_audit, get_daily_report, get_adherence_report, fetch_data
 
 
@@ -14,57 +18,23 @@ from utils.downloader import downloader_allocation, downloader_audit, get_daily_
 #     st.write("Optimizer ran. New Recommendation Available!")
 
 def update_original_areas(area, new_status=None, new_comment=None):
-    if area == "Flaker - 3 and 4":
-        for orig_area in ["Flaker - 3", "Flaker - 4"]:
-            if new_status is not None:
-                st.session_state.dashboard_data[orig_area]["status"] = new_status
-            if new_comment is not None:
-                st.session_state.dashboard_data[orig_area]["comment"] = new_comment
-    else:
-        if new_status is not None:
-            st.session_state.dashboard_data[area]["status"] = new_status
-        if new_comment is not None:
-            st.session_state.dashboard_data[area]["comment"] = new_comment
+    changes = {}
+    if new_status is not None:
+        changes["status"] = new_status
+    if new_comment is not None:
+        changes["comment"] = new_comment
+    if changes:
+        st.session_state.dashboard_data = st.session_state.dashboard_data.with_updates(source_areas(area), **changes)
 
 
 def modify_allocation_display(dashboard_data):
-    dashboard_data = copy.deepcopy(dashboard_data)
-    if "Flaker - 3" in dashboard_data and "Flaker - 4" in dashboard_data:
-        merged_area = "Flaker - 3 and 4"
-        flaker_3 = dashboard_data["Flaker - 3"]
-        flaker_4 = dashboard_data["Flaker - 4"]
-
-        dashboard_data[merged_area] = {
-            "allocated": flaker_3["allocated"] + flaker_4["allocated"],
-            "recommended": flaker_3["recommended"] + flaker_4["recommended"],
-            "status": flaker_3["status"],
-            "comment": flaker_3["comment"],
-            "min_constrained": flaker_3["min_constrained"],
-            "max_constrained": flaker_3["max_constrained"] + flaker_4["max_constrained"],
-            "margin_per_unit": flaker_3["margin_per_unit"]
-        }
-
-        del dashboard_data["Flaker - 3"]
-        del dashboard_data["Flaker - 4"]
-
-    items = list(dashboard_data.items())
-
-    # Extract and remove merged row
-    merged_item = next(((i, item) for i, item in enumerate(items) if item[0] == "Flaker - 3 and 4"), None)
-    if merged_item:
-        idx, flaker_row = merged_item
-        items.pop(idx)
-        insert_pos = min(5, len(items))  # Ensure we don't exceed length
-        items.insert(insert_pos, flaker_row)
-
-    return items
+    return [(row.area, row) for row in display_rows(dashboard_data)]
 
 
 def get_blinker_status(allocation_data):
     status = {}
     for area, data in allocation_data:
-        data["is_on"] = True if data["allocated"] > 0 else False
-        blinker = "🟢" if data.get("is_on", True) else "⚪"
+        blinker = "🟢" if data.allocated > 0 else "⚪"
 
         if area == "Bank":
             is_filling = st.session_state.get("bank_filling_status", False)
@@ -75,17 +45,47 @@ def get_blinker_status(allocation_data):
             blinker = "🟢" if vent else "⚪"
 
         # adding this since flaker-2 has some trickle H2 flow in Flow metre
-        if area in ["Flaker - 2", "Flaker - 3 and 4", "H2O2"]:
-            blinker = "🟢" if data["allocated"] > 50 else "⚪"
+        if area in ["Flaker - 2", MERGED_FLAKER_AREA, "H2O2"]:
+            blinker = "🟢" if data.allocated > 50 else "⚪"
 
         status[area] = blinker
     return status
 
 
+def format_age(seconds):
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60}s"
+    return f"{seconds // 3600}h {(seconds % 3600) // 60}m"
+
+
+@st.fragment(run_every=DASHBOARD_REFRESH_CHECK_S)
+def recommendation_freshness():
+    """
+    Shows how old the displayed recommendation is and reruns the page as soon as the optimizer service
+    publishes a newer one, so the dashboard never blocks on a refresh.
+    """
+    service = get_optimizer_service()
+    published = service.latest()
+    if published is not None and published.run_id != st.session_state.get("published_run_id"):
+        st.rerun(scope="app")
+
+    if published is None:
+        st.caption("Showing the last saved allocation. The first optimizer run on this server is in progress.")
+    else:
+        st.caption(f"Recommendation published {format_age(time.time() - published.published_at)} ago "
+                   f"(DCS frame: {published.dcs_timestamp}, reasons: {', '.join(published.reasons)})")
+    if service.is_busy():
+        st.caption("🔄 Refreshing recommendation...")
+
+
 def common_dashboard_page():
     """Displays the common hydrogen allocation dashboard."""
     st.title("Hydrogen Allocation Dashboard (NM³/hr)")
     st.write(f"Logged in as: **{st.session_state.username}** (Role: **{st.session_state.selected_role}**)")
+    recommendation_freshness()
 
     # if st.session_state.optimizer_run:
     #     optimizer_run_notification(
@@ -105,13 +105,13 @@ def common_dashboard_page():
         df = pd.DataFrame([
             {"": status[area],
              "Area": area,
-             "Allocated (NM³/hr)": data["allocated"],
-             "Recommended (NM³/hr)": data["recommended"],
-             "Status": data["status"],
-             "Comments": data["comment"],
-             "Min (Constrained)": data['min_constrained'],
-             "Max (Constrained)": data['max_constrained'],
-             "Margin per Unit (NM3)": data['margin_per_unit'],
+             "Allocated (NM³/hr)": data.allocated,
+             "Recommended (NM³/hr)": data.recommended,
+             "Status": data.status,
+             "Comments": data.comment,
+             "Min (Constrained)": data.min_constrained,
+             "Max (Constrained)": data.max_constrained,
+             "Margin per Unit (NM3)": data.margin_per_unit,
              }
             for area, data in dashboard_data
         ])
@@ -165,9 +165,9 @@ def common_dashboard_page():
         col_rec, col_action, col_comment = st.columns([1, 1, 3])
 
         with col_rec:
-            st.metric(label="Recommended", value=data["recommended"])
+            st.metric(label="Recommended", value=data.recommended)
         with col_action:
-            current_status = data["status"]
+            current_status = data.status
             status_radio = st.radio(f"Action for {area}", ["Accept", "Reject"],
                                     index=0 if current_status == "accepted" else (
                                         1 if current_status == "rejected" else 0),
@@ -183,16 +183,16 @@ def common_dashboard_page():
             if new_status != current_status:
                 # st.session_state.dashboard_data[area]["status"] = new_status
                 update_original_areas(area, new_status=new_status)
-                save_allocation_data(st.session_state.dashboard_data)
+                save_allocation_data(st.session_state.dashboard_data.to_allocation_data())
                 st.success(f"Status for {area} changed to {new_status}!")
 
         with col_comment:
-            current_comment = data["comment"]
+            current_comment = data.comment
             new_comment = st.text_input(f"Comments for {area}", value=current_comment, key=f"comment_{area}")
             if new_comment != current_comment:
                 # st.session_state.dashboard_data[area]["comment"] = new_comment
                 update_original_areas(area, new_comment=new_comment)
-                save_allocation_data(st.session_state.dashboard_data)
+                save_allocation_data(st.session_state.dashboard_data.to_allocation_data())
                 st.success(f"Comment for {area} updated!")
 
     st.markdown("---")
@@ -1,5 +1,10 @@
 import streamlit as st
 
+from data_pipelines.bank_fleet import get_bank_fleet_model
+from data_pipelines.dcs_cache import get_dcs_snapshot_cache
+from data_pipelines.norm_estimator import get_norm_estimator
+from optimizer.optimizer_service import get_optimizer_service
+
 
 def display_latest_values():
     st.title("🧮 Latest Optimizer Backend Values")
@@ -9,6 +14,38 @@ def display_latest_values():
     constraints = st.session_state.get("user_input_constraints", 0)
     dcs_raw_data = st.session_state.get("dcs_raw_data", 0)
 
+    service = get_optimizer_service()
+    published = service.latest()
+    if published is not None:
+        st.subheader("🔹 Last Optimizer Run")
+        st.write({
+            "run_id": published.run_id,
+            "reasons": list(published.reasons),
+            "dcs_timestamp": published.dcs_timestamp,
+            "thresholds": published.thresholds,
+            "stage_timings_s": published.timings,
+        })
+        if published.data_quality is not None:
+            st.subheader("🔹 DCS Data Quality")
+            st.write(published.data_quality)
+
+    # Only the leader replica polls DCS, so the predictor only learns there
+    st.subheader("🔹 Header Pressure Predictor")
+    st.write(service.pressure_predictor.summary())
+
+    st.subheader("🔹 Caustic Norm Estimator")
+    st.write(get_norm_estimator().summary())
+
+    st.subheader("🔹 Bank Fleet Model")
+    st.write(get_bank_fleet_model().summary())
+
+    st.subheader("🔹 DCS Snapshot Cache")
+    cache = get_dcs_snapshot_cache()
+    st.write(cache.stats())
+    if cache.frame_buffer is not None:
+        st.subheader(f"🔹 Rolling DCS Signals (last {cache.frame_buffer.window} frames)")
+        st.dataframe(cache.frame_buffer.window_stats())
+
     # User Input Constraints
     st.subheader("🔸 User Input Constraints")
     st.write(constraints)
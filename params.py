@@ -8,8 +8,80 @@ os.makedirs(DATA_DIR, exist_ok=True)
 
 # CONSTRAINT_DB_PATH = os.path.join(DATA_DIR, "constraints_db.json")
 AUDIT_LOG_PATH = os.path.join(DATA_DIR, "audit_log.csv")
-DB_PATH = "hydrogen_allocation_tool.db"
+DB_PATH = os.getenv("H2_DB_PATH", "hydrogen_allocation_tool.db")  # point replicas at one file on a shared volume
 TABLE_NAME = "audit_log"
+
+# --- SQLite ---
+# WAL needs every process on the same host; use DELETE when replicas on different hosts share the file over NFS
+SQLITE_JOURNAL_MODE = os.getenv("H2_SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_BUSY_TIMEOUT_MS = 5000  # how long a write waits for a concurrent writer before "database is locked"
+SQLITE_CACHE_SIZE_KB = 16_384  # page cache per pooled connection
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # bytes of the database file read through mmap
+
+# --- Optimizer Service ---
+OPTIMIZER_POLL_INTERVAL_S = 60  # how often the shared optimizer service checks DCS for a new frame
+TRIGGER_DEBOUNCE_S = 3  # optimizer triggers arriving within this window are merged into one run
+URGENT_TRIGGER_DEBOUNCE_S = 0.5  # shorter window for header pressure and manual triggers
+DASHBOARD_REFRESH_CHECK_S = 5  # how often an open dashboard checks for a newly published recommendation
+LEADER_LEASE_TTL_S = 30  # a replica that stops renewing the optimizer lease loses it after this long
+FOLLOWER_SYNC_INTERVAL_S = 5  # how often follower replicas pick up runs published by the leader
+PUBLISHED_RUNS_KEPT = 100  # published runs retained in the shared store
+# Set H2_OPTIMIZER_IN_UI=0 when `python main.py daemon` runs the optimizer, so Streamlit processes only serve
+OPTIMIZER_IN_UI = os.getenv("H2_OPTIMIZER_IN_UI", "1") != "0"
+HTTP_API_HOST = os.getenv("H2_HTTP_API_HOST", "127.0.0.1")  # local recommendation API (main.py serve / daemon)
+HTTP_API_PORT = int(os.getenv("H2_HTTP_API_PORT", "8600"))
+HTTP_API_CACHE_ENTRIES = 64  # encoded responses kept per published run
+HTTP_API_HISTORY_DEFAULT_HRS = 24  # /history without a start covers this many hours up to its end (or now)
+HTTP_API_HISTORY_MAX_ROWS = 5000  # rows per /history response; page on with start = the last row's timestamp
+DAEMON_LOCK_PATH = os.getenv("H2_DAEMON_LOCK_PATH", os.path.join(DATA_DIR, "h2_optimizer.pid"))
+PRESSURE_PREDICTION_HORIZON_S = 300  # how far ahead the header pressure model predicts
+PRESSURE_PREDICTOR_FORGETTING = 0.995  # RLS forgetting factor, lower follows plant changes faster
+PRESSURE_PREDICTOR_MIN_SAMPLES = 30  # matured predictions needed before a predicted breach can trigger a run
+
+# --- DCS Reads ---
+DCS_SOURCE = os.getenv("H2_DCS_SOURCE", "azure")  # azure | local (Delta table or Parquet dir) | replay
+DCS_SOURCE_PATH = os.getenv("H2_DCS_SOURCE_PATH", "")  # directory or recording for the local and replay sources
+# (replay defaults to the Excel corpus, see DCS_CORPUS_PATH)
+DCS_REPLAY_SPEEDUP = float(os.getenv("H2_DCS_REPLAY_SPEEDUP", "100"))  # replay runs this many times real time
+DCS_REPLAY_LOOP = os.getenv("H2_DCS_REPLAY_LOOP", "0") == "1"
+DCS_READ_WINDOW_MIN = 60  # DCS reads scan only frames this close to the newest TimeStamp in the Delta stats
+DCS_READ_WINDOW_WIDENINGS = 3  # times the window is widened (x4 each) before falling back to a full scan
+SIGNAL_SPEC_PATH = os.path.join(BASE_DIR, "parameters", "signal_formulas.json")  # derived DCS signal formulas
+TAG_QUALITY_PATH = os.path.join(BASE_DIR, "parameters", "tag_quality.json")  # per-tag bounds and staleness rules
+DCS_HISTORY_BATCH_ROWS = 50_000  # rows per record batch when streaming DCS history
+DCS_HISTORY_CHUNK_HOURS = 24  # history ingestion commits one Parquet file per chunk of this many hours
+DCS_HISTORY_INGEST_DIR = os.path.join(DATA_DIR, "dcs_history_ingest")
+DCS_RECENT_FRAMES = 10  # newest frames kept in the DCS snapshot
+DCS_BUFFER_CAPACITY = 240  # recent frames kept in memory for window statistics
+DCS_BUFFER_WINDOW = 10  # frames in the rolling mean / median / delta
+DCS_WATCH_INTERVAL_S = 5  # how often the leader checks the Delta log for a new commit
+DCS_FRAME_STORE_ENABLED = os.getenv("H2_DCS_FRAME_STORE", "1") == "1"  # keep every fetched frame on disk
+DCS_FRAME_STORE_DIR = os.getenv("H2_DCS_FRAME_STORE_DIR", os.path.join(DATA_DIR, "dcs_frames"))
+DCS_FRAME_STORE_ROW_GROUP_ROWS = 16_384  # rows per row group of a compacted day
+DCS_CORPUS_SOURCES = os.path.join(DATA_DIR, "*.xlsx")  # Excel tag exports converted by build_dcs_corpus
+DCS_CORPUS_PATH = os.path.join(DATA_DIR, "dcs_corpus.arrow")  # memory-mapped by bench and replay
+DCS_SYNTHETIC_DIR = os.path.join(DATA_DIR, "dcs_synthetic")  # synthetic frames written by main.py synthesize
+DCS_CACHE_TTL_S = 15  # a cached DCS snapshot is served without checking the Delta version for this long
+
+# Fallbacks used when a role has no constraints saved yet
+DEFAULT_HEADER_PRESSURE_THRESHOLD = 135  # kgf/cm2
+DEFAULT_H2O2_DURATION_THRESHOLD = 8  # hrs
+DEFAULT_H2_PER_TON_CAUSTIC = 280  # NM3/ton
+
+# --- Caustic Norm Estimator ---
+NORM_WINDOW = 30  # accepted samples in the rolling median
+NORM_MIN_SAMPLES = 5  # samples needed before outliers are rejected
+NORM_OUTLIER_K = 4  # reject samples further than this many robust standard deviations from the median
+NORM_FLUSH_INTERVAL_S = 300  # estimator state and one norm log aggregate are written at most this often
+
+# --- Bank Fleet Model ---
+BANK_COMPRESSOR_FLOW_NM3_HR = 440  # first estimate of the per-compressor throughput (as in the signal spec)
+BANK_THROUGHPUT_ALPHA = 0.2  # weight of each completed fill in the throughput estimate
+BANK_THROUGHPUT_BOUNDS = (0.5, 1.5)  # completed fills implying a throughput outside these x the first estimate are ignored
+BANK_MIN_FILL_COMPRESSOR_HRS = 0.5  # shorter fills are not used to learn the throughput
+BANK_MAX_GAP_HRS = 0.25  # gaps between frames count at most this long
+BANK_PLANNING_HORIZON_HRS = 1  # the bank bound never exceeds the remaining capacity spread over this many hours
+
 # --- Constants ---
 
 ROLES = [
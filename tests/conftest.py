@@ -0,0 +1,88 @@
+import os
+import sys
+import tempfile
+
+# Point everything the params read from the environment at a scratch directory before any module of the app
+# is imported: the SQLite database, the frame store and the daemon lock.
+_scratch = tempfile.mkdtemp(prefix="h2_tests_")
+os.environ["H2_DB_PATH"] = os.path.join(_scratch, "hydrogen_allocation_tool.db")
+os.environ["H2_DCS_FRAME_STORE"] = "0"
+os.environ["H2_DCS_FRAME_STORE_DIR"] = os.path.join(_scratch, "dcs_frames")
+os.environ["H2_DAEMON_LOCK_PATH"] = os.path.join(_scratch, "h2_optimizer.pid")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pytest
+
+from data_pipelines.dcs_sources import DcsSource
+from data_pipelines.delta_table import decode_dcs_table
+from data_pipelines.synthetic_frames import generate_dcs_frames
+
+
+def synthetic_frames(n_frames, start="2025-01-01", seed=0, regime_mix=None):
+    """Decoded synthetic DCS frames, oldest first, one per minute from `start`."""
+    return decode_dcs_table(generate_dcs_frames(n_frames, regime_mix or {"normal": 1}, seed=seed, start=start))
+
+
+class MemoryDcsSource(DcsSource):
+    """DCS source over an in-memory table; tests append frames or replace them to simulate a rewind."""
+    name = "memory"
+
+    def __init__(self, frames):
+        self.frames = frames
+        self._version = 1
+
+    def push(self, frames):
+        self.frames = pa.concat_tables([self.frames, frames.cast(self.frames.schema)])
+        self._version += 1
+
+    def replace(self, frames, version=None):
+        self.frames = frames
+        self._version = self._version + 1 if version is None else version
+
+    def version(self):
+        return self._version
+
+    def read_latest(self, n_frames=10):
+        order = pc.sort_indices(self.frames, sort_keys=[("TimeStamp", "descending")])
+        return pc.take(self.frames, order[:n_frames])
+
+    def read_range(self, start=None, end=None):
+        times = pc.cast(self.frames.column("TimeStamp"), pa.timestamp("us"))
+        mask = pa.array([True] * self.frames.num_rows)
+        if start is not None:
+            mask = pc.and_(mask, pc.greater_equal(times, pa.scalar(pd.Timestamp(start), pa.timestamp("us"))))
+        if end is not None:
+            mask = pc.and_(mask, pc.less_equal(times, pa.scalar(pd.Timestamp(end), pa.timestamp("us"))))
+        return self.frames.filter(mask)
+
+
+class StaticLease:
+    """Stands in for LeaderLease with a fixed leadership."""
+
+    name = "optimizer"
+    holder_id = None  # publishes unfenced
+
+    def __init__(self, leader=True):
+        self.leader = leader
+        self.on_change = None
+
+    def is_leader(self):
+        return self.leader
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture(scope="session")
+def db():
+    """The scratch database with the app's schema."""
+    from database import initialize_db
+    from params import ROLES, get_constraints, HYDROGEN_ALLOCATION_DATA
+    initialize_db(ROLES, get_constraints(), list(HYDROGEN_ALLOCATION_DATA.keys()))
+    return os.environ["H2_DB_PATH"]
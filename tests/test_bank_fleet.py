@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from pyomo.environ import value
+
+from data_pipelines.bank_fleet import POSTS, BankFleetModel, estimate_bank_fleet
+from optimizer.constraint_building import fix_bank_constraints
+from optimizer.optimizer import build_h2_optimizer
+from params import allocation_to_margin_category, entry_constraints_dummy
+
+FRAME_S = 60
+
+
+def single_fill(capacity, frames_filling, compressors=2):
+    """Post 1 idle for 5 frames, filling for `frames_filling` frames, then idle again; one frame a minute."""
+    n_frames = frames_filling + 10
+    filling = np.zeros((n_frames, len(POSTS)))
+    filling[5:5 + frames_filling, 0] = 1
+    capacity = np.full((n_frames, len(POSTS)), float(capacity))
+    return np.arange(n_frames) * FRAME_S, filling, capacity, np.full(n_frames, float(compressors))
+
+
+def fleet_history(n_frames=600, seed=0):
+    """Posts taking turns at fills of random length with a random number of compressors running."""
+    rng = np.random.default_rng(seed)
+    filling = np.zeros((n_frames, len(POSTS)))
+    t = 0
+    while t < n_frames:
+        length = int(rng.integers(20, 90))
+        filling[t:t + length, rng.integers(len(POSTS))] = rng.integers(1, 3)
+        t += length + int(rng.integers(0, 5))
+    capacity = np.tile(rng.uniform(400, 1000, len(POSTS)), (n_frames, 1))
+    compressors_on = rng.integers(1, 4, n_frames).astype(float)
+    return np.arange(n_frames) * FRAME_S, filling, capacity, compressors_on
+
+
+def test_completed_fill_updates_the_throughput():
+    model = BankFleetModel(throughput=440, alpha=0.2)
+    for frame in zip(*single_fill(capacity=900, frames_filling=60)):
+        outputs = model.update(*frame)
+    # 60 frames of 2 compressors for 1 minute each are 2 compressor-hours for 900 NM3: 450 per compressor
+    assert model.completed_fills == 1
+    assert model.throughput == pytest.approx(440 + 0.2 * (450 - 440))
+    assert outputs["estimated_flow"] == pytest.approx(2 * model.throughput)
+
+
+def test_fill_seen_from_the_middle_is_not_learned():
+    times, filling, capacity, compressors_on = single_fill(capacity=900, frames_filling=60)
+    model = BankFleetModel()
+    for frame in zip(times[20:], filling[20:], capacity[20:], compressors_on[20:]):
+        model.update(*frame)
+    assert model.completed_fills == 0
+
+
+def test_vectorized_history_matches_the_incremental_model():
+    history = fleet_history()
+    expected = estimate_bank_fleet(*history)
+    model = BankFleetModel()
+    for i, frame in enumerate(zip(*history)):
+        outputs = model.update(*frame)
+        for name in ["fill_progress", "time_to_full_hrs", "filled_nm3", "estimated_flow", "throughput"]:
+            np.testing.assert_allclose(outputs[name], expected[name][i], err_msg=f"{name} in frame {i}")
+    assert model.completed_fills > 0
+
+
+def test_rewind_keeps_the_learned_throughput():
+    model = BankFleetModel()
+    history = single_fill(capacity=900, frames_filling=60)
+    for frame in zip(*history):
+        model.update(*frame)
+    learned = model.throughput
+    model.rewind()
+    assert model.last_time is None and not model.compressor_hours.any()
+    model.update(*[values[0] for values in history])
+    assert model.last_time == 0 and model.throughput == learned
+
+
+def test_optimizer_uses_the_fleet_estimates_for_the_bank():
+    final_constraints = {point: {'min': 0, 'max': 5000} for point in allocation_to_margin_category}
+    dcs_constraints = {'bank_available': 900, 'number_of_banks': 2, 'calculated_bank_flow': 880,
+                       'bank_max_intake_flow': 4375, 'bank_remaining_capacity': 100, 'bank_estimated_flow': 875}
+    _, final_constraints = fix_bank_constraints(dcs_constraints, {}, {}, final_constraints)
+    assert final_constraints['bank']['max'] == 875  # the compressors' current flow, above the remaining capacity
+
+    model = build_h2_optimizer(10000, 0, final_constraints, entry_constraints_dummy['Finance'], bank_unit_flow=437.5)
+    model.bank_units.value, model.h2_amount['bank'].value = 2, 875
+    assert value(model.bank_allocation_multiple.body) == 0
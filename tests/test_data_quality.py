@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from conftest import synthetic_frames
+import pytest
+
+from data_pipelines.data_quality import check_dcs_quality, compile_quality_rules, describe_quality
+from data_pipelines.xlsx_corpus import read_frame_sheets
+from params import DATA_DIR
+
+PRESSURE = "Hydrogen_Header_pressure_current_kgf_per_cm2"
+EXPORT = os.path.join(DATA_DIR, "New_Query_2025_07_21_11_13am.xlsx")
+# values of the newest frame of the recorded export that a 0/1 reading of the tag names would reject
+RECORDED_VALUES = {
+    "Boiler_P60_running_or_not_binary": 59.07,
+    "Boiler_P120_running_or_not_binary": 96.01,
+    "H2_vent_valve_CMD_850": -1.36,
+    "Flaker_600tpd_current_load_TPH": -2.77,
+    "Boiler_P60_current_H2_NM3_per_hr": -0.72,
+}
+
+
+def newest_first(frames):
+    return pc.take(frames, pc.sort_indices(frames, sort_keys=[("TimeStamp", "descending")]))
+
+
+def with_column(frames, name, values):
+    index = frames.column_names.index(name)
+    return frames.set_column(index, name, pa.array(values, pa.float64()))
+
+
+def test_realistic_frames_pass_the_gate():
+    frames = newest_first(synthetic_frames(12, regime_mix={"normal": 1, "flaker_trickle": 1, "venting": 1}))
+    report = check_dcs_quality(frames)
+    assert report["ok"], describe_quality(report)
+    assert not report["bad_tags"]
+
+
+def test_out_of_bounds_critical_tag_fails_the_gate():
+    frames = newest_first(synthetic_frames(12))
+    pressure = frames.column(PRESSURE).to_numpy().copy()
+    pressure[0] = 250
+    report = check_dcs_quality(with_column(frames, PRESSURE, pressure))
+    assert not report["ok"]
+    assert report["bad_tags"][PRESSURE] == "above max"
+    assert PRESSURE in report["critical_tags"]
+
+
+def test_non_finite_and_stuck_tags_are_reported():
+    frames = newest_first(synthetic_frames(12))
+    pressure = np.full(frames.num_rows, 128.0)
+    frames = with_column(frames, PRESSURE, pressure)
+    holder = frames.column("Hydrogen_Holder_level_current_per_2").to_numpy().copy()
+    holder[0] = np.nan
+    frames = with_column(frames, "Hydrogen_Holder_level_current_per_2", holder)
+
+    report = check_dcs_quality(frames)
+    assert PRESSURE in report["stuck_tags"]
+    assert PRESSURE in report["critical_tags"]
+    assert report["bad_tags"]["Hydrogen_Holder_level_current_per_2"] == "non-finite"
+    assert "Hydrogen_Holder_level_current_per_2" not in report["critical_tags"]
+
+
+def test_first_matching_rule_applies():
+    registry = {
+        "default": {"min": 0, "max": None, "stale_frames": None, "critical": False},
+        "rules": [{"pattern": "A_*", "max": 1, "critical": True}, {"pattern": "A_B", "max": 5}],
+    }
+    rules = compile_quality_rules(registry, ["A_B", "C"])
+    assert list(rules.high) == [1, np.inf]
+    assert list(rules.critical) == [True, False]
+    report = rules.check(np.array([[2.0, 3.0]]))
+    assert report["bad_tags"] == {"A_B": "above max"}
+    assert report["critical_tags"] == ["A_B"]
+
+
+def test_recorded_tag_values_pass_and_a_stopped_line_is_not_stuck():
+    frames = newest_first(synthetic_frames(12))
+    for tag, value in RECORDED_VALUES.items():
+        frames = with_column(frames, tag, np.full(frames.num_rows, value))
+    frames = with_column(frames, "Caustic_Caustic Production_332tpd_TPH", np.zeros(frames.num_rows))
+    report = check_dcs_quality(frames)
+    assert report["ok"], describe_quality(report)
+
+    frames = with_column(frames, "Caustic_Caustic Production_332tpd_TPH", np.full(frames.num_rows, 300.0))
+    report = check_dcs_quality(frames)
+    assert report["stuck_tags"] == ["Caustic_Caustic Production_332tpd_TPH"]
+    assert not report["ok"]
+
+
+@pytest.mark.skipif(not os.path.exists(EXPORT), reason="the recorded export is not checked out")
+def test_recorded_export_passes_the_gate():
+    report = check_dcs_quality(newest_first(read_frame_sheets(EXPORT)[0]))
+    assert report["ok"], describe_quality(report)
+    assert not report["bad_tags"]
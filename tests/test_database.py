@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+import database
+from params import ROLES, get_constraints, HYDROGEN_ALLOCATION_DATA
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """An empty database file with a process that has not initialized any schema yet."""
+    path = str(tmp_path / "fresh.db")
+    monkeypatch.setattr(database, "DB_PATH", path)
+    monkeypatch.setattr(database, "_schema_ready", False)
+    monkeypatch.setattr(database, "_known_tables", None)
+    return path
+
+
+def initialize():
+    database.initialize_db(ROLES, get_constraints(), list(HYDROGEN_ALLOCATION_DATA.keys()))
+
+
+def applied_versions(path):
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute(f"SELECT version FROM {database.SCHEMA_VERSION_TABLE} ORDER BY version")
+        return [row[0] for row in rows]
+
+
+def test_migrations_run_once_in_order(fresh_db):
+    initialize()
+    assert applied_versions(fresh_db) == [version for version, _, _ in database.SCHEMA_MIGRATIONS]
+    assert database.table_exists("published_runs")
+    assert database.table_exists("allocations")
+
+    database._schema_ready = False  # another process opening the same file
+    initialize()
+    assert applied_versions(fresh_db) == [version for version, _, _ in database.SCHEMA_MIGRATIONS]
+
+
+def test_only_pending_migrations_are_applied(fresh_db, monkeypatch):
+    applied = []
+    monkeypatch.setattr(database, "SCHEMA_MIGRATIONS", [
+        (1, "first", lambda: applied.append(1)),
+        (2, "second", lambda: applied.append(2)),
+    ])
+    initialize()
+    database.SCHEMA_MIGRATIONS.append((3, "third", lambda: applied.append(3)))
+    database._schema_ready = False
+    initialize()
+    assert applied == [1, 2, 3]
+    assert applied_versions(fresh_db) == [1, 2, 3]
+
+
+def test_table_created_after_the_cache_loaded_is_found(fresh_db):
+    initialize()
+    assert not database.table_exists("created_later")
+    with sqlite3.connect(fresh_db) as conn:  # e.g. by another replica's migration
+        conn.execute("CREATE TABLE created_later (id INTEGER)")
+    assert database.table_exists("created_later")
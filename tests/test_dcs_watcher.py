@@ -0,0 +1,190 @@
+import datetime
+import threading
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import data_pipelines.bank_fleet as bank_fleet
+import data_pipelines.dcs_cache as dcs_cache
+import data_pipelines.norm_estimator as norm_estimator
+import optimizer.optimizer_service as optimizer_service
+from conftest import MemoryDcsSource, StaticLease, synthetic_frames
+from data_pipelines.dcs_cache import DcsSnapshotCache
+from data_pipelines.dcs_sources import ReplayDcsSource
+from data_pipelines.delta_table import frame_times_s
+from optimizer.results import RecommendationResult
+from optimizer.trigger_queue import TriggerQueue
+from params import DCS_RECENT_FRAMES
+
+
+def frame_time(frames, i):
+    """TimeStamp of frame `i` as the snapshot cache reports it."""
+    return str(pd.Timestamp(frames.column("TimeStamp")[i].as_py()))
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_incremental_read_tracks_every_new_frame(db):
+    frames = synthetic_frames(40)
+    source = MemoryDcsSource(frames.slice(0, 5))
+    cache = DcsSnapshotCache(source=source, ttl_s=0)
+    cache.get()
+    assert len(cache.frame_buffer) == 5
+
+    # more new frames than the cached window holds arrive between two checks
+    source.push(frames.slice(5, 30))
+    snapshot = cache.get()
+    assert len(cache.frame_buffer) == 35
+    assert snapshot["raw_data"].shape[0] == DCS_RECENT_FRAMES
+    assert snapshot["timestamp"] == frame_time(frames, 34)
+    assert cache.incremental_reads == 1
+
+
+@pytest.mark.parametrize("keep_version", [False, True])
+def test_source_going_back_in_time_replaces_the_cache(db, keep_version):
+    source = MemoryDcsSource(synthetic_frames(10, start="2025-01-02"))
+    cache = DcsSnapshotCache(source=source, ttl_s=0)
+    first = cache.get()
+
+    # a looping replay wraps (its version drops) or a table is rewritten (its version moves on)
+    rewound = synthetic_frames(3, start="2025-01-01", seed=1)
+    source.replace(rewound, version=0 if keep_version else None)
+    snapshot = cache.get()
+    assert snapshot["timestamp"] == frame_time(rewound, 2)
+    assert snapshot["epoch"] == first["epoch"] + 1
+
+    source.push(synthetic_frames(1, start="2025-01-01 00:03", seed=2))
+    assert cache.get()["timestamp"] == "2025-01-01 00:03:00"
+
+
+def cached(frames):
+    """A cache that has read `frames` from a memory source, and the source."""
+    source = MemoryDcsSource(frames)
+    cache = DcsSnapshotCache(source=source, ttl_s=0)
+    cache.get()
+    return cache, source
+
+
+def test_read_after_a_version_decrease_replaces_the_window(db):
+    cache, source = cached(synthetic_frames(10, start="2025-01-02"))
+    source.push(synthetic_frames(2, start="2025-01-02 00:10"))
+    cache.get()
+    reads, incremental_reads = cache.reads, cache.incremental_reads
+
+    # newer-looking frames at a lower version: only the version tells that the source went back
+    rewound = synthetic_frames(4, start="2025-01-03", seed=1)
+    source.replace(rewound, version=1)
+    frames, new_frames = cache._read_new_frames(1)
+    assert frames is new_frames
+    assert frames.column("TimeStamp").to_pylist() == rewound.column("TimeStamp").to_pylist()[::-1]
+    assert cache.epoch == 1
+    assert (cache.reads, cache.incremental_reads) == (reads + 1, incremental_reads)
+
+
+def test_read_with_no_newer_frame_checks_for_an_older_newest_frame(db):
+    cache, source = cached(synthetic_frames(10, start="2025-01-02"))
+    window = cache._frames
+
+    # an OPTIMIZE commit: a new version with the same frames keeps the window
+    source.replace(source.frames)
+    frames, new_frames = cache._read_new_frames(source.version())
+    assert frames is window and new_frames.num_rows == 0
+    assert cache.epoch == 0
+
+    # a rewritten table whose newest frame is older than the cached one
+    rewound = synthetic_frames(3, start="2025-01-01", seed=1)
+    source.replace(rewound)
+    frames, new_frames = cache._read_new_frames(source.version())
+    assert frames is new_frames and frames.num_rows == 3
+    assert frame_time(frames, 0) == frame_time(rewound, 2)
+    assert cache.epoch == 1
+
+
+def play_to(source, frame):
+    """Sets the replay clock so that frames up to `frame` (counted from the start of a loop) are visible."""
+    source._started_at = time.monotonic() - (frame + 0.5) * 60 / source.speedup
+
+
+def test_looping_replay_wrap_starts_the_trackers_over(db, tmp_path, monkeypatch):
+    path = str(tmp_path / "recording.parquet")
+    frames = synthetic_frames(30, seed=5)
+    pq.write_table(frames, path)
+    source = ReplayDcsSource(path, speedup=60, loop=True)
+    cache = DcsSnapshotCache(source=source, ttl_s=0)
+    monkeypatch.setattr(dcs_cache, "_cache", cache)
+    monkeypatch.setattr(bank_fleet, "_model", bank_fleet.BankFleetModel())
+    monkeypatch.setattr(norm_estimator, "_estimator", norm_estimator.CausticNormEstimator(flush_interval_s=3600))
+    service = optimizer_service.OptimizerService(lease=StaticLease())
+    try:
+        source.refresh()
+        play_to(source, 25)
+        cache.get()
+        predictor = service.pressure_predictor
+        late_prediction = predictor.last_prediction
+        assert predictor.last_frame_time == datetime.datetime.fromisoformat(frame_time(frames, 25)).timestamp()
+
+        play_to(source, 29 + 2)  # the 29 minute recording restarted: frames 0..2 are visible again
+        snapshot = cache.get()
+        assert snapshot["timestamp"] == frame_time(frames, 2)
+        assert snapshot["epoch"] == 1
+        assert predictor.last_frame_time == datetime.datetime.fromisoformat(frame_time(frames, 2)).timestamp()
+        assert predictor.last_prediction != late_prediction
+        assert bank_fleet.get_bank_fleet_model().last_time == frame_times_s(frames.slice(2, 1))[0]
+        assert norm_estimator.get_norm_estimator().summary()["samples"] <= 3
+    finally:
+        cache._subscribers.clear()
+
+
+def test_watcher_driven_runs_solve_every_new_frame(db, monkeypatch):
+    frames = synthetic_frames(6)
+    source = MemoryDcsSource(frames.slice(0, 1))
+    cache = DcsSnapshotCache(source=source, ttl_s=0)
+    monkeypatch.setattr(dcs_cache, "_cache", cache)
+
+    solved = []
+
+    def fake_solve(ctx):  # GLPK is not needed to check which frames are solved
+        solved.append(ctx.dcs_snapshot["timestamp"])
+        return RecommendationResult(()), 0.5
+
+    monkeypatch.setattr(optimizer_service, "generate_recommendations", fake_solve)
+    service = optimizer_service.OptimizerService(poll_interval_s=3600, lease=StaticLease())
+    service.triggers = TriggerQueue(debounce_s=0.05, urgent_debounce_s=0.01)
+    service._dcs_watcher.interval_s = 0.05
+    service.start()
+    try:
+        expected = [frame_time(frames, 0)]
+        assert wait_for(lambda: solved == expected)
+        for i in range(1, frames.num_rows):
+            source.push(frames.slice(i, 1))
+            expected.append(frame_time(frames, i))
+            assert wait_for(lambda: solved == expected), f"solved {solved}, expected {expected}"
+        # the solve returns before the run is published
+        assert wait_for(lambda: service.latest().dcs_timestamp == expected[-1])
+    finally:
+        service.stop()
+        cache._subscribers.clear()
+
+
+def test_subscriber_sees_snapshot_loaded_by_watcher(db):
+    source = MemoryDcsSource(synthetic_frames(2))
+    cache = DcsSnapshotCache(source=source, ttl_s=0)
+    seen = []
+    loaded = threading.Event()
+    cache.subscribe(lambda snapshot: (seen.append(snapshot["timestamp"]), loaded.set()))
+    watcher = dcs_cache.DcsLogWatcher(cache, interval_s=0.02)
+    watcher.start()
+    try:
+        assert loaded.wait(5)
+        assert seen == ["2025-01-01 00:01:00"]
+    finally:
+        watcher.stop()
@@ -0,0 +1,18 @@
+import pandas as pd
+from deltalake import DeltaTable, write_deltalake
+
+from conftest import synthetic_frames
+from data_pipelines.dcs_sources import DeltaDcsSource
+from data_pipelines.delta_table import latest_timestamp_from_stats
+
+
+def test_latest_timestamp_comes_from_the_log_statistics(tmp_path):
+    uri = str(tmp_path / "dcs")
+    write_deltalake(uri, synthetic_frames(5, start="2025-01-01 00:00:00"))
+    write_deltalake(uri, synthetic_frames(5, start="2025-01-01 01:00:00"), mode="append")
+    assert latest_timestamp_from_stats(DeltaTable(uri)) == pd.Timestamp("2025-01-01 01:04:00")
+
+    source = DeltaDcsSource(uri)
+    frames = source.read_latest(3)
+    assert frames.column("TimeStamp").to_pylist()[0] == pd.Timestamp("2025-01-01 01:04:00")
+    assert frames.num_rows == 3
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from data_pipelines.frame_buffer import DcsFrameBuffer
+
+
+def test_rolling_stats_match_a_recomputed_window():
+    rng = np.random.default_rng(0)
+    values = rng.normal(100, 10, size=(50, 3)).round(1)  # rounded so the window has repeated values
+    buffer = DcsFrameBuffer(["a", "b", "c"], capacity=16, window=5)
+    for t, row in enumerate(values):
+        assert buffer.push(float(t), row)
+        window = values[max(t - 4, 0):t + 1]
+        np.testing.assert_allclose(buffer.mean(), window.mean(axis=0))
+        np.testing.assert_allclose(buffer.median(), np.median(window, axis=0))
+        assert buffer.latest("b") == row[1]
+    np.testing.assert_allclose(buffer.delta(), values[-1] - values[-5])
+    assert buffer.delta("a", lag=15) == values[-1, 0] - values[-16, 0]
+    assert len(buffer) == 16
+
+
+def test_repeated_or_older_frames_are_ignored():
+    buffer = DcsFrameBuffer(["a"], capacity=4, window=2)
+    assert buffer.extend([1.0, 2.0, 2.0, 1.5, 3.0], [[1], [2], [9], [9], [3]]) == 3
+    assert buffer.last_time == 3.0
+    assert buffer.mean("a") == 2.5
+
+
+def test_non_finite_values_count_as_zero_and_empty_stats_are_nan():
+    buffer = DcsFrameBuffer(["a", "b"], capacity=4, window=2)
+    assert np.isnan(buffer.mean("a")) and np.isnan(buffer.median("a")) and np.isnan(buffer.delta("a"))
+    buffer.push(1.0, [np.nan, np.inf])
+    assert list(buffer.mean()) == [0.0, 0.0]
+    assert np.isnan(buffer.delta("a"))
+
+
+def test_window_and_lag_are_bounded_by_capacity():
+    with pytest.raises(ValueError):
+        DcsFrameBuffer(["a"], capacity=4, window=5)
+    with pytest.raises(ValueError):
+        DcsFrameBuffer(["a"], capacity=4, window=2).delta(lag=4)
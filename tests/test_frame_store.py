@@ -0,0 +1,48 @@
+import os
+
+import pyarrow.parquet as pq
+
+from conftest import synthetic_frames
+from data_pipelines.frame_store import COMPACTED_FILE, DcsFrameStore
+
+PRESSURE = "Hydrogen_Header_pressure_current_kgf_per_cm2"
+
+
+def times(table):
+    return [str(value) for value in table.column("TimeStamp").to_pylist()]
+
+
+def test_appends_are_partitioned_by_day_and_read_back_in_order(tmp_path):
+    frames = synthetic_frames(6, start="2025-01-01 23:57")
+    store = DcsFrameStore(str(tmp_path))
+    assert store.append(frames.slice(0, 4)) == 4
+    assert store.append(frames) == 2  # only the frames newer than the last append
+    assert store.days() == ["2025-01-01", "2025-01-02"]
+
+    assert times(store.read()) == times(frames)
+    assert times(store.read("2025-01-02")) == times(frames.slice(3))
+    projected = store.read("2025-01-01 23:58", "2025-01-01 23:59", columns=[PRESSURE])
+    assert projected.column_names == ["TimeStamp", PRESSURE]
+    assert projected.num_rows == 2
+
+
+def test_frames_written_twice_are_read_once_and_compacted(tmp_path):
+    frames = synthetic_frames(6, start="2025-01-01 23:57")
+    # two processes, each with its own idea of what it already appended
+    DcsFrameStore(str(tmp_path)).append(frames.slice(0, 4))
+    store = DcsFrameStore(str(tmp_path))
+    store.append(frames.slice(2))
+    assert times(store.read()) == times(frames)
+
+    assert store.compact(before="2025-01-02") == ["2025-01-01"]
+    assert os.listdir(tmp_path / "day=2025-01-01") == [COMPACTED_FILE]
+    assert pq.read_metadata(tmp_path / "day=2025-01-01" / COMPACTED_FILE).num_rows == 3
+    assert times(store.read()) == times(frames)
+    assert store.compact(before="2025-01-02") == []  # already compacted
+    assert len(os.listdir(tmp_path / "day=2025-01-02")) == 2  # the open day is left alone
+
+
+def test_empty_store_reads_an_empty_table(tmp_path):
+    store = DcsFrameStore(str(tmp_path / "missing"))
+    assert store.days() == []
+    assert store.read("2025-01-01").num_rows == 0
@@ -0,0 +1,46 @@
+import os
+
+import pyarrow.parquet as pq
+import pytest
+from deltalake import write_deltalake
+
+from conftest import synthetic_frames
+from data_pipelines.dcs_sources import DeltaDcsSource
+from data_pipelines.history_ingest import SIGNAL_PREFIX, ingest_dcs_history, load_ingest_state
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_after_first_chunk(chunk):
+    raise Interrupted(chunk["chunk_end"])
+
+
+def chunk_files(output_dir):
+    return sorted(name for name in os.listdir(output_dir) if name.endswith(".parquet"))
+
+
+def test_interrupted_ingest_resumes_at_the_same_version(tmp_path):
+    uri, output_dir = str(tmp_path / "dcs"), str(tmp_path / "ingest")
+    write_deltalake(uri, synthetic_frames(180, start="2025-01-01"))  # 3 hours, one frame a minute
+    with pytest.raises(Interrupted):
+        ingest_dcs_history("2025-01-01", "2025-01-01 03:00", output_dir=output_dir, chunk_hours=1,
+                           source=DeltaDcsSource(uri), progress=interrupt_after_first_chunk)
+    assert chunk_files(output_dir) == ["dcs_20250101_0000.parquet"]
+    first_chunk = os.path.join(output_dir, "dcs_20250101_0000.parquet")
+    written_at = os.stat(first_chunk).st_mtime_ns
+    assert load_ingest_state(output_dir)["last_timestamp"] == "2025-01-01 01:00:00"
+
+    # a late frame lands in the second chunk's range in a newer Delta version
+    write_deltalake(uri, synthetic_frames(1, start="2025-01-01 01:30:30", seed=1), mode="append")
+    state = ingest_dcs_history(output_dir=output_dir, chunk_hours=1, source=DeltaDcsSource(uri),
+                               progress=lambda chunk: None)
+    assert state["complete"] and state["version"] == 0 and state["frames"] == 180
+    assert os.stat(first_chunk).st_mtime_ns == written_at  # the completed chunk was not rewritten
+    assert len(chunk_files(output_dir)) == 3
+
+    frames = pq.read_table(output_dir)
+    times = frames.column("TimeStamp").to_pylist()
+    assert len(times) == len(set(times)) == 180
+    assert f"{SIGNAL_PREFIX}balance" in frames.column_names
@@ -0,0 +1,119 @@
+import argparse
+import os
+import sqlite3
+import time
+
+import pytest
+
+import data_pipelines.dcs_cache as dcs_cache
+import database
+import main
+import optimizer.optimizer_service as optimizer_service
+from conftest import MemoryDcsSource, synthetic_frames
+from data_pipelines.dcs_cache import DcsSnapshotCache
+from optimizer.results import RecommendationResult
+from utils.leader_election import LEASE_TABLE_NAME, LeaderLease
+
+
+def take_lease(db_path, name, holder, ttl_s=60):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(f"INSERT OR REPLACE INTO {LEASE_TABLE_NAME} (name, holder, expires_at, heartbeat_at) "
+                     f"VALUES (?, ?, ?, ?)", (name, holder, time.time() + ttl_s, time.time()))
+
+
+@pytest.fixture
+def scratch_db(tmp_path, monkeypatch):
+    """A database of its own holding only the published runs and the lease tables."""
+    path = str(tmp_path / "lease.db")
+    monkeypatch.setattr(database, "DB_PATH", path)
+    database.create_published_runs_table()
+    return path
+
+
+def test_only_one_replica_holds_the_lease(tmp_path):
+    path = str(tmp_path / "lease.db")
+    first = LeaderLease("optimizer", ttl_s=60, db_path=path, holder_id="a")
+    second = LeaderLease("optimizer", ttl_s=60, db_path=path, holder_id="b")
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    assert second.current_holder() == "a"
+
+    first.release()
+    assert not first.is_leader()
+    assert second.try_acquire()
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    path = str(tmp_path / "lease.db")
+    first = LeaderLease("optimizer", ttl_s=0.1, db_path=path, holder_id="a")
+    second = LeaderLease("optimizer", ttl_s=0.1, db_path=path, holder_id="b")
+    assert first.try_acquire()
+    time.sleep(0.15)
+    assert not first.is_leader()  # a stalled heartbeat drops leadership locally as well
+    assert second.try_acquire()
+    assert not first.try_acquire()
+
+
+def test_follower_candidate_never_leads(tmp_path):
+    lease = LeaderLease("optimizer", db_path=str(tmp_path / "lease.db"), candidate=False)
+    assert not lease.try_acquire()
+    assert lease.current_holder() is None
+
+
+def test_publish_is_fenced_by_the_lease(scratch_db):
+    lease = LeaderLease("optimizer", ttl_s=60, db_path=scratch_db, holder_id="a")
+    assert lease.try_acquire()
+    assert database.save_published_run(1, time.time(), "{}", holder="a")
+
+    take_lease(scratch_db, "optimizer", "b")  # "a" stalled past its expiry and "b" took over
+    assert not database.save_published_run(2, time.time(), "{}", holder="a")
+    assert database.save_published_run(2, time.time(), "{}", holder="b")
+    assert database.get_max_published_run_id() == 2
+
+
+def test_run_id_collision_keeps_the_stored_run(scratch_db):
+    assert database.save_published_run(1, time.time(), '{"first": true}')
+    assert not database.save_published_run(1, time.time(), '{"first": false}')
+    assert database.load_latest_published_run()[1] == '{"first": true}'
+
+
+def allocation_rows():
+    with sqlite3.connect(database.DB_PATH) as conn:
+        return conn.execute("SELECT COUNT(*) FROM allocations").fetchone()[0]
+
+
+def test_deposed_leader_does_not_publish(db, monkeypatch):
+    monkeypatch.setattr(dcs_cache, "_cache", DcsSnapshotCache(source=MemoryDcsSource(synthetic_frames(2)), ttl_s=0))
+    monkeypatch.setattr(optimizer_service, "generate_recommendations", lambda ctx: (RecommendationResult(()), 0.5))
+    lease = LeaderLease("fence-test", ttl_s=60, holder_id="a")
+    service = optimizer_service.OptimizerService(lease=lease)
+    assert lease.try_acquire()
+    service.sync_from_store()
+    before, rows_before = database.get_max_published_run_id(), allocation_rows()
+
+    take_lease(lease.db_path, "fence-test", "b")  # "a" still believes it leads until its local expiry
+    published = service.run_now(["Fence test."], force=True)
+    assert database.get_max_published_run_id() == before
+    assert allocation_rows() == rows_before
+    assert published is None or "Fence test." not in published.reasons
+
+    take_lease(lease.db_path, "fence-test", "a")  # leading again, the same run goes through
+    published = service.run_now(["Fence test."], force=True)
+    assert published.run_id == database.get_max_published_run_id() == before + 1
+    assert allocation_rows() == rows_before + 1
+    lease.release()
+    with sqlite3.connect(database.DB_PATH) as conn:  # later tests start from the runs they publish
+        conn.execute("DELETE FROM published_runs WHERE run_id = ?", (published.run_id,))
+
+
+def test_run_once_refuses_while_another_replica_leads(db, tmp_path):
+    lease = LeaderLease("optimizer")
+    take_lease(lease.db_path, "optimizer", "daemon-on-another-host")
+    try:
+        args = argparse.Namespace(lock_file=str(tmp_path / "run_once.pid"), force=True)
+        assert main.run_once(args) == main.EXIT_NOT_LEADER
+        assert lease.current_holder() == "daemon-on-another-host"
+        assert not os.path.exists(args.lock_file)
+    finally:
+        with sqlite3.connect(lease.db_path) as conn:
+            conn.execute(f"DELETE FROM {LEASE_TABLE_NAME} WHERE name = 'optimizer'")
@@ -0,0 +1,64 @@
+import json
+
+from deltalake import write_deltalake
+
+import data_pipelines.history_ingest as history_ingest
+import data_pipelines.xlsx_corpus as xlsx_corpus
+import main
+from conftest import MemoryDcsSource, synthetic_frames
+from data_pipelines.dcs_sources import DeltaDcsSource
+from optimizer.results import RecommendationResult
+
+
+def test_stdout_carries_only_json_events(db, monkeypatch, capsys, tmp_path):
+    monkeypatch.setattr(main, "get_dcs_source", lambda: MemoryDcsSource(synthetic_frames(3)))
+
+    def fake_solve(ctx):  # GLPK is not needed here; prints like the real pipeline does
+        ctx.log("solving")
+        print("Header Pressure - 120")
+        return RecommendationResult(()), 0.5
+
+    monkeypatch.setattr(main, "generate_recommendations", fake_solve)
+    output = tmp_path / "backfill.csv"
+    code = main.main(["backfill", "--start", "2025-01-01", "--end", "2025-01-02", "--output", str(output)])
+
+    captured = capsys.readouterr()
+    events = [json.loads(line)["event"] for line in captured.out.splitlines()]
+    assert code == main.EXIT_OK
+    assert events == ["command.started", "load_frames.reading", "backfill.finished"]
+    assert "[run 1] solving" in captured.err
+    assert "Header Pressure - 120" in captured.err
+    assert output.exists()
+
+
+def json_events(captured):
+    return [json.loads(line) for line in captured.out.splitlines()]
+
+
+def test_ingest_history_logs_every_chunk_and_resumes(monkeypatch, capsys, tmp_path):
+    uri, output_dir = str(tmp_path / "dcs"), str(tmp_path / "ingest")
+    write_deltalake(uri, synthetic_frames(120, start="2025-01-01"))
+    monkeypatch.setattr(history_ingest, "create_dcs_source", lambda: DeltaDcsSource(uri))
+    args = ["ingest-history", "--end", "2025-01-01 02:00", "--output-dir", output_dir, "--chunk-hours", "1"]
+
+    assert main.main(args + ["--start", "2025-01-01"]) == main.EXIT_OK
+    events = json_events(capsys.readouterr())
+    assert [event["rows"] for event in events if event["event"] == "ingest_history.chunk"] == [60, 60]
+    assert events[-1]["event"] == "ingest_history.finished" and events[-1]["frames"] == 120
+
+    # a rerun continues from the checkpoint, so the finished range is not ingested again
+    assert main.main(args) == main.EXIT_OK
+    events = json_events(capsys.readouterr())
+    assert not [event for event in events if event["event"] == "ingest_history.chunk"]
+    assert events[-1]["frames"] == 120
+
+
+def test_build_corpus_command(monkeypatch, capsys, tmp_path):
+    synthetic_frames(4).to_pandas().to_excel(tmp_path / "export.xlsx", index=False)
+    monkeypatch.setattr(xlsx_corpus, "DCS_CORPUS_SOURCES", str(tmp_path / "*.xlsx"))
+    output = str(tmp_path / "corpus.arrow")
+
+    assert main.main(["build-corpus", "--output", output]) == main.EXIT_OK
+    finished = json_events(capsys.readouterr())[-1]
+    assert finished["event"] == "build_corpus.finished" and finished["frames"] == 4
+    assert xlsx_corpus.corpus_is_current(output, sources=[str(tmp_path / "export.xlsx")])
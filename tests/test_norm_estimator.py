@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+import data_pipelines.norm_estimator as norm_estimator
+import optimizer.optimizer_service as optimizer_service
+from conftest import StaticLease
+from data_pipelines.norm_estimator import CausticNormEstimator, flush_norm_estimator
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    """The (aggregates, state) batches the estimator writes, instead of the database."""
+    batches = []
+    monkeypatch.setattr(norm_estimator, "save_norm_batch",
+                        lambda aggregates, state_json: batches.append((aggregates, json.loads(state_json))))
+    return batches
+
+
+def estimator(**kwargs):
+    return CausticNormEstimator(**{"window": 10, "min_samples": 5, "outlier_k": 4, "flush_interval_s": 3600,
+                                   "initial": 280.0, **kwargs})
+
+
+def test_serves_the_median_and_rejects_outliers(saved):
+    norm = estimator()
+    assert norm.value() == 280.0
+    for sample in [300, 302, 298, 301, 299, 300]:
+        norm.update(sample)
+    assert norm.update(900) == 300
+    assert norm.update(float("nan")) == 300
+    assert (norm.accepted, norm.rejected) == (6, 2)
+
+
+def test_restarts_when_the_plant_moves(saved):
+    norm = estimator()
+    for sample in [300, 302, 298, 301, 299, 300]:
+        norm.update(sample)
+    for sample in [350, 352, 348, 351, 349]:
+        norm.update(sample)
+    assert norm.value() == 350
+
+
+def test_writes_only_on_the_flush_interval(saved):
+    norm = estimator()
+    for sample in [300, 302, 298]:
+        norm.update(sample)
+    assert saved == []
+    assert norm.maybe_flush(force=True)
+    (aggregates, state), = saved
+    assert aggregates[0][1] == 300
+    assert state == {"samples": [300, 302, 298]}
+
+    restored = estimator()
+    restored.restore(json.dumps(state))
+    assert restored.value() == 300
+
+
+def test_service_stop_flushes_pending_samples(saved, monkeypatch, db):
+    norm = estimator()
+    monkeypatch.setattr(norm_estimator, "_estimator", norm)
+    norm.update(300)
+    service = optimizer_service.OptimizerService(lease=StaticLease())
+    service.stop()
+    assert [state for _, state in saved] == [{"samples": [300]}]
+
+
+def test_shutdown_does_not_create_an_estimator(saved, monkeypatch):
+    monkeypatch.setattr(norm_estimator, "_estimator", None)
+    flush_norm_estimator()
+    assert saved == [] and norm_estimator._estimator is None
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+import data_pipelines.dcs_cache as dcs_cache
+import optimizer.optimizer_service as optimizer_service
+from conftest import MemoryDcsSource, StaticLease, synthetic_frames
+from data_pipelines.dcs_cache import DcsSnapshotCache
+from optimizer.results import RecommendationResult
+
+
+@pytest.fixture
+def service(db, monkeypatch):
+    """An OptimizerService leading over an in-memory DCS source, without the GLPK solve."""
+    source = MemoryDcsSource(synthetic_frames(3))
+    monkeypatch.setattr(dcs_cache, "_cache", DcsSnapshotCache(source=source, ttl_s=0))
+    monkeypatch.setattr(optimizer_service, "generate_recommendations", lambda ctx: (RecommendationResult(()), 0.5))
+    monkeypatch.setattr(optimizer_service, "persist_recommendations", lambda ctx, recommendations: None)
+    service = optimizer_service.OptimizerService(lease=StaticLease())
+    service.source = source
+    service.sync_from_store()
+    return service
+
+
+def test_skipped_runs_take_no_run_id(service):
+    first = service.run_now(["First."], force=True)
+    for _ in range(3):
+        assert service.run_now(["Nothing changed."]) is first
+
+    service.source.push(synthetic_frames(1, start="2025-01-01 00:03", seed=1))
+    second = service.run_now(["New frame."])
+    assert second.run_id == first.run_id + 1
+    assert second.dcs_timestamp == "2025-01-01 00:03:00"
+
+
+def test_last_published_run_is_served_while_the_next_one_solves(service, monkeypatch):
+    first = service.run_now(["First."], force=True)
+    solving, release = threading.Event(), threading.Event()
+
+    def slow_solve(ctx):
+        solving.set()
+        release.wait(5)
+        return RecommendationResult(()), 0.5
+
+    monkeypatch.setattr(optimizer_service, "generate_recommendations", slow_solve)
+    service.source.push(synthetic_frames(1, start="2025-01-01 00:03", seed=1))
+    runs = []
+    worker = threading.Thread(target=lambda: runs.append(service.run_now(["New frame."])))
+    worker.start()
+    try:
+        assert solving.wait(5)
+        assert service.is_busy()
+        assert service.latest() is first
+    finally:
+        release.set()
+        worker.join(5)
+    assert runs[0].run_id == first.run_id + 1 and service.latest() is runs[0]
+
+
+def test_restarted_service_serves_the_stored_run_without_solving(service, monkeypatch):
+    published = service.run_now(["Before the restart."], force=True)
+
+    def no_solve(ctx):
+        raise AssertionError("a restart solved before serving the stored run")
+
+    monkeypatch.setattr(optimizer_service, "generate_recommendations", no_solve)
+    restarted = optimizer_service.OptimizerService(lease=StaticLease(leader=False))
+    restarted.sync_from_store()
+    assert restarted.latest().run_id == published.run_id
+    assert restarted.latest().dcs_timestamp == published.dcs_timestamp
+
+
+def test_each_run_fetches_its_inputs_once_into_its_context(service, monkeypatch):
+    fetches, contexts = [], []
+    fetch = optimizer_service.fetch_dcs_snapshot
+    monkeypatch.setattr(optimizer_service, "fetch_dcs_snapshot", lambda max_age_s: fetches.append(1) or fetch(0))
+    monkeypatch.setattr(optimizer_service, "generate_recommendations",
+                        lambda ctx: contexts.append(ctx) or (RecommendationResult(()), 0.5))
+    published = service.run_now(["Traced."], force=True)
+    assert len(fetches) == 1
+    ctx, = contexts
+    assert ctx.run_id == published.run_id and "Traced." in ctx.reasons
+    assert ctx.dcs_constraints is published.dcs_constraints
+    assert {"load_constraints", "fetch_dcs"} <= set(published.timings)
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from data_pipelines.pressure_predictor import HeaderPressurePredictor, extract_pressure_features
+
+
+def plant_frames(n_frames, seed=0):
+    """(timestamp, features) one minute apart, where the next pressure is linear in the current frame."""
+    rng = np.random.default_rng(seed)
+    pressure = 120.0
+    for i in range(n_frames):
+        balance, holder = rng.normal(0, 1), rng.uniform(20, 80)
+        yield str(pd.Timestamp("2025-01-01") + pd.Timedelta(minutes=i)), np.array([1.0, pressure, balance, holder])
+        pressure = 0.9 * pressure + 3 * balance + 0.05 * holder + 10
+
+
+def test_learns_the_pressure_one_horizon_ahead():
+    predictor = HeaderPressurePredictor(horizon_s=60, forgetting=1.0, min_samples=20)
+    frames = list(plant_frames(200))
+    for timestamp, features in frames[:-1]:
+        predictor.update(features, timestamp)
+    assert predictor.is_ready()
+    timestamp, features = frames[-1]
+    predicted = predictor.update(features, timestamp)
+    expected = 0.9 * features[1] + 3 * features[2] + 0.05 * features[3] + 10
+    assert abs(predicted - expected) < 0.01
+    assert predictor.predicts_breach(expected - 1) and not predictor.predicts_breach(expected + 1)
+
+
+def test_not_ready_before_min_samples_and_repeated_frames_are_ignored():
+    predictor = HeaderPressurePredictor(horizon_s=60, min_samples=5)
+    (t0, f0), (t1, f1) = plant_frames(2)
+    first = predictor.update(f0, t0)
+    assert first == f0[1]  # starts from "pressure stays where it is"
+    assert predictor.update(f1 * 2, t0) == first
+    predictor.update(f1, t1)
+    assert predictor.samples == 1
+    assert not predictor.predicts_breach(0)
+
+
+def test_features_from_a_dcs_frame():
+    dcs_constraints = {"caustic_production": 10.0, "total_h2_flow": 1500.0, "header_pressure": 125.0}
+    raw_data = pd.DataFrame({"Hydrogen_Holder_level_current_per_1": [40.0],
+                             "Hydrogen_Holder_level_current_per_2": [55.0]})
+    features = extract_pressure_features(dcs_constraints, raw_data, h2_per_ton_caustic=280.0)
+    np.testing.assert_allclose(features, [1.0, 125.0, 1.3, 55.0])
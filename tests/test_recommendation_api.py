@@ -0,0 +1,89 @@
+import datetime
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+import optimizer.recommendation_api as recommendation_api
+from database import save_allocation_data
+from optimizer.optimizer_service import PublishedRecommendation
+from optimizer.recommendation_api import start_api_server
+from optimizer.results import RecommendationResult
+from params import HYDROGEN_ALLOCATION_DATA
+
+
+class PublishedService:
+    """Serves one fixed published run, like a follower replica between two runs."""
+
+    def __init__(self, run_id):
+        self.published = PublishedRecommendation(
+            run_id=run_id, started_at=0.0, published_at=1.0, reasons=("Test.",), priority=3,
+            dcs_timestamp="2025-01-01 00:00:00", dcs_constraints={}, current_flow={}, raw_data=None,
+            constraints={}, thresholds={}, timings={}, recommendations=RecommendationResult(()), duration=0.5)
+
+    def latest(self):
+        return self.published
+
+    def is_leader(self):
+        return False
+
+
+@pytest.fixture
+def api(db):
+    server = start_api_server(PublishedService(run_id=7), host="127.0.0.1", port=0)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def get(url, etag=None):
+    request = urllib.request.Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers["ETag"], json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers["ETag"], None
+
+
+def test_unchanged_responses_are_not_modified(api):
+    status, etag, body = get(f"{api}/recommendation")
+    assert status == 200 and body["run_id"] == 7
+    assert get(f"{api}/recommendation", etag)[:2] == (304, etag)
+
+
+def test_history_shows_allocations_saved_between_runs(api):
+    url = f"{api}/history?start=2000-01-01"
+    status, etag, body = get(url)
+    assert get(url, etag)[0] == 304
+
+    # an operator accepts the recommendation on the dashboard; no new run is published
+    save_allocation_data({area: dict(values) for area, values in HYDROGEN_ALLOCATION_DATA.items()})
+    status, new_etag, new_body = get(url, etag)
+    assert status == 200
+    assert new_etag != etag
+    assert len(new_body["rows"]) == len(body["rows"]) + 1
+
+
+def test_history_is_served_from_memory_until_allocations_change(api, monkeypatch):
+    url = f"{api}/history?start=2000-01-01&end=2100-01-01"
+    status, etag, _ = get(url)
+
+    def no_sqlite(*args, **kwargs):
+        raise AssertionError("/history read SQLite for an unchanged response")
+
+    monkeypatch.setattr(recommendation_api, "load_allocations_between", no_sqlite)
+    assert get(url, etag)[0] == 304
+    assert get(url)[:2] == (200, etag)
+
+
+def test_history_defaults_to_a_recent_window_and_caps_its_rows(api, monkeypatch):
+    save_allocation_data({area: dict(values) for area, values in HYDROGEN_ALLOCATION_DATA.items()})
+    save_allocation_data({area: dict(values) for area, values in HYDROGEN_ALLOCATION_DATA.items()})
+    status, _, body = get(f"{api}/history")
+    assert status == 200 and len(body["rows"]) >= 2 and not body["truncated"]
+    assert body["start"][:10] >= str(datetime.date.today() - datetime.timedelta(days=2))
+    assert get(f"{api}/history?end=2000-01-02")[2]["rows"] == []
+
+    monkeypatch.setattr(recommendation_api, "HTTP_API_HISTORY_MAX_ROWS", 1)
+    status, _, body = get(f"{api}/history?start=2000-01-01T00:00")  # not cached yet
+    assert len(body["rows"]) == 1 and body["truncated"]
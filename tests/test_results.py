@@ -0,0 +1,49 @@
+import dataclasses
+
+import pytest
+
+from optimizer.results import (MERGED_FLAKER_AREA, AllocationRow, RecommendationResult, display_rows,
+                               source_areas)
+from params import HYDROGEN_ALLOCATION_DATA
+
+
+def result():
+    return RecommendationResult.from_allocation_data(HYDROGEN_ALLOCATION_DATA)
+
+
+def test_rows_cannot_be_mutated():
+    row = result()["Pipeline"]
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        row.status = "accepted"
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        result().rows = ()
+
+
+def test_operator_edits_make_a_new_result_sharing_unchanged_rows():
+    published = result()
+    edited = published.with_updates(["Bank"], status="rejected", comment="bank maintenance")
+    assert edited["Bank"].status == "rejected" and edited["Bank"].comment == "bank maintenance"
+    assert published["Bank"].status == HYDROGEN_ALLOCATION_DATA["Bank"]["status"]
+    assert all(edited[area] is published[area] for area, _ in published.items() if area != "Bank")
+
+
+def test_allocation_data_round_trip_returns_fresh_dicts():
+    published = result()
+    data = published.to_allocation_data()
+    assert data == HYDROGEN_ALLOCATION_DATA
+    data["Pipeline"]["allocated"] = -1
+    assert published["Pipeline"].allocated == HYDROGEN_ALLOCATION_DATA["Pipeline"]["allocated"]
+    assert "Nowhere" not in published
+    with pytest.raises(KeyError):
+        published["Nowhere"]
+
+
+def test_display_merges_flakers_3_and_4_without_copying_other_rows():
+    published = result()
+    rows = display_rows(published)
+    assert [row.area for row in rows][5] == MERGED_FLAKER_AREA
+    merged = rows[5]
+    assert merged.allocated == published["Flaker - 3"].allocated + published["Flaker - 4"].allocated
+    assert all(row is published[row.area] for row in rows if row.area != MERGED_FLAKER_AREA)
+    assert source_areas(MERGED_FLAKER_AREA) == ["Flaker - 3", "Flaker - 4"]
+    assert display_rows(RecommendationResult((AllocationRow("Vent"),))) == [AllocationRow("Vent")]
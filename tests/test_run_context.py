@@ -0,0 +1,36 @@
+import pytest
+
+from optimizer.run_context import RunContext, derive_thresholds
+from params import (DEFAULT_H2O2_DURATION_THRESHOLD, DEFAULT_H2_PER_TON_CAUSTIC, DEFAULT_HEADER_PRESSURE_THRESHOLD,
+                    entry_constraints_dummy)
+
+
+def test_thresholds_fall_back_to_the_plant_defaults():
+    assert derive_thresholds({}) == {"header_pressure": DEFAULT_HEADER_PRESSURE_THRESHOLD,
+                                     "h2o2_duration": DEFAULT_H2O2_DURATION_THRESHOLD,
+                                     "h2_per_ton_caustic": DEFAULT_H2_PER_TON_CAUSTIC}
+
+    ctx = RunContext(run_id=1, reasons=["Test."], priority=3)
+    ctx.set_constraints(entry_constraints_dummy)
+    assert ctx.constraints is entry_constraints_dummy
+    assert ctx.thresholds == {"header_pressure": 135, "h2o2_duration": 8, "h2_per_ton_caustic": 280}
+
+
+def test_stages_are_timed_also_when_they_fail(capsys):
+    ctx = RunContext(run_id=4, reasons=[], priority=3)
+    with ctx.timed("fetch_dcs"):
+        pass
+    with pytest.raises(RuntimeError):
+        with ctx.timed("solve"):
+            raise RuntimeError("solver crashed")
+    assert set(ctx.timings) == {"fetch_dcs", "solve"}
+    ctx.log("done")
+    assert capsys.readouterr().out == "[run 4] done\n"
+
+
+def test_snapshot_fields_read_through_to_the_dcs_snapshot():
+    snapshot = {"dcs_constraints": {"header_pressure": 120}, "current_flow": {"pipeline": 3000}}
+    ctx = RunContext(run_id=1, reasons=[], priority=3, dcs_snapshot=snapshot)
+    assert ctx.dcs_constraints is snapshot["dcs_constraints"]
+    assert ctx.current_flow is snapshot["current_flow"]
+    assert RunContext(run_id=2, reasons=[], priority=3).timings is not ctx.timings
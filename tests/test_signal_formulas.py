@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from conftest import synthetic_frames
+from data_pipelines.data_quality import check_dcs_quality
+from data_pipelines.delta_table import compute_dcs_constraints, derive_dcs_signals, dcs_signal_inputs
+from data_pipelines.signal_formulas import compile_signal_spec
+from data_pipelines.synthetic_frames import DEFAULT_REGIME_MIX
+
+PIPELINE_TAGS = ['AARTI_H2_PIPELINE_SUPPLY', 'FARMSON_H2_PIPELINE_SUPPLY', 'VALIANT_1_H2_PIPELINE_SUPPLY',
+                 'GULSHANH2_PIPELINE_SUPPLY', 'PANOLIH2_PIPELINE_SUPPLY', 'VALIANT_2_H2_PIPELINE_SUPPLY',
+                 'CHEMIE_H2_PIPELINE_SUPPLY', 'LANXESS_H2_PIPELINE_SUPPLY', 'ANUPAM_RASAYAN_H2_PIPELINE_SUPPLY',
+                 'UPL_5_H2_PIPELINE_SUPPLY']
+COMPRESSORS = ['ZH', 'ZI', 'ZJ', 'G', 'K', 'L', 'M', 'N', 'O', 'P']
+
+
+def baseline_signals(row):
+    """The hand-written per-frame formulas the signal spec replaced, for one frame (tag -> value)."""
+    caustic_production = sum(row[f'Caustic_Caustic Production_{size}tpd_TPH'] for size in [332, 450, 600, 850]) / 24
+    pipeline_flow = sum(row[tag] for tag in PIPELINE_TAGS)
+    h2_in_hcl = sum(row[f'H2_FLOW_TO_HCL_FURNACE_{i}'] for i in range(1, 7))
+    bank_available = number_of_banks = 0
+    for i in range(1, 8):
+        banks = row[f'H2_POST_{i}_BANK_IN_FILLING'] + row[f'H2_POST_{i}_BANK_AVAILABLE'] + \
+            row[f'H2_POST_{i}_BANK_FILLING__HOLD']
+        bank_available += banks * row[f'H2_POST_{i}_BANK_CAPACITY']
+        number_of_banks += banks
+    total_bank_flow = sum(row[f'Bank_compressor_status_{c}'] for c in COMPRESSORS) * 440
+    venting = 1 if sum(row[f'H2_vent_valve_CMD_{size}'] for size in [332, 450, 600, 850]) > 3 else 0
+    if row['Hydrogen_Holder_level_current_per_1'] > 90 or row['Hydrogen_Holder_level_current_per_2'] > 90:
+        venting = 1
+    consumers = (pipeline_flow + total_bank_flow + h2_in_hcl + row['ECH_H2_PIPELINE_SUPPLY'] +
+                 row['Flaker_450tpd_running_or_not_binary'] + row['Flaker_600tpd_running_or_not_binary'] +
+                 row['Flaker_850tpd_running_or_not_binary_1'] + row['Flaker_850tpd_running_or_not_binary_2'] +
+                 row['H2O2_H2_current_NM3_per_hr'] + row['Boiler_P60_current_H2_NM3_per_hr'] +
+                 row['Boiler_P120_current_H2_NM3_per_hr'])
+    return {
+        "caustic_production": caustic_production,
+        "pipeline_flow": pipeline_flow,
+        "header_pressure": row['Hydrogen_Header_pressure_current_kgf_per_cm2'],
+        "hcl_production": sum(row[f'1350TPD_HCL_FURNACE_{i}'] for i in range(1, 5)) / 24 +
+        (row['850TPD_HCL_FURNACE_A'] + row['850TPD_HCL_FURNACE_B']) / 24,
+        "h2o2_production": row['H2O2_H2O2_current_TPH'] / 2000,
+        "flaker1_load": row['Flaker_450tpd_current_load_TPH'] / 24,
+        "flaker4_load": row['Flaker_850tpd_current_load_TPH_2'] / 24,
+        "flaker3_consumption_norm": (row['Flaker_850tpd_running_or_not_binary_1'] +
+                                     row['NG_flow_in_Flaker3'] * (220 / 67)) /
+        (row['Flaker_850tpd_current_load_TPH_1'] / 24),
+        "boiler_p60_run": 1 if row['Boiler_P60_running_or_not_binary'] > 0 else 0,
+        "h2_in_hcl": h2_in_hcl,
+        "bank_available": bank_available,
+        "number_of_banks": number_of_banks,
+        "total_bank_flow": total_bank_flow,
+        "bank_in_filling": 1 if total_bank_flow > 0 else 0,
+        "venting": venting,
+        "total_h2_flow": consumers,
+        "balance": caustic_production * 280 - consumers,
+    }
+
+
+def test_compiled_spec_matches_the_baseline_formulas():
+    frames = synthetic_frames(300, seed=3, regime_mix=DEFAULT_REGIME_MIX)
+    tags = dcs_signal_inputs(frames)
+    signals = derive_dcs_signals(tags)
+    for i in range(frames.num_rows):
+        expected = baseline_signals({name: values[i] for name, values in tags.items()})
+        for name, value in expected.items():
+            assert signals[name][i] == pytest.approx(value, rel=1e-9, abs=1e-9), f"{name} in frame {i}"
+    assert {0, 1} <= set(signals["venting"])  # the mix covers both branches of the vent check
+
+
+def test_constraints_of_one_frame_match_the_signals():
+    frames = synthetic_frames(1, seed=4)
+    dcs_constraints, current_flow = compute_dcs_constraints(frames, record_norm=False)
+    expected = baseline_signals({name: values[0] for name, values in dcs_signal_inputs(frames).items()})
+    assert dcs_constraints["caustic_production"] == round(expected["caustic_production"], 2)
+    assert dcs_constraints["total_h2_flow"] == round(expected["total_h2_flow"], 2)
+    assert current_flow["pipeline"] == round(expected["pipeline_flow"], 2)
+
+
+def test_spec_compiles_fractions_chains_and_post_ops():
+    compiled = compile_signal_spec({
+        "linear": {"a": {"terms": {"x": "1/2", "y": 1}}, "b": {"terms": {"a": 2, "x": 1}, "divisor": 4}},
+        "post_ops": [{"name": "big", "op": "gt", "input": "b", "value": 1},
+                     {"name": "per_y", "op": "ratio", "numerator": "a", "denominator": "y"}],
+    })
+    signals = compiled.evaluate({"x": np.array([2.0, 4.0]), "y": np.array([1.0, 0.0])})
+    np.testing.assert_allclose(signals["a"], [2.0, 2.0])
+    np.testing.assert_allclose(signals["b"], [1.5, 2.0])
+    assert list(signals["big"]) == [1.0, 1.0]
+    assert signals["per_y"][0] == 2.0 and np.isinf(signals["per_y"][1])
+
+
+def test_missing_spec_tags_evaluate_as_zero():
+    frames = synthetic_frames(5, seed=5)
+    tags = dcs_signal_inputs(frames)
+    absent = ["NG_flow_in_Flaker3", "Bank_compressor_status_ZH", "Bank_compressor_status_ZI"]
+    partial = {name: values for name, values in tags.items() if name not in absent}
+    zeroed = {**tags, **{name: np.zeros(frames.num_rows) for name in absent}}
+
+    signals, expected = derive_dcs_signals(partial), derive_dcs_signals(zeroed)
+    for name in expected:
+        np.testing.assert_array_equal(signals[name], expected[name])
+    dcs_constraints, _ = compute_dcs_constraints(frames.drop_columns(absent), record_norm=False)
+    assert dcs_constraints["calculated_bank_flow"] == round(expected["total_bank_flow"][0], 2)
+    assert set(check_dcs_quality(frames.drop_columns(absent))["missing_tags"]) == set(absent)
+
+
+def test_spec_can_reject_missing_tags():
+    spec = {"missing_tags": "reject", "linear": {"a": {"terms": {"x": 1, "y": 1}}}}
+    compiled = compile_signal_spec(spec)
+    with pytest.raises(ValueError, match="y"):
+        compiled.evaluate({"x": np.ones(2)})
+    with pytest.raises(ValueError):
+        compile_signal_spec({**spec, "missing_tags": "ignore"})
@@ -0,0 +1,57 @@
+import threading
+
+from utils.sqlite_pool import SqlitePool, get_sqlite_pool
+
+
+def test_each_thread_reuses_its_own_connection(tmp_path):
+    pool = SqlitePool(str(tmp_path / "pool.db"))
+    conn = pool.connection()
+    assert pool.connection() is conn
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+    assert pool.opened == 2
+
+
+def test_connections_are_tuned_when_opened(tmp_path):
+    conn = SqlitePool(str(tmp_path / "pool.db"), busy_timeout_ms=1234).connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+
+def test_release_rolls_back_an_open_transaction(tmp_path):
+    pool = SqlitePool(str(tmp_path / "pool.db"))
+    conn = pool.connection()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t VALUES (1)")
+    pool.release(conn)
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_readers_see_the_last_commit_while_a_writer_is_open(tmp_path):
+    pool = SqlitePool(str(tmp_path / "pool.db"))
+    writer = pool.connection()
+    writer.execute("CREATE TABLE t (x INTEGER)")
+    writer.execute("INSERT INTO t VALUES (1)")
+    writer.commit()
+    writer.execute("INSERT INTO t VALUES (2)")  # left uncommitted, holding the write lock
+
+    counts = []
+    thread = threading.Thread(target=lambda: counts.append(pool.connection().execute("SELECT COUNT(*) FROM t")
+                                                            .fetchone()[0]))
+    thread.start()
+    thread.join()
+    assert counts == [1]
+    writer.rollback()
+
+
+def test_one_pool_per_database_file(tmp_path):
+    path = str(tmp_path / "pool.db")
+    assert get_sqlite_pool(path) is get_sqlite_pool(path)
+    assert get_sqlite_pool(path) is not get_sqlite_pool(str(tmp_path / "other.db"))
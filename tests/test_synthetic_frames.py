@@ -0,0 +1,50 @@
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+
+import main
+from data_pipelines.delta_table import decode_dcs_table, dcs_signal_inputs, derive_dcs_signals
+from data_pipelines.synthetic_frames import (BOILER_RUNNING_LOAD, DEFAULT_REGIME_MIX, REGIMES, VENT_CMD_CLOSED,
+                                             VENT_VALVES, synthesize_tags)
+
+
+def test_generation_is_consumption_plus_vent_in_every_frame():
+    tags, regime = synthesize_tags(2000, DEFAULT_REGIME_MIX, np.random.default_rng(1))
+    signals = derive_dcs_signals(tags)
+    venting = regime == "venting"
+    # the balance signal (generation at the spec's norm minus consumption) is the vent flow
+    np.testing.assert_allclose(signals["balance"][~venting], 0, atol=1e-6)
+    assert (signals["balance"][venting] >= 500 - 1e-6).all() and (signals["balance"][venting] <= 3000 + 1e-6).all()
+    assert (signals["venting"][venting] == 1).all()
+
+
+def test_regime_weights_are_honoured():
+    mix = {"normal": 0.5, "venting": 0.3, "no_banks": 0.2}
+    _, regime = synthesize_tags(20000, mix, np.random.default_rng(2))
+    for name in REGIMES:
+        assert np.mean(regime == name) == pytest.approx(mix.get(name, 0.0), abs=0.02), name
+    with pytest.raises(ValueError):
+        synthesize_tags(10, {"nightly": 1})
+
+
+def test_synthesize_command_writes_the_requested_mix(tmp_path):
+    output_dir = tmp_path / "frames"
+    code = main.main(["synthesize", "--frames", "5000", "--mix", "normal=0.7,venting=0.3", "--seed", "7",
+                      "--batch-rows", "2000", "--output-dir", str(output_dir)])
+    assert code == main.EXIT_OK
+    frames = decode_dcs_table(pq.read_table(output_dir))
+    assert frames.num_rows == 5000 and len(list(output_dir.iterdir())) == 3
+    venting = derive_dcs_signals(dcs_signal_inputs(frames))["venting"]
+    assert np.mean(venting) == pytest.approx(0.3, abs=0.03)
+
+
+def test_tags_read_like_the_recorded_exports():
+    tags, regime = synthesize_tags(2000, DEFAULT_REGIME_MIX, np.random.default_rng(3))
+    for boiler, (low, high) in BOILER_RUNNING_LOAD.items():
+        running = tags[f"Boiler_{boiler}_running_or_not_binary"]
+        assert ((running == 0) | ((running >= low) & (running <= high))).all()
+        assert (running > 0).any() and (running == 0).any()
+    closed = regime != "venting"
+    for valve in VENT_VALVES:
+        command = tags[f"H2_vent_valve_CMD_{valve}"][closed]
+        assert ((command >= VENT_CMD_CLOSED[0]) & (command <= VENT_CMD_CLOSED[1])).all()
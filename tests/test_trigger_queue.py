@@ -0,0 +1,48 @@
+import threading
+import time
+
+from optimizer.trigger_queue import (TriggerQueue, merge_reasons, PRIORITY_HEADER_PRESSURE, PRIORITY_MANUAL,
+                                     PRIORITY_ROUTINE)
+
+
+def test_requests_in_the_debounce_window_are_merged():
+    queue = TriggerQueue(debounce_s=0.2, urgent_debounce_s=0.01)
+    for reason in ["New DCS data.", "Constraint changes detected.", "New DCS data."]:
+        queue.submit(reason)
+    started = time.monotonic()
+    batch = queue.next_batch(timeout=1)
+    assert time.monotonic() - started >= 0.15
+    assert len(batch) == 3
+    assert merge_reasons(batch) == ["New DCS data.", "Constraint changes detected."]
+    assert queue.pending_count() == 0
+
+
+def test_urgent_request_pulls_pending_routine_requests_forward():
+    queue = TriggerQueue(debounce_s=5, urgent_debounce_s=0.01)
+    queue.submit("New DCS data.")
+    threading.Timer(0.05, queue.submit, ("Header pressure condition met.", PRIORITY_HEADER_PRESSURE)).start()
+    started = time.monotonic()
+    batch = queue.next_batch(timeout=1)
+    assert time.monotonic() - started < 1
+    assert [request.priority for request in batch] == [PRIORITY_HEADER_PRESSURE, PRIORITY_ROUTINE]
+
+
+def test_manual_requests_use_the_urgent_window():
+    queue = TriggerQueue(debounce_s=5, urgent_debounce_s=0.01)
+    queue.submit("Manual run.", PRIORITY_MANUAL, force=True)
+    batch = queue.next_batch(timeout=1)
+    assert [request.force for request in batch] == [True]
+
+
+def test_next_batch_gives_up_after_timeout():
+    queue = TriggerQueue(debounce_s=0.01, urgent_debounce_s=0.01)
+    assert queue.next_batch(timeout=0.05) == []
+
+
+def test_waiters_get_the_result_of_the_covering_run():
+    queue = TriggerQueue(debounce_s=0.01, urgent_debounce_s=0.01)
+    request = queue.submit("New DCS data.")
+    assert request.wait(timeout=0.01) is None
+    for covered in queue.next_batch(timeout=1):
+        covered.resolve("published")
+    assert request.wait(timeout=1) == "published"
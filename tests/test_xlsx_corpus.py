@@ -0,0 +1,52 @@
+import os
+import time
+
+import pytest
+
+from conftest import synthetic_frames
+from data_pipelines.dcs_cache import DcsSnapshotCache
+from data_pipelines.dcs_sources import ReplayDcsSource
+from data_pipelines.history_ingest import SIGNAL_PREFIX
+from data_pipelines.signal_formulas import get_compiled_signals
+from data_pipelines.xlsx_corpus import build_dcs_corpus, corpus_is_current, load_dcs_corpus
+from params import DATA_DIR
+
+EXPORT = os.path.join(DATA_DIR, "New_Query_2025_07_21_11_13am.xlsx")
+ABSENT = ["NG_flow_in_Flaker3", "NG_flow_in_Flaker4", "Bank_compressor_status_ZH"]
+
+
+def replay_snapshot(corpus_path):
+    """The snapshot once the whole recording has been replayed (the first read only shows its first frame)."""
+    cache = DcsSnapshotCache(source=ReplayDcsSource(corpus_path, speedup=1e9), ttl_s=0)
+    cache.get()
+    time.sleep(0.01)
+    return cache.get()
+
+
+def test_export_missing_spec_tags_builds_a_replayable_corpus(db, tmp_path):
+    export = tmp_path / "export.xlsx"
+    synthetic_frames(5).to_pandas().drop(columns=ABSENT).to_excel(export, index=False)
+    output = str(tmp_path / "corpus.arrow")
+    corpus = build_dcs_corpus([str(export)], output=output)
+
+    assert not get_compiled_signals().missing(corpus.column_names)
+    assert corpus.column("NG_flow_in_Flaker3").to_pylist() == [0.0] * 5
+    assert f"{SIGNAL_PREFIX}total_h2_flow" in corpus.column_names
+    assert corpus_is_current(output, sources=[str(export)])
+
+    snapshot = replay_snapshot(output)
+    assert snapshot["timestamp"] == "2025-01-01 00:04:00"
+    assert snapshot["quality"]["missing_tags"] == []
+    assert snapshot["dcs_constraints"]["calculated_bank_flow"] >= 0
+
+
+@pytest.mark.skipif(not os.path.exists(EXPORT), reason="the recorded export is not checked out")
+def test_recorded_export_replays(db, tmp_path):
+    output = str(tmp_path / "corpus.arrow")
+    build_dcs_corpus([EXPORT], output=output)
+    frames = load_dcs_corpus(output, signals=False)
+    assert not any(name.startswith(SIGNAL_PREFIX) for name in frames.column_names)
+
+    snapshot = replay_snapshot(output)
+    assert snapshot["dcs_constraints"]["caustic_production"] > 0
+    assert snapshot["dcs_constraints"]["header_pressure"] > 100
@@ -39,17 +39,22 @@
 
 
 import datetime
-import sqlite3
 
 import pandas as pd
 import pytz
 
 from params import *
+from utils.sqlite_pool import get_sqlite_pool
+
+
+def _connection():
+    # pooled per-thread connection; `with conn:` commits, or rolls back on error, without closing it
+    return get_sqlite_pool(DB_PATH).connection()
 
 
 def initialize_audit_log_table():
     """Creates the audit_log table if it doesn't exist."""
-    with sqlite3.connect(DB_PATH) as conn:
+    with _connection() as conn:
         conn.execute(f"""
             CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
                 timestamp TEXT,
@@ -61,18 +66,17 @@ def initialize_audit_log_table():
                 comments TEXT
             )
         """)
-        conn.commit()
 
 
 def load_audit_log():
     """Loads the audit log from the SQLite database."""
-    with sqlite3.connect(DB_PATH) as conn:
+    with _connection() as conn:
         return pd.read_sql_query(f"SELECT * FROM {TABLE_NAME}", conn)
 
 
 def save_audit_log(df):
     """Saves the audit log DataFrame to the SQLite database (overwrite mode)."""
-    with sqlite3.connect(DB_PATH) as conn:
+    with _connection() as conn:
         df.to_sql(TABLE_NAME, conn, if_exists='replace', index=False)
 
 
@@ -81,10 +85,9 @@ def log_audit_entry(user, role, parameter, old_value, new_value, comments=""):
     ist = pytz.timezone('Asia/Kolkata')
     timestamp = datetime.datetime.now(ist).strftime("%Y-%m-%d %H:%M:%S")
 
-    with sqlite3.connect(DB_PATH) as conn:
+    with _connection() as conn:
         conn.execute(f"""
             INSERT INTO {TABLE_NAME} (timestamp, user, role, parameter, old_value, new_value, comments)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         """, (timestamp, user, role, parameter, old_value, new_value, comments))
-        conn.commit()
 
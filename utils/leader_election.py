@@ -0,0 +1,149 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from params import *
+
+LEASE_TABLE_NAME = "leader_lease"
+
+
+def ensure_lease_table(db_path=DB_PATH):
+    with sqlite3.connect(db_path, timeout=LEADER_LEASE_TTL_S) as conn:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {LEASE_TABLE_NAME} (
+                name TEXT PRIMARY KEY,
+                holder TEXT,
+                expires_at REAL,
+                heartbeat_at REAL
+            )
+        """)
+        conn.commit()
+
+
+class LeaderLease:
+    """
+    Lease-based leader election over a row in the shared SQLite database.
+
+    Every replica runs the same heartbeat: take the row if it is free, expired or already ours, and push
+    its expiry `ttl_s` into the future. The holder renews every `ttl_s / 3`, so if it dies a follower takes
+    over within one TTL. Replicas must point DB_PATH at the same file on a shared volume.
+    A lease created with `candidate=False` never takes the row and always stays a follower.
+    """
+
+    def __init__(self, name="optimizer", ttl_s=LEADER_LEASE_TTL_S, db_path=DB_PATH, holder_id=None,
+                 on_change=None, candidate=True):
+        self.name = name
+        self.ttl_s = ttl_s
+        self.db_path = db_path
+        self.holder_id = holder_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.on_change = on_change  # called with True/False whenever leadership is gained or lost
+        self.candidate = candidate
+        self._expires_at = 0.0
+        self._is_leader = False
+        self._stop_event = threading.Event()
+        self._thread = None
+        ensure_lease_table(db_path)
+
+    def _connect(self):
+        # isolation_level=None so the BEGIN IMMEDIATE below controls the transaction
+        return sqlite3.connect(self.db_path, timeout=self.ttl_s, isolation_level=None)
+
+    def try_acquire(self):
+        """Acquires or renews the lease. Returns True if this process is the leader afterwards."""
+        if not self.candidate:
+            return False
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")  # take the write lock before reading so two replicas can't both win
+            row = conn.execute(f"SELECT holder, expires_at FROM {LEASE_TABLE_NAME} WHERE name = ?",
+                               (self.name,)).fetchone()
+            if row is None or row[0] == self.holder_id or row[1] < now:
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO {LEASE_TABLE_NAME} (name, holder, expires_at, heartbeat_at)
+                    VALUES (?, ?, ?, ?)
+                """, (self.name, self.holder_id, now + self.ttl_s, now))
+                conn.execute("COMMIT")
+                self._expires_at = now + self.ttl_s
+                self._set_leader(True)
+            else:
+                conn.execute("ROLLBACK")
+                self._set_leader(False)
+        except sqlite3.Error as e:
+            print(f"Error renewing leader lease '{self.name}': {e}")
+            # keep leadership only while the last successful renewal is still valid
+            self._set_leader(self._is_leader and time.time() < self._expires_at)
+        finally:
+            conn.close()
+        return self._is_leader
+
+    def release(self):
+        """Gives the lease up so another replica can take over without waiting for it to expire."""
+        try:
+            with sqlite3.connect(self.db_path, timeout=self.ttl_s) as conn:
+                conn.execute(f"DELETE FROM {LEASE_TABLE_NAME} WHERE name = ? AND holder = ?",
+                             (self.name, self.holder_id))
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error releasing leader lease '{self.name}': {e}")
+        self._set_leader(False)
+
+    def is_leader(self):
+        # Also checks the local expiry: a stalled heartbeat must not leave two leaders
+        return self._is_leader and time.time() < self._expires_at
+
+    def current_holder(self):
+        with sqlite3.connect(self.db_path, timeout=self.ttl_s) as conn:
+            row = conn.execute(f"SELECT holder, expires_at FROM {LEASE_TABLE_NAME} WHERE name = ?",
+                               (self.name,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def _set_leader(self, is_leader):
+        changed = is_leader != self._is_leader
+        self._is_leader = is_leader
+        if changed:
+            print(f"Leader lease '{self.name}': {self.holder_id} is now {'LEADER' if is_leader else 'FOLLOWER'}")
+            if self.on_change is not None:
+                self.on_change(is_leader)
+
+    def start(self):
+        """Starts the heartbeat thread. Safe to call repeatedly."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self.try_acquire()
+        self._thread = threading.Thread(target=self._heartbeat_loop, name=f"lease-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, release=True):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if release:
+            self.release()
+
+    def _heartbeat_loop(self):
+        while not self._stop_event.wait(self.ttl_s / 3):
+            self.try_acquire()
+
+
+if __name__ == "__main__":
+    # Local failover check: start this in several terminals against the same file, kill the leader and
+    # watch another process take over within one TTL.
+    #   python -m utils.leader_election /tmp/lease_test.db
+    import sys
+
+    lease = LeaderLease(db_path=sys.argv[1] if len(sys.argv) > 1 else DB_PATH, ttl_s=6)
+    lease.start()
+    try:
+        while True:
+            print(f"{lease.holder_id}: leader={lease.is_leader()} holder={lease.current_holder()}")
+            time.sleep(2)
+    except KeyboardInterrupt:
+        lease.stop()
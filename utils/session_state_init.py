@@ -1,5 +1,6 @@
 import streamlit as st
 from database import load_latest_allocation_data
+from optimizer.results import RecommendationResult
 from optimizer.run_optimizer import initial_db_trigger, last_run_constraints_trigger_run
 from params import *
 
@@ -47,7 +48,8 @@ def session_state_init():
 
     # Load initial dashboard data from the database
     if "dashboard_data" not in st.session_state:
-        st.session_state.dashboard_data = load_latest_allocation_data(HYDROGEN_ALLOCATION_DATA)
+        st.session_state.dashboard_data = RecommendationResult.from_allocation_data(
+            load_latest_allocation_data(HYDROGEN_ALLOCATION_DATA))
 
     # Flag to indicate if optimizer should run due to button click
     if "run_optimizer_button_clicked" not in st.session_state:
@@ -0,0 +1,77 @@
+import sqlite3
+import threading
+
+from params import *
+
+# One SQLite connection per thread and database file, opened on first use and reused for the life of the
+# thread, instead of a connect/close around every statement. Each connection is tuned once when it opens:
+#   journal_mode=WAL      readers see the last commit while a writer appends to the WAL, so dashboard reads
+#                         no longer wait behind optimizer writes (the mode is persistent in the file;
+#                         H2_SQLITE_JOURNAL_MODE=DELETE for a file shared between hosts over NFS)
+#   synchronous=NORMAL    fsync at checkpoints instead of every commit; safe with WAL
+#   mmap_size/cache_size  reads served from mapped pages and a larger per-connection page cache
+#   busy_timeout          a writer waits for a concurrent writer instead of failing with "database is locked"
+# Connections are never shared across threads (sqlite3's check_same_thread stays on). A thread's connection
+# is closed when the thread ends.
+
+
+class SqlitePool:
+    """Per-thread pooled connections to one SQLite file."""
+
+    def __init__(self, db_path=DB_PATH, journal_mode=SQLITE_JOURNAL_MODE, busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS,
+                 cache_size_kb=SQLITE_CACHE_SIZE_KB, mmap_size=SQLITE_MMAP_SIZE):
+        self.db_path = db_path
+        self.journal_mode = journal_mode
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.opened = 0  # connections opened by this pool
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000)
+        conn.row_factory = sqlite3.Row  # Allows accessing columns by name
+        conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")  # negative: KiB instead of pages
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def connection(self):
+        """This thread's connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    def release(self, conn):
+        """
+        Hands a connection back after use. It stays open; a transaction left open by a failed statement is
+        rolled back so the thread does not keep holding the write lock.
+        """
+        if conn.in_transaction:
+            conn.rollback()
+
+    def close(self):
+        """Closes this thread's connection (the next use opens a new one)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_sqlite_pool(db_path=DB_PATH):
+    """Returns the process-wide pool for `db_path`, creating it on first use."""
+    with _pools_lock:
+        if db_path not in _pools:
+            _pools[db_path] = SqlitePool(db_path)
+        return _pools[db_path]